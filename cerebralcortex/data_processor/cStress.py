@@ -21,58 +21,111 @@
 # CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
 # OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
-from pyspark import RDD
+from datetime import timedelta
+
+from pyspark import RDD, StorageLevel
 
 from cerebralcortex.data_processor.feature.ecg import ecg_feature_computation
 from cerebralcortex.data_processor.feature.rip import rip_feature_computation
+from cerebralcortex.data_processor.pipeline import ParticipantPlan, materialize_record
+from cerebralcortex.data_processor.sharding import shard_record, stitch
 from cerebralcortex.data_processor.signalprocessing import rip
 from cerebralcortex.data_processor.signalprocessing.accelerometer import accelerometer_features
 from cerebralcortex.data_processor.signalprocessing.alignment import timestamp_correct, autosense_sequence_align
 from cerebralcortex.data_processor.signalprocessing.ecg import compute_rr_intervals
 
+# TODO: TWH Temporary
+ecg_sampling_frequency = 64.0
+rip_sampling_frequency = 64.0
+accel_sampling_frequency = 64.0 / 6.0
 
-def fix_two_joins(nested_data):
-    key = nested_data[0]
-    base_value = nested_data[1][0]
-    new_value = (nested_data[1][1],)
-    return key, base_value + new_value
-
-
-def cStress(rdd: RDD) -> RDD:
+cStress_streams = ('ecg', 'rip', 'accelx', 'accely', 'accelz')
 
-    # TODO: TWH Temporary
-    ecg_sampling_frequency = 64.0
-    rip_sampling_frequency = 64.0
-    accel_sampling_frequency = 64.0 / 6.0
 
+def cStress_plan() -> ParticipantPlan:
+    """
+    :return: per-participant stages of cStress, reading the ecg, rip and accelx/y/z streams of a loader record
+    """
+    plan = ParticipantPlan()
 
     # Timestamp correct datastreams
-    ecg_corrected = rdd.map(lambda ds: (
-    ds['participant'], timestamp_correct(datastream=ds['ecg'], sampling_frequency=ecg_sampling_frequency)))
-    rip_corrected = rdd.map(lambda ds: (
-    ds['participant'], timestamp_correct(datastream=ds['rip'], sampling_frequency=rip_sampling_frequency)))
-
-    accelx_corrected = rdd.map(lambda ds: (
-    ds['participant'], timestamp_correct(datastream=ds['accelx'], sampling_frequency=accel_sampling_frequency)))
-    accely_corrected = rdd.map(lambda ds: (
-    ds['participant'], timestamp_correct(datastream=ds['accely'], sampling_frequency=accel_sampling_frequency)))
-    accelz_corrected = rdd.map(lambda ds: (
-    ds['participant'], timestamp_correct(datastream=ds['accelz'], sampling_frequency=accel_sampling_frequency)))
-
-    accel_group = accelx_corrected.join(accely_corrected).join(accelz_corrected).map(fix_two_joins)
-    accel = accel_group.map(lambda ds: (ds[0], autosense_sequence_align(datastreams=[ds[1][0], ds[1][1], ds[1][2]],
-                                                                        sampling_frequency=accel_sampling_frequency)))
+    plan.stage('ecg_corrected', ['ecg'],
+               lambda ds: timestamp_correct(datastream=ds, sampling_frequency=ecg_sampling_frequency), halo=1.0)
+    plan.stage('rip_corrected', ['rip'],
+               lambda ds: timestamp_correct(datastream=ds, sampling_frequency=rip_sampling_frequency), halo=1.0)
+    for axis in ['accelx', 'accely', 'accelz']:
+        plan.stage(axis + '_corrected', [axis],
+                   lambda ds: timestamp_correct(datastream=ds, sampling_frequency=accel_sampling_frequency),
+                   halo=1.0)
+
+    plan.stage('accel', ['accelx_corrected', 'accely_corrected', 'accelz_corrected'],
+               lambda x, y, z: autosense_sequence_align(datastreams=[x, y, z],
+                                                        sampling_frequency=accel_sampling_frequency))
 
     # Accelerometer Feature Computation
-    accel_features = accel.map(lambda ds: (ds[0], accelerometer_features(ds[1], window_length=10.0)))
+    plan.stage('accel_features', ['accel'], lambda ds: accelerometer_features(ds, window_length=10.0), halo=10.0)
 
     # rip features
-    peak_valley = rip_corrected.map(lambda ds: (ds[0], rip.compute_peak_valley(rip=ds[1])))
-    rip_features = peak_valley.map(lambda ds: (ds[0], rip_feature_computation(ds[1][0], ds[1][1])))
+    # 8 s moving average curve window, and one breath cycle for the per-cycle features
+    plan.stage('peak_valley', ['rip_corrected'], lambda ds: rip.compute_peak_valley(rip=ds), halo=8.0)
+    plan.stage('rip_features', ['peak_valley'], lambda pv: rip_feature_computation(pv[0], pv[1]), halo=10.0)
 
     # r-peak datastream computation
-    ecg_rr_rdd = ecg_corrected.map(lambda ds: (ds[0], compute_rr_intervals(ds[1], ecg_sampling_frequency)))
-    ecg_features = ecg_rr_rdd.map(lambda ds: (ds[0], ecg_feature_computation(ds[1], window_size=60, window_offset=60)))
+    # Quality windows and the adaptive R peak thresholds settle within a few seconds
+    plan.stage('ecg_rr', ['ecg_corrected'], lambda ds: compute_rr_intervals(ds, ecg_sampling_frequency), halo=10.0)
+    plan.stage('ecg_features', ['ecg_rr'],
+               lambda ds: ecg_feature_computation(ds, window_size=60, window_offset=60), halo=60.0)
+
+    return plan
+
+
+def cStress(rdd: RDD,
+            outputs=('ecg_features',),
+            storage_level: StorageLevel = None,
+            shard_length: timedelta = None,
+            n_partitions: int = None) -> RDD:
+    """
+    Run the cStress stages of every participant as one fused task, or of every time shard of a participant
+
+    With shard_length, every participant record is split into time shards overlapping by the halo of the requested
+    stages and the shard outputs are stitched back per participant, so a long recording no longer runs as a single
+    task. The stitched outputs approximate those of whole recordings: the timestamp correction is anchored to the
+    first sample of every shard and the R peak and breath thresholds adapt to the shard statistics. The shards are
+    hash partitioned by participant and shard start before the plan runs on them, so the shards of one recording
+    run in parallel, and only their outputs are shuffled back to be stitched per participant.
+
+    :param rdd: RDD of (participant, record) from participant_records, records being dicts with the participant
+        and its ecg, rip and accelx/y/z DataStreams or ArrayStreams; whole recordings keep the partitioning by
+        participant, and ArrayStreams only become DataPoints in the task running the plan on a record or shard, so
+        persisted records and shuffled shards stay compact
+    :param outputs: stage outputs to compute, e.g. ('rip_features', 'ecg_features', 'accel_features'); only the
+        stages they depend on run
+    :param storage_level: persist the input records at this level, for callers that reuse them
+    :param shard_length: length of the time shards, None processes every recording whole
+    :param n_partitions: number of partitions the shards run in, the default parallelism of the SparkContext by
+        default
+    :return: RDD of (participant, output) for a single output, (participant, tuple of outputs) otherwise
+    """
+    if storage_level is not None:
+        rdd = rdd.persist(storage_level)
+
+    plan = cStress_plan()
+    compiled = plan.compile(outputs)
+
+    def run(record):
+        return compiled(materialize_record(record))
+
+    if shard_length is None:
+        results = rdd.mapValues(run)
+    else:
+        halo = plan.halo(outputs)
+        n_partitions = n_partitions or rdd.context.defaultParallelism
+        shards = rdd.flatMap(lambda pair: [((pair[0], shard['shard_start']), shard)
+                                           for shard in shard_record(pair[1], cStress_streams, shard_length, halo)]) \
+            .partitionBy(n_partitions)
+        results = shards.map(lambda pair: (pair[0][0], (pair[1]['shard_start'], pair[1]['shard_end'], run(pair[1])))) \
+            .groupByKey().mapValues(stitch)
 
-    # return rip_features.join(ecg_features).join(accel_features).map(fix_two_joins)
-    return ecg_features
+    if len(outputs) == 1:
+        return results.mapValues(lambda values: values[0] if values is not None else None)
+    return results
@@ -0,0 +1,241 @@
+# Copyright (c) 2016, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import argparse
+import json
+import multiprocessing
+import platform
+import resource
+import time
+from collections import OrderedDict
+
+import numpy as np
+import sklearn
+from sklearn import svm
+from sklearn.cross_validation import LabelKFold
+
+from cerebralcortex.data_processor import cStress_model_param_fold_parallel_spark as fold_search
+from cerebralcortex.data_processor import cStress_model_param_parallel_spark as param_search
+from cerebralcortex.data_processor.model.backend import ProcessPoolBackend, SparkBackend
+from cerebralcortex.data_processor.model.scorer import two_bias_scorer_CV
+from cerebralcortex.data_processor.model.synthetic import make_cstress_dataset
+from cerebralcortex.data_processor.model.telemetry import SearchTelemetry
+
+# Command line parameter configuration
+parser = argparse.ArgumentParser(description='Benchmark the cStress parameter search implementations')
+parser.add_argument('--implementations', type=str, required=False, dest='implementations',
+                    default='fold,param', help='Comma separated implementations to time (fold, fold-precomputed, '
+                                               'fold-halving, fold-bayes or param)')
+parser.add_argument('--gridSizes', type=str, required=False, dest='gridSizes', default='2,4',
+                    help='Comma separated number of C values, and as many gamma values, of each grid')
+parser.add_argument('--cores', type=str, required=False, dest='cores', default='1,2',
+                    help='Comma separated core counts')
+parser.add_argument('--backend', type=str, required=False, dest='backend', default='local',
+                    help='Where the search tasks run (local or spark, a local[cores] master)')
+parser.add_argument('--subjects', type=int, required=False, dest='subjects', default=6,
+                    help='Number of synthetic subjects, one fold each')
+parser.add_argument('--windows', type=int, required=False, dest='windows', default=100,
+                    help='Number of one minute windows per subject')
+parser.add_argument('--features', type=int, required=False, dest='features', default=37,
+                    help='Number of features per window')
+parser.add_argument('--positiveFraction', type=float, required=False, dest='positiveFraction', default=0.4,
+                    help='Fraction of stress windows per subject')
+parser.add_argument('--repeat', type=int, required=False, dest='repeat', default=1,
+                    help='Number of timed runs per configuration')
+parser.add_argument('--output', type=str, required=False, dest='output',
+                    help='JSONL file the results are appended to')
+
+
+def _fold_search(**kwargs):
+    def build(backend, svc, grid, cv, telemetry):
+        return fold_search.GridSearchCVSparkParallel(sc=backend, estimator=svc, param_grid=grid, cv=cv, iid=False,
+                                                     telemetry=telemetry, **kwargs)
+
+    return build
+
+
+def _fold_halving_search(backend, svc, grid, cv, telemetry):
+    return fold_search.HalvingGridSearchCVSparkParallel(sc=backend, estimator=svc, param_grid=grid, cv=cv, iid=False,
+                                                        random_state=0, telemetry=telemetry)
+
+
+def _fold_bayes_search(backend, svc, grid, cv, telemetry):
+    n_candidates = int(np.prod([len(values) for values in grid.values()]))
+    return fold_search.BayesianGridSearchCVSparkParallel(backend, estimator=svc, param_distributions=grid, cv=cv,
+                                                         n_iter=max(1, n_candidates // 4), iid=False, random_state=0,
+                                                         telemetry=telemetry)
+
+
+def _param_search(backend, svc, grid, cv, telemetry):
+    # The parameter search tasks record no telemetry
+    return param_search.GridSearchCVSparkParallelParam(sc=backend, estimator=svc, param_grid=grid, cv=cv,
+                                                       scoring=two_bias_scorer_CV, iid=False)
+
+
+IMPLEMENTATIONS = OrderedDict([
+    ('fold', _fold_search()),
+    ('fold-precomputed', _fold_search(precompute_kernel=True)),
+    ('fold-halving', _fold_halving_search),
+    ('fold-bayes', _fold_bayes_search),
+    ('param', _param_search),
+])
+
+
+def benchmark_grid(grid_size):
+    """
+    :param grid_size: number of C values and of gamma values
+    :return: cStress parameter grid of grid_size * grid_size * 2 candidates centered on C = gamma = 1
+    """
+    exponents = np.arange(grid_size) - (grid_size - 1) / 2.0
+    return {'kernel': ['rbf'], 'C': [2 ** x for x in exponents], 'gamma': [2 ** x for x in exponents],
+            'class_weight': [{0: w, 1: 1 - w} for w in [0.25, 0.5]]}
+
+
+def _create_backend(name, cores):
+    if name == 'spark':
+        from pyspark import SparkContext
+
+        return SparkBackend(SparkContext(master='local[%d]' % cores))
+    return ProcessPoolBackend(cores)
+
+
+def _peak_worker_mb(telemetry, backend_name):
+    """
+    :return: largest peak memory the search tasks recorded; without task records, the one of the reaped pool
+        processes for the local backend and None for Spark, whose Python workers are children of the JVM
+    """
+    peaks = [record['peak_rss_mb'] for record in telemetry.records if record.get('peak_rss_mb') is not None]
+    if peaks:
+        return max(peaks)
+    if backend_name == 'local':
+        return resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024.0
+    return None
+
+
+def _run(implementation, grid_size, cores, backend_name, data, connection):
+    # Runs in a fresh process so the peak memory figures belong to this configuration only
+    X, y, subjects = data
+    grid = benchmark_grid(grid_size)
+    cv = LabelKFold(subjects, n_folds=len(np.unique(subjects)))
+    svc = svm.SVC(probability=True, cache_size=2000)
+
+    backend = _create_backend(backend_name, cores)
+    telemetry = SearchTelemetry(verbose=0)
+    search = IMPLEMENTATIONS[implementation](backend, svc, grid, cv, telemetry)
+    start = time.time()
+    search.fit(X, y)
+    wall_time = time.time() - start
+    backend.stop()
+
+    n_candidates = int(np.prod([len(values) for values in grid.values()]))
+    if hasattr(search, 'rungs_'):
+        n_fits = sum(rung['n_fits'] for rung in search.rungs_)
+    elif hasattr(search, 'waves_'):
+        n_fits = sum(wave['n_fits'] for wave in search.waves_)
+    else:
+        n_fits = n_candidates * len(cv)
+
+    connection.send({'implementation': implementation, 'grid_size': grid_size, 'n_candidates': n_candidates,
+                     'n_folds': len(cv), 'n_fits': n_fits, 'cores': cores, 'backend': backend_name,
+                     'wall_time': wall_time, 'fits_per_sec': n_fits / wall_time,
+                     'peak_driver_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+                     'peak_worker_mb': _peak_worker_mb(telemetry, backend_name),
+                     'best_score': float(search.best_score_)})
+    connection.close()
+
+
+def run_configuration(implementation, grid_size, cores, backend_name, data):
+    """
+    Time one search implementation on one grid size and core count in a separate process
+
+    :param implementation: key of IMPLEMENTATIONS
+    :param grid_size: number of C values and of gamma values
+    :param cores: number of cores
+    :param backend_name: 'local' or 'spark'
+    :param data: features, labels and subjects
+    :return: result record
+    """
+    context = multiprocessing.get_context('fork')
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_run, args=(implementation, grid_size, cores, backend_name, data, sender))
+    process.start()
+    sender.close()
+    result = receiver.recv()
+    process.join()
+    return result
+
+
+def scaling_efficiency(results):
+    """
+    Add to every result its parallel efficiency relative to the run of the same implementation and grid size on
+    the fewest cores: 1.0 means the wall time dropped in proportion to the added cores
+
+    :param results: result records
+    :return: results
+    """
+    for result in results:
+        baseline = min((r for r in results if r['implementation'] == result['implementation'] and
+                        r['grid_size'] == result['grid_size']), key=lambda r: (r['cores'], r['wall_time']))
+        result['efficiency'] = baseline['wall_time'] * baseline['cores'] / (result['wall_time'] * result['cores'])
+    return results
+
+
+def cstress_benchmark_main(args):
+    X, y, subjects = make_cstress_dataset(args.subjects, args.windows, args.features, args.positiveFraction,
+                                          random_state=0)
+    environment = {'timestamp': time.time(), 'host': platform.node(), 'python': platform.python_version(),
+                   'numpy': np.__version__, 'sklearn': sklearn.__version__, 'cpu_count': multiprocessing.cpu_count(),
+                   'n_samples': len(y), 'n_features': X.shape[1]}
+
+    results = []
+    for implementation in args.implementations.split(','):
+        if implementation not in IMPLEMENTATIONS:
+            raise ValueError('Unknown implementation %s, expected one of %s' % (implementation,
+                                                                                 ', '.join(IMPLEMENTATIONS)))
+        for grid_size in [int(x) for x in args.gridSizes.split(',')]:
+            for cores in [int(x) for x in args.cores.split(',')]:
+                for _ in range(args.repeat):
+                    result = run_configuration(implementation, grid_size, cores, args.backend, (X, y, subjects))
+                    result.update(environment)
+                    results.append(result)
+                    worker = 'n/a' if result['peak_worker_mb'] is None else '%.0f MB' % result['peak_worker_mb']
+                    print("{implementation} grid {grid_size} ({n_fits} fits) on {cores} cores: {wall_time:.2f} s, "
+                          "{fits_per_sec:.1f} fits/s, peak {peak_driver_mb:.0f} MB driver, "
+                          "{worker} worker".format(worker=worker, **result))
+    scaling_efficiency(results)
+
+    print("implementation    grid  cores  wall time  fits/s  efficiency")
+    for result in results:
+        print("{implementation:<16}  {grid_size:>4}  {cores:>5}  {wall_time:>9.2f}  {fits_per_sec:>6.1f}  "
+              "{efficiency:>10.2f}".format(**result))
+
+    if args.output:
+        with open(args.output, 'a') as f:
+            for result in results:
+                f.write(json.dumps(result) + '\n')
+
+
+if __name__ == '__main__':
+    cstress_benchmark_main(parser.parse_args())
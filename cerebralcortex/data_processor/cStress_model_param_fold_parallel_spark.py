@@ -25,9 +25,9 @@
 
 import argparse
 import json
-from pathlib import Path
+import os
 from collections import Sized
-from collections import Counter
+from collections import OrderedDict
 import numpy as np
 import time
 
@@ -37,10 +37,27 @@ from sklearn.base import clone, is_classifier
 from sklearn.cross_validation import LabelKFold, check_cv, _fit_and_score
 from sklearn.grid_search import GridSearchCV, RandomizedSearchCV, ParameterSampler, ParameterGrid
 from sklearn.grid_search import _check_param_grid, _CVScoreTuple
+from sklearn.utils import check_random_state
 from sklearn.utils.validation import _num_samples, indexable
 from sklearn.metrics.scorer import check_scoring
-from pyspark.sql import SparkSession
-from pyspark import SparkContext
+
+from cerebralcortex.data_processor.model.backend import as_backend, create_backend
+from cerebralcortex.data_processor.model.bayes_opt import encode_candidates, propose_batch, wave_size
+from cerebralcortex.data_processor.model.calibration import fit_svc_platt, svc_platt_probability
+from cerebralcortex.data_processor.model.cascade import cascade_fit
+from cerebralcortex.data_processor.model.compact_model import CompactSVCModel
+from cerebralcortex.data_processor.model.dataset import load_features, load_stress_marks
+from cerebralcortex.data_processor.model.feature_selection import sequential_feature_selection
+from cerebralcortex.data_processor.model.halving import halving_schedule, fold_order, top_candidates
+from cerebralcortex.data_processor.model.kernel import rbf_kernel_matrix, precomputed_parameters, group_by_gamma
+from cerebralcortex.data_processor.model.memory import kernel_cache_size, peak_memory_mb, reset_peak_memory
+from cerebralcortex.data_processor.model.prescreen import prescreen_scores, rank_agreement
+from cerebralcortex.data_processor.model.reduction import reduction_report
+from cerebralcortex.data_processor.model.result_store import ResultStore, parameters_fingerprint
+from cerebralcortex.data_processor.model.scheduler import estimate_fit_cost, pack_tasks
+from cerebralcortex.data_processor.model.scorer import f1_bias_scorer_CV, two_bias_scorer_CV
+from cerebralcortex.data_processor.model.stress_labels import StressMarkIndex, label_windows
+from cerebralcortex.data_processor.model.telemetry import SearchTelemetry, estimated_fit_time, task_record
 
 # Command line parameter configuration
 parser = argparse.ArgumentParser(description='Train and evaluate the cStress model')
@@ -49,18 +66,69 @@ parser.add_argument('--featureFolder', dest='featureFolder', required=True,
 parser.add_argument('--scorer', type=str, required=True, dest='scorer',
                     help='Specify which scorer function to use (f1 or twobias)')
 parser.add_argument('--whichsearch', type=str, required=True, dest='whichsearch',
-                    help='Specify which search function to use (GridSearch or RandomizedSearch')
+                    help='Specify which search function to use (grid, halving, random or bayes)')
 parser.add_argument('--n_iter', type=int, required=False, dest='n_iter',
-                    help='If Randomized Search is used, how many iterations to use')
+                    help='If Randomized or Bayesian Search is used, how many iterations to use')
+parser.add_argument('--waveSize', type=int, required=False, dest='waveSize',
+                    help='If Bayesian Search is used, how many candidates each wave fits (fills the cores by default)')
 parser.add_argument('--modelOutput', type=str, required=True, dest='modelOutput',
                     help='Model file to write')
 parser.add_argument('--featureFile', type=str, required=True, dest='featureFile',
                     help='Feature vector file name')
 parser.add_argument('--stressFile', type=str, required=True, dest='stressFile',
                     help='Stress ground truth filename')
-args = parser.parse_args()
-
-sc = SparkContext()
+parser.add_argument('--precomputeKernel', action='store_true', dest='precomputeKernel',
+                    help='Share one precomputed RBF Gram matrix per gamma across all search tasks')
+parser.add_argument('--resultStore', type=str, required=False, dest='resultStore',
+                    help='Directory of memoized search results used to resume or extend earlier runs')
+parser.add_argument('--halvingFactor', type=int, required=False, dest='halvingFactor', default=3,
+                    help='If Halving Search is used, the fraction (1/factor) of candidates kept per rung')
+parser.add_argument('--minFolds', type=int, required=False, dest='minFolds', default=1,
+                    help='If Halving Search is used, how many subject folds the first rung evaluates')
+parser.add_argument('--fullGrid', action='store_true', dest='fullGrid',
+                    help='Search the original full-resolution cStress grid instead of the testing grid')
+parser.add_argument('--backend', type=str, required=False, dest='backend', default='spark',
+                    help='Where the search tasks run (spark or local)')
+parser.add_argument('--n_jobs', type=int, required=False, dest='n_jobs',
+                    help='If the local backend is used, how many worker processes to use (all cores by default)')
+parser.add_argument('--calibration', type=str, required=False, dest='calibration', default='libsvm',
+                    help='Probability calibration (libsvm: Platt cross-validation inside every fit, '
+                         'fast: a single Platt fit on the cross-subject decision values of the final model)')
+parser.add_argument('--modelFormat', type=str, required=False, dest='modelFormat', default='json',
+                    help='Model file format (json or npz, the compact format read by CompactSVCModel)')
+parser.add_argument('--cacheFolder', type=str, required=False, dest='cacheFolder',
+                    help='Directory of the parsed input cache (featureFolder/.cache by default)')
+parser.add_argument('--noCache', action='store_true', dest='noCache',
+                    help='Parse the feature and stress mark files without reading or writing the cache')
+parser.add_argument('--prescreenTopK', type=int, required=False, dest='prescreenTopK',
+                    help='If Grid Search is used, fit the exact SVC only for the k candidates ranked best by a '
+                         'linear SVM on Nystroem features')
+parser.add_argument('--prescreenComponents', type=int, required=False, dest='prescreenComponents', default=300,
+                    help='Rank of the Nystroem kernel approximation used for pre-screening')
+parser.add_argument('--memoryBudget', type=float, required=False, dest='memoryBudget',
+                    help='Memory in MB of one executor (or node with the local backend) used to size the SVC kernel '
+                         'cache of concurrent fits; detected when omitted, 0 keeps cache_size=2000')
+parser.add_argument('--featureSelection', type=str, required=False, dest='featureSelection',
+                    choices=['forward', 'backward'],
+                    help='After the search, select a feature subset for the best parameters by greedy forward or '
+                         'backward selection')
+parser.add_argument('--selectFeatures', type=int, required=False, dest='selectFeatures',
+                    help='Number of features the selection stops at; by default it stops when a step does not '
+                         'improve the cross-validation score')
+parser.add_argument('--reduceTolerance', type=float, required=False, dest='reduceTolerance',
+                    help='Also emit a model with fewer support vectors whose F1 drops by at most this much')
+parser.add_argument('--reducedModelOutput', type=str, required=False, dest='reducedModelOutput',
+                    help='Output file of the reduced model, defaults to modelOutput with a .reduced suffix')
+parser.add_argument('--cascadePartitions', type=int, required=False, dest='cascadePartitions',
+                    help='Final model only: train the exported model with the best parameters by a cascade of '
+                         'SVMs on this many partitions of the training data instead of a full fit. The search '
+                         'still fits every candidate on whole folds; implies fast calibration')
+parser.add_argument('--cascadeIterations', type=int, required=False, dest='cascadeIterations', default=5,
+                    help='Maximum number of passes through the SVM cascade')
+parser.add_argument('--telemetryLog', type=str, required=False, dest='telemetryLog',
+                    help='JSONL file receiving fit time, support vectors, train size and score of every fit')
+parser.add_argument('--progressInterval', type=float, required=False, dest='progressInterval', default=10.0,
+                    help='Seconds between progress, throughput and ETA lines during the search')
 
 
 def cv_fit_and_score(estimator, X, y, scorer, parameters, cv, ):
@@ -102,83 +170,37 @@ def decode_label(label):
     return mapping[label]
 
 
-def read_features(folder, filename):
-    features = []
-
-    path = Path(folder)
-    files = list(path.glob('**/' + filename))
-
-    for f in files:
-        participant_id = int(f.parent.name[2:])
-        with f.open() as file:
-            for line in file.readlines():
-                parts = [x.strip() for x in line.split(',')]
-                feature_vector = [participant_id, int(parts[0])]
-                feature_vector.extend([float(p) for p in parts[1:]])
-                features.append(feature_vector)
-    return features
-
-
-def read_stress_marks(folder, filename):
-    features = []
-
-    path = Path(folder)
-    files = list(path.glob('**/' + filename))
-
-    for f in files:
-        participantID = int(f.parent.name[2:])
-
-        with f.open() as file:
-            for line in file.readlines():
-                parts = [x.strip() for x in line.split(',')]
-                label = parts[0][:2]
-                features.append([participantID, label, int(parts[2]), int(parts[3])])
-
-    return features
-
-
-def check_stress_mark(stress_mark, pid, start_time):
-    end_time = start_time + 60000  # One minute windows
-    result = []
-    for line in stress_mark:
-        [id_index, gt, st, et] = line
+def read_features(folder, filename, cache_dir=None):
+    """
+    :param folder: directory with one sub folder per participant
+    :param filename: feature file name
+    :param cache_dir: columnar cache directory, None disables caching
+    :return: participant ids, timestamps and feature matrix as parallel arrays
+    """
+    return load_features(folder, filename, cache_dir=cache_dir)
 
-        if id_index == pid and (gt not in ['c7']):
-            if (start_time > st) and (end_time < et):
-                result.append(gt)
 
-    data = Counter(result)
-    return data.most_common(1)
+def read_stress_marks(folder, filename, cache_dir=None):
+    """
+    :param folder: directory with one sub folder per participant
+    :param filename: stress mark file name
+    :param cache_dir: columnar cache directory, None disables caching
+    :return: participant ids, label codes, start times and end times of the marks as parallel arrays
+    """
+    return load_stress_marks(folder, filename, cache_dir=cache_dir)
 
 
 def analyze_events_with_features(features, stress_marks):
-    feature_labels = []
-    final_features = []
-    subjects = []
-
-    start_times = {}
-    for pid, label, start, end in stress_marks:
-        if label == 'c4':
-            if pid not in start_times:
-                start_times[pid] = np.inf
+    participant_ids, timestamps, feature_matrix = features
+    mark_participant_ids, mark_labels, mark_starts, mark_ends = stress_marks
 
-            start_times[pid] = min(start_times[pid], start)
+    index = StressMarkIndex(mark_participant_ids, mark_labels, mark_starts, mark_ends)
+    labels = label_windows(index, participant_ids, timestamps)
+    labeled = np.flatnonzero(labels != '')
 
-    for line in features:
-        id_index = line[0]
-        ts = line[1]
-        f = line[2:]
-
-        if ts < start_times[id_index]:
-            continue  # Outside of starting time
-
-        label = check_stress_mark(stress_marks, id_index, ts)
-        if len(label) > 0:
-            stress_class = decode_label(label[0][0])
-
-            feature_labels.append(stress_class)
-            final_features.append(f)
-            subjects.append(id_index)
+    final_features = feature_matrix[labeled]
+    feature_labels = [decode_label(label) for label in labels[labeled].tolist()]
+    subjects = participant_ids[labeled].tolist()
 
     return final_features, feature_labels, subjects
 
@@ -206,99 +228,6 @@ def reduce_data(data, r):
     return result
 
 
-def f1_bias_scorer(estimator, X, y, ret_bias=False):
-    probas_ = estimator.predict_proba(X)
-    precision, recall, thresholds = metrics.precision_recall_curve(y, probas_[:, 1])
-    bias = 0.0
-    f1 = 0.0
-    for i in range(0, len(thresholds)):
-        if not (precision[i] == 0 and recall[i] == 0):
-            f = 2 * (precision[i] * recall[i]) / (precision[i] + recall[i])
-            if f > f1:
-                f1 = f
-                bias = thresholds[i]
-
-    if ret_bias:
-        return f1, bias
-    else:
-        return f1
-
-
-def two_bias_scorer_CV(probs, y, ret_bias=False):
-    db = np.transpose(np.vstack([probs, y]))
-    db = db[np.argsort(db[:, 0]), :]
-
-    pos = np.sum(y == 1)
-    n = len(y)
-    neg = n - pos
-    tp, tn = pos, 0
-    lost = 0
-
-    optbias = []
-    minloss = 1
-
-    for i in range(n):
-        # p = db[i,1]
-        if db[i, 1] == 1:  # positive
-            tp -= 1.0
-        else:
-            tn += 1.0
-
-        # v1 = tp/pos
-        # v2 = tn/neg
-
-        if tp / pos >= 0.95 and tn / neg >= 0.95:
-            optbias = [db[i, 0], db[i, 0]]
-            continue
-
-        running_pos = pos
-        running_neg = neg
-        running_tp = tp
-        running_tn = tn
-
-        for j in range(i + 1, n):
-            # p1 = db[j,1]
-            if db[j, 1] == 1:  # positive
-                running_tp -= 1.0
-                running_pos -= 1
-            else:
-                running_neg -= 1
-
-            lost = (j - i) * 1.0 / n
-            if running_pos == 0 or running_neg == 0:
-                break
-
-            # v1 = running_tp/running_pos
-            # v2 = running_tn/running_neg
-
-            if running_tp / running_pos >= 0.95 and running_tn / running_neg >= 0.95 and lost < minloss:
-                minloss = lost
-                optbias = [db[i, 0], db[j, 0]]
-
-    if ret_bias:
-        return -minloss, optbias
-    else:
-        return -minloss
-
-
-def f1_bias_scorer_CV(probs, y, ret_bias=False):
-    precision, recall, thresholds = metrics.precision_recall_curve(y, probs)
-
-    f1 = 0.0
-    bias = 0.0
-    for i in range(0, len(thresholds)):
-        if not (precision[i] == 0 and recall[i] == 0):
-            f = 2 * (precision[i] * recall[i]) / (precision[i] + recall[i])
-            if f > f1:
-                f1 = f
-                bias = thresholds[i]
-
-    if ret_bias:
-        return f1, bias
-    else:
-        return f1
-
-
 def svm_output(filename, traindata, trainlabels):
     with open(filename, 'w') as f:
         for i in range(0, len(trainlabels)):
@@ -309,7 +238,7 @@ def svm_output(filename, traindata, trainlabels):
             f.write("\n")
 
 
-def save_model(filename, model, normparams, bias=0.5):
+def save_model(filename, model, normparams, bias=0.5, probA=None, probB=None):
     class Object:
         def to_JSON(self):
             return json.dumps(self, default=lambda o: o.__dict__,
@@ -347,7 +276,11 @@ def save_model(filename, model, normparams, bias=0.5):
             self.support = support
             self.normparams = normparams
 
-    model = SVCModel('cStress', 'svc', model.intercept_[0], bias, model.probA_[0], model.probB_[0],
+    # Platt parameters fitted outside of libsvm (fast calibration) take precedence over the estimator's own
+    if probA is None or probB is None:
+        probA, probB = model.probA_[0], model.probB_[0]
+
+    model = SVCModel('cStress', 'svc', model.intercept_[0], bias, probA, probB,
                      Kernel('rbf', [KernelParam('gamma', model._gamma)]),
                      [Support(model.dual_coef_[0][i], list(model.support_vectors_[i])) for i in
                       range(len(model.dual_coef_[0]))],
@@ -368,12 +301,318 @@ def cross_val_probs(estimator, X, y, cv):
 
     return predicted_values
 
+
+def cross_val_decision(estimator, X, y, cv):
+    predicted_values = np.zeros(len(y))
+
+    for train, test in cv:
+        predicted_values[test] = estimator.fit(X[train], y[train]).decision_function(X[test])
+
+    return predicted_values
+
+
+def _out_of_fold_values(estimator, X_test):
+    """
+    :return: probability of the positive class for an estimator with probability=True, decision values otherwise
+    """
+    if estimator.get_params().get('probability', True):
+        return estimator.predict_proba(X_test)[:, 1]
+    return estimator.decision_function(X_test)
+
+
+def _make_local_fit(base_estimator, data_bc, y_bc, params_bc, folds_bc, scorer, verbose, fit_params, error_score,
+                    precomputed, result_store=None, dataset_digest=None, accumulator=None, memory_budget=None,
+                    concurrent_tasks=1):
+    fas = _fit_and_score
+
+    def local_fit(tup):
+        (param_id, fold_id) = tup
+        parameters = params_bc.value[param_id]
+        train, test = folds_bc.value[fold_id]
+        if result_store is not None:
+            key = result_store.key(dataset_digest, parameters, train, test)
+            res = result_store.get(key)
+            if res is not None:
+                return tup, (res, None)
+
+        local_estimator = clone(base_estimator)
+        local_X = data_bc.value
+        local_y = y_bc.value
+        # A precomputed Gram matrix is sliced to the fold by _fit_and_score since the estimator is pairwise
+        local_parameters = precomputed_parameters(parameters) if precomputed else parameters
+        cache_size = local_estimator.get_params().get('cache_size')
+        if memory_budget is not None:
+            cache_size = kernel_cache_size(len(train), local_X.shape[1], memory_budget, concurrent_tasks)
+            local_parameters = dict(local_parameters, cache_size=cache_size)
+
+        stats = {'score_time': 0.0, 'n_support': 0, 'values': None}
+
+        def local_scorer(estimator, X_test, y_test):
+            # The held out predictions are kept so the best candidate's fold models need no second fit
+            score_start = time.time()
+            score = scorer(estimator, X_test, y_test)
+            stats['values'] = _out_of_fold_values(estimator, X_test)
+            stats['score_time'] = time.time() - score_start
+            stats['n_support'] = int(np.sum(getattr(estimator, 'n_support_', 0)))
+            return score
+
+        if accumulator is not None:
+            reset_peak_memory()
+        start = time.time()
+        res = fas(local_estimator, local_X, local_y, local_scorer, train, test, verbose,
+                  local_parameters, fit_params,
+                  return_parameters=True, error_score=error_score)
+        res[-1] = parameters
+
+        if accumulator is not None:
+            accumulator.add([task_record(param_id * len(folds_bc.value) + fold_id, parameters,
+                                         time.time() - start - stats['score_time'], stats['score_time'], res[0],
+                                         len(train), len(test), stats['n_support'], peak_memory_mb(), cache_size)])
+        if result_store is not None:
+            result_store.put(key, res)
+        return tup, (res, stats['values'])
+
+    return local_fit
+
+
+def _memory_budget(search, backend):
+    """
+    :return: memory budget in MB per executor or node for sizing kernel caches, None to keep the estimator's
+    """
+    if search.memory_budget == 0:
+        return None
+    return search.memory_budget or backend.memory_budget_mb()
+
+
+def _unique_candidates(candidates):
+    """
+    :param candidates: list of candidate parameter dicts, possibly with repeats
+    :return: list of distinct candidates and the position of every candidate in it
+    """
+    unique = OrderedDict()
+    param_ids = [unique.setdefault(parameters_fingerprint(parameters), (len(unique), parameters))[0]
+                 for parameters in candidates]
+    return [parameters for _, parameters in unique.values()], param_ids
+
+
+def _parallel_fit_and_score(search, base_estimator, X, y, candidates, cv):
+    """
+    Fit and score every (candidate, fold) pair of a search on its SparkContext or backend
+
+    The folds and the distinct candidates are broadcast once per call and every task only carries a
+    (param_id, fold_id) pair, so neither index arrays nor parameter dicts are pickled per task. A candidate
+    repeated in candidates, as a random search can sample, is fitted once.
+
+    With search.precompute_kernel the candidates are scheduled by gamma: one RBF Gram matrix of the full data
+    is computed and broadcast per gamma, and every C/class_weight/fold task sharing that gamma fits on its
+    train/test submatrix with kernel='precomputed'.
+
+    With search.result_store, results already in the store are reused and every newly computed result is
+    written to it as soon as its task finishes.
+
+    Every fit also returns the out-of-fold values of its test fold (positive class probabilities for an estimator
+    with probability=True, decision values otherwise), which are collected per candidate in
+    search.cv_predictions_ for _parallel_refit. That is one float per sample and candidate on the driver; results
+    reused from the store carry no predictions.
+
+    Tasks are packed into search.n_partitions partitions (default four per core) by estimated fit cost, grouped
+    by gamma, or by fold when the Gram matrix is shared, and ordered so the expensive fits start first.
+
+    With search.telemetry, every task adds a record of its fit time, support vector count, train size, score
+    and peak memory to a backend accumulator that the telemetry follows while the job runs.
+
+    Unless search.memory_budget is 0, the libsvm cache_size of every fit is sized by kernel_cache_size from
+    search.memory_budget (MB per executor or node, detected from the backend when None), the number of tasks the
+    backend runs at once per executor and the fit's training set size.
+
+    :param search: GridSearchCVSparkParallel or RandomGridSearchCVSparkParallel
+    :param base_estimator: unfitted clone of the search estimator
+    :param X: training data
+    :param y: training labels
+    :param candidates: list of candidate parameter dicts
+    :param cv: cross-validation folds
+    :return: _fit_and_score results ordered by candidate, then fold
+    """
+    folds = list(cv)
+    if not hasattr(search, 'cv_predictions_'):
+        search.cv_predictions_ = {}
+    n_folds = len(folds)
+    unique, param_ids = _unique_candidates(candidates)
+    # (param_id, fold_id) -> _fit_and_score result
+    results = {}
+
+    result_store = search.result_store
+    dataset_digest = None
+    if result_store is not None:
+        dataset_digest = result_store.dataset_digest(X, y, base_estimator, search.scorer_)
+        for param_id, parameters in enumerate(unique):
+            for fold_id, (train, test) in enumerate(folds):
+                res = result_store.get(result_store.key(dataset_digest, parameters, train, test))
+                if res is not None:
+                    results[(param_id, fold_id)] = res
+
+        if search.verbose > 0:
+            print("Reusing {0} of {1} fits from {2}".format(len(results), len(unique) * n_folds, result_store.path))
+
+    pending = [param_id for param_id in range(len(unique))
+               if any((param_id, fold_id) not in results for fold_id in range(n_folds))]
+
+    if search.precompute_kernel:
+        groups = group_by_gamma([unique[param_id] for param_id in pending], base_estimator, X.shape[1])
+        groups = OrderedDict((gamma, [pending[i] for i in indices]) for gamma, indices in groups.items())
+    else:
+        groups = OrderedDict([(None, pending)] if pending else [])
+
+    backend = as_backend(search.sc)
+    n_partitions = search.n_partitions or 4 * backend.parallelism
+    memory_budget = _memory_budget(search, backend)
+
+    y_bc = backend.broadcast(y)
+    params_bc = backend.broadcast(unique)
+    folds_bc = backend.broadcast(folds)
+    for gamma, group in groups.items():
+        if gamma is None:
+            data_bc = backend.broadcast(X)
+        else:
+            data_bc = backend.broadcast(rbf_kernel_matrix(X, gamma=gamma))
+
+        tasks = [(param_id, fold_id) for param_id in group for fold_id in range(n_folds)
+                 if (param_id, fold_id) not in results]
+
+        costs = [estimate_fit_cost(unique[param_id], len(folds[fold_id][0]), X.shape[1], gamma is not None)
+                 for param_id, fold_id in tasks]
+        if gamma is None:
+            partitions = pack_tasks(tasks, costs, n_partitions, lambda task: repr(unique[task[0]].get('gamma')))
+        else:
+            partitions = pack_tasks(tasks, costs, n_partitions, lambda task: task[1])
+
+        telemetry = search.telemetry
+        accumulator = backend.accumulator() if telemetry is not None else None
+        local_fit = _make_local_fit(base_estimator, data_bc, y_bc, params_bc, folds_bc, search.scorer_,
+                                    search.verbose, search.fit_params, search.error_score, gamma is not None,
+                                    result_store, dataset_digest, accumulator, memory_budget,
+                                    backend.concurrent_tasks)
+        if telemetry is not None:
+            with telemetry.track(accumulator, len(tasks)):
+                job_results = backend.run_tasks(local_fit, partitions)
+        else:
+            job_results = backend.run_tasks(local_fit, partitions)
+        for (param_id, fold_id), (res, values) in job_results:
+            results[(param_id, fold_id)] = res
+            if values is not None:
+                _add_cv_predictions(search, unique[param_id], folds[fold_id][1], values, len(y))
+
+        data_bc.unpersist()
+    folds_bc.unpersist()
+    params_bc.unpersist()
+    y_bc.unpersist()
+
+    # Because the original python code expects a certain order for the elements
+    return [results[(param_id, fold_id)] for param_id in param_ids for fold_id in range(n_folds)]
+
+
+def _add_cv_predictions(search, parameters, test, values, n_samples):
+    predictions, covered = search.cv_predictions_.setdefault(
+        parameters_fingerprint(parameters), (np.zeros(n_samples), np.zeros(n_samples, dtype=bool)))
+    predictions[test] = values
+    covered[test] = True
+
+
+def _make_local_refit(base_estimator, data_bc, y_bc, parameters, fit_params, memory_budget=None, concurrent_tasks=1):
+    def local_refit(tup):
+        (index, (train, test)) = tup
+        local_estimator = clone(base_estimator).set_params(**parameters)
+        local_X = data_bc.value
+        local_y = y_bc.value
+        if memory_budget is not None:
+            n_train = len(local_y) if train is None else len(train)
+            local_estimator.set_params(cache_size=kernel_cache_size(n_train, local_X.shape[1], memory_budget,
+                                                                    concurrent_tasks))
+        if train is None:
+            return index, local_estimator.fit(local_X, local_y, **fit_params)
+
+        local_estimator.fit(local_X[train], local_y[train], **fit_params)
+        return index, _out_of_fold_values(local_estimator, local_X[test])
+
+    return local_refit
+
+
+def _parallel_refit(search, base_estimator, X, y, parameters, cv):
+    """
+    Refit the best candidate on all the data and collect its out-of-fold predictions
+
+    Sets search.best_estimator_ and, for an estimator with probability=True, search.best_cv_probs_, the
+    probability of the positive class of every sample from the fold model that did not train on it, as
+    cross_val_probs computes; otherwise search.best_cv_decision_, the out-of-fold decision values as
+    cross_val_decision computes. The predictions come from the search's own fold fits in search.cv_predictions_;
+    only folds without them, such as results reused from a result store, are fitted again, in the same parallel
+    job as the full refit. With search.refit == 'folds' the full refit is skipped and search.best_estimator_ is not
+    set, for callers that train the final model another way.
+
+    :param search: fitted search
+    :param base_estimator: unfitted clone of the search estimator
+    :param X: training data
+    :param y: training labels
+    :param parameters: parameters of the best candidate
+    :param cv: cross-validation folds
+    """
+    folds = list(cv)
+    predicted_values, covered = getattr(search, 'cv_predictions_', {}).get(
+        parameters_fingerprint(parameters), (np.zeros(len(y)), np.zeros(len(y), dtype=bool)))
+    predicted_values = predicted_values.copy()
+
+    tasks = [(index, (train, test)) for index, (train, test) in enumerate(folds) if not covered[test].all()]
+    if search.refit != 'folds':
+        # The refit trains on the most samples, so it goes first
+        tasks = [(-1, (None, None))] + tasks
+    results = {}
+    if tasks:
+        backend = as_backend(search.sc)
+        data_bc = backend.broadcast(X)
+        y_bc = backend.broadcast(y)
+        local_refit = _make_local_refit(base_estimator, data_bc, y_bc, parameters, search.fit_params,
+                                        _memory_budget(search, backend), backend.concurrent_tasks)
+        results = dict(backend.run_tasks(local_refit, [[task] for task in tasks]))
+        data_bc.unpersist()
+        y_bc.unpersist()
+
+    for index, (train, test) in enumerate(folds):
+        if index in results:
+            predicted_values[test] = results[index]
+
+    if search.refit != 'folds':
+        search.best_estimator_ = results[-1]
+    if base_estimator.get_params().get('probability', True):
+        search.best_cv_probs_ = predicted_values
+    else:
+        search.best_cv_decision_ = predicted_values
+
+
+def _mean_fold_score(fold_results, iid):
+    """
+    Mean validation score of one candidate from its _fit_and_score fold results, weighted by the number of
+    test samples when iid
+    """
+    n_test_samples = 0
+    score = 0
+    for this_score, this_n_test_samples, _, _ in fold_results:
+        if iid:
+            this_score *= this_n_test_samples
+            n_test_samples += this_n_test_samples
+        score += this_score
+    if iid:
+        return score / float(n_test_samples)
+    return score / float(len(fold_results))
+
+
 # parallel grid search(fit and cv) over each fold in data set for each parameter for all possible combination
-# in a given range of parameters on apache spark platform
+# in a given range of parameters on apache spark platform, or on a local process pool when sc is a backend
 class GridSearchCVSparkParallel(GridSearchCV):
     def __init__(self, sc, estimator, param_grid, scoring=None,
                  fit_params=None, n_jobs=1, iid=True, refit=True, cv=None, verbose=0,
-                 pre_dispatch='2*n_jobs', error_score='raise'):
+                 pre_dispatch='2*n_jobs', error_score='raise', precompute_kernel=False,
+                 result_store=None, n_partitions=None, telemetry=None, memory_budget=None, prescreen_top_k=None,
+                 prescreen_components=300):
         super(GridSearchCVSparkParallel, self).__init__(
             estimator=estimator, param_grid=param_grid, scoring=scoring,
             fit_params=fit_params, n_jobs=n_jobs, iid=iid, refit=refit, cv=cv, verbose=verbose,
@@ -381,6 +620,13 @@ class GridSearchCVSparkParallel(GridSearchCV):
 
         self.sc = sc
         self.param_grid = param_grid
+        self.precompute_kernel = precompute_kernel
+        self.result_store = result_store
+        self.n_partitions = n_partitions
+        self.telemetry = telemetry
+        self.memory_budget = memory_budget
+        self.prescreen_top_k = prescreen_top_k
+        self.prescreen_components = prescreen_components
         self.scorer_ = check_scoring(self.estimator, scoring=self.scoring)
         # self.grid_scores_ = None
         # _check_param_grid(param_grid)
@@ -413,39 +659,24 @@ class GridSearchCVSparkParallel(GridSearchCV):
                                          n_candidates * len(cv)))
 
         base_estimator = clone(self.estimator)
+        self.cv_predictions_ = {}
         # pre_dispatch = self.pre_dispatch
 
-        param_grid = [(parameters, train, test)
-                      for parameters in parameter_iterable
-                      for (train, test) in cv]
-
-        # Because the original python code expects a certain order for the elements
-        indexed_param_grid = list(zip(range(len(param_grid)), param_grid))
-        par_param_grid = self.sc.parallelize(indexed_param_grid, len(indexed_param_grid))
-        X_bc = self.sc.broadcast(X)
-        y_bc = self.sc.broadcast(y)
-
-        scorer = self.scorer_
-        verbose = self.verbose
-        fit_params = self.fit_params
-        error_score = self.error_score
-        fas = _fit_and_score
-
-        def local_fit(tup):
-            (index, (parameters, train, test)) = tup
-            local_estimator = clone(base_estimator)
-            local_X = X_bc.value
-            local_y = y_bc.value
-            res = fas(local_estimator, local_X, local_y, scorer, train, test, verbose,
-                      parameters, fit_params,
-                      return_parameters=True, error_score=error_score)
-            return index, res
-
-        indexed_output = dict(par_param_grid.map(local_fit).collect())
-        out = [indexed_output[idx] for idx in range(len(param_grid))]
-
-        X_bc.unpersist()
-        y_bc.unpersist()
+        candidates = list(parameter_iterable)
+        screened = None
+        if self.prescreen_top_k is not None and self.prescreen_top_k < len(candidates):
+            # rank every candidate by a linear SVM on Nystroem features and fit the exact SVC for the top k only
+            self.prescreen_scores_ = prescreen_scores(as_backend(self.sc), X, y, candidates, list(cv), self.scorer_,
+                                                      base_estimator, self.prescreen_components, random_state=0,
+                                                      n_partitions=self.n_partitions)
+            screened = sorted(top_candidates(list(range(len(candidates))), self.prescreen_scores_,
+                                             self.prescreen_top_k))
+            candidates = [candidates[i] for i in screened]
+            if self.verbose > 0:
+                print("Pre-screening kept {0} of {1} candidates, totalling {2} exact fits".format(
+                    len(candidates), len(parameter_iterable), len(candidates) * len(cv)))
+
+        out = _parallel_fit_and_score(self, base_estimator, X, y, candidates, cv)
 
         # Out is a list of triplet: score, estimator, n_test_samples
         n_fits = len(out)
@@ -477,6 +708,13 @@ class GridSearchCVSparkParallel(GridSearchCV):
         # Store the computed scores
         self.grid_scores_ = grid_scores
 
+        if screened is not None:
+            self.prescreen_agreement_ = rank_agreement(self.prescreen_scores_[screened],
+                                                       [score.mean_validation_score for score in grid_scores])
+            if self.verbose > 0:
+                print("Pre-screening rank agreement on the kept candidates: Spearman {spearman:.3f}, "
+                      "Kendall {kendall:.3f}, same best candidate {same_best}".format(**self.prescreen_agreement_))
+
         # Find the best parameters by comparing on the mean validation score:
         # note that `sorted` is deterministic in the way it breaks ties
         best = sorted(grid_scores, key=lambda x: x.mean_validation_score,
@@ -485,15 +723,102 @@ class GridSearchCVSparkParallel(GridSearchCV):
         self.best_score_ = best.mean_validation_score
 
         if self.refit:
-            # fit the best estimator using the entire dataset
-            # clone first to work around broken estimators
-            best_estimator = clone(base_estimator).set_params(
-                **best.parameters)
-            if y is not None:
-                best_estimator.fit(X, y, **self.fit_params)
-            else:
-                best_estimator.fit(X, **self.fit_params)
-            self.best_estimator_ = best_estimator
+            # fit the best estimator using the entire dataset, in parallel with its cross-validation predictions
+            _parallel_refit(self, base_estimator, X, y, best.parameters, cv)
+        return self
+
+
+# parallel successive-halving search over a parameter grid: every candidate is scored on a few subject folds and
+# only the best 1/factor is carried on to factor times as many folds, until the survivors see every fold
+class HalvingGridSearchCVSparkParallel(GridSearchCVSparkParallel):
+    def __init__(self, sc, estimator, param_grid, factor=3, min_folds=1, random_state=None, scoring=None,
+                 fit_params=None, n_jobs=1, iid=True, refit=True, cv=None, verbose=0,
+                 pre_dispatch='2*n_jobs', error_score='raise', precompute_kernel=False,
+                 result_store=None, n_partitions=None, telemetry=None, memory_budget=None):
+        super(HalvingGridSearchCVSparkParallel, self).__init__(
+            sc, estimator=estimator, param_grid=param_grid, scoring=scoring,
+            fit_params=fit_params, n_jobs=n_jobs, iid=iid, refit=refit, cv=cv, verbose=verbose,
+            pre_dispatch=pre_dispatch, error_score=error_score, precompute_kernel=precompute_kernel,
+            result_store=result_store, n_partitions=n_partitions, telemetry=telemetry,
+            memory_budget=memory_budget)
+
+        self.factor = factor
+        self.min_folds = min_folds
+        self.random_state = random_state
+
+    def fit(self, X, y):
+        """Actual fitting,  performing successive halving over parameters and folds."""
+
+        estimator = self.estimator
+        cv = self.cv
+
+        n_samples = _num_samples(X)
+        X, y = indexable(X, y)
+
+        candidates = list(ParameterGrid(self.param_grid))
+
+        if y is not None:
+            if len(y) != n_samples:
+                raise ValueError('Target variable (y) has a different number '
+                                 'of samples (%i) than data (X: %i samples)'
+                                 % (len(y), n_samples))
+        cv = check_cv(cv, X, y, classifier=is_classifier(estimator))
+        folds = list(cv)
+
+        order = fold_order(len(folds), self.random_state)
+        schedule = halving_schedule(len(candidates), len(folds), self.factor, self.min_folds)
+
+        if self.verbose > 0:
+            print("Successive halving of {0} candidates over {1} folds in {2} rungs, totalling at most"
+                  " {3} fits".format(len(candidates), len(folds), len(schedule),
+                                     sum(n * f for n, f in schedule)))
+
+        base_estimator = clone(self.estimator)
+        self.cv_predictions_ = {}
+
+        # (candidate index, fold index) -> _fit_and_score result, reused by later rungs
+        results = {}
+        survivors = list(range(len(candidates)))
+        survivor_scores = None
+        evaluated_folds = 0
+        self.rungs_ = []
+        for n_keep, n_folds in schedule:
+            if survivor_scores is not None:
+                survivors = top_candidates(survivors, survivor_scores, n_keep)
+
+            new_folds = list(order[evaluated_folds:n_folds])
+            out = _parallel_fit_and_score(self, base_estimator, X, y, [candidates[i] for i in survivors],
+                                          [folds[f] for f in new_folds])
+            for position, res in enumerate(out):
+                candidate, fold = divmod(position, len(new_folds))
+                results[(survivors[candidate], new_folds[fold])] = res
+            evaluated_folds = n_folds
+
+            survivor_scores = [_mean_fold_score([results[(i, f)] for f in order[:n_folds]], self.iid)
+                               for i in survivors]
+            self.rungs_.append({'n_candidates': len(survivors), 'n_folds': n_folds, 'n_fits': len(out),
+                                'best_score': max(survivor_scores)})
+            if self.verbose > 0:
+                print("Rung {0}: {1} candidates on {2} folds, best score {3}".format(
+                    len(self.rungs_), len(survivors), n_folds, max(survivor_scores)))
+
+        # Every candidate keeps the scores of the folds it reached; only the last rung saw all folds
+        grid_scores = list()
+        for index, parameters in enumerate(candidates):
+            fold_results = [results[(index, f)] for f in order if (index, f) in results]
+            grid_scores.append(_CVScoreTuple(
+                parameters,
+                _mean_fold_score(fold_results, self.iid),
+                np.array([res[0] for res in fold_results])))
+        self.grid_scores_ = grid_scores
+
+        best = grid_scores[top_candidates(survivors, survivor_scores, 1)[0]]
+        self.best_params_ = best.parameters
+        self.best_score_ = best.mean_validation_score
+
+        if self.refit:
+            # fit the best estimator using the entire dataset, in parallel with its cross-validation predictions
+            _parallel_refit(self, base_estimator, X, y, best.parameters, folds)
         return self
 
 
@@ -502,7 +827,8 @@ class GridSearchCVSparkParallel(GridSearchCV):
 class RandomGridSearchCVSparkParallel(RandomizedSearchCV):
     def __init__(self, sc, estimator, param_distributions, n_iter, scoring=None, fit_params=None,
                  n_jobs=1, iid=True, refit=True, cv=None, verbose=0,
-                 pre_dispatch='2*n_jobs', random_state=None, error_score='raise'):
+                 pre_dispatch='2*n_jobs', random_state=None, error_score='raise', precompute_kernel=False,
+                 result_store=None, n_partitions=None, telemetry=None, memory_budget=None):
         super(RandomGridSearchCVSparkParallel, self).__init__(
             estimator=estimator, param_distributions=param_distributions, n_iter=n_iter, scoring=scoring,
             random_state=random_state,
@@ -511,6 +837,11 @@ class RandomGridSearchCVSparkParallel(RandomizedSearchCV):
         self.sc = sc
         self.param_distributions = param_distributions
         self.n_iter = n_iter
+        self.precompute_kernel = precompute_kernel
+        self.result_store = result_store
+        self.n_partitions = n_partitions
+        self.telemetry = telemetry
+        self.memory_budget = memory_budget
         self.scorer_ = check_scoring(self.estimator, scoring=self.scoring)
         # self.grid_scores_ = None
         # _check_param_grid(param_distributions)
@@ -539,39 +870,10 @@ class RandomGridSearchCVSparkParallel(RandomizedSearchCV):
                                          n_candidates * len(cv)))
 
         base_estimator = clone(self.estimator)
+        self.cv_predictions_ = {}
         # pre_dispatch = self.pre_dispatch
 
-        param_grid = [(parameters, train, test)
-                      for parameters in parameter_iterable
-                      for (train, test) in cv]
-        # Because the original python code expects a certain order for the elements
-        indexed_param_grid = list(zip(range(len(param_grid)), param_grid))
-        par_param_grid = self.sc.parallelize(indexed_param_grid, len(indexed_param_grid))
-        X_bc = self.sc.broadcast(X)
-        y_bc = self.sc.broadcast(y)
-
-        scorer = self.scorer_
-        verbose = self.verbose
-        fit_params = self.fit_params
-        error_score = self.error_score
-        fas = _fit_and_score
-
-        def local_fit(tup):
-            (index, (parameters, train, test)) = tup
-            local_estimator = clone(base_estimator)
-            local_X = X_bc.value
-            local_y = y_bc.value
-
-            res = fas(local_estimator, local_X, local_y, scorer, train, test, verbose,
-                      parameters, fit_params,
-                      return_parameters=True, error_score=error_score)
-            return index, res
-
-        indexed_output = dict(par_param_grid.map(local_fit).collect())
-        out = [indexed_output[idx] for idx in range(len(param_grid))]
-
-        X_bc.unpersist()
-        y_bc.unpersist()
+        out = _parallel_fit_and_score(self, base_estimator, X, y, list(parameter_iterable), cv)
 
         # Out is a list of triplet: score, estimator, n_test_samples
         n_fits = len(out)
@@ -612,15 +914,100 @@ class RandomGridSearchCVSparkParallel(RandomizedSearchCV):
         self.best_score_ = best.mean_validation_score
 
         if self.refit:
-            # fit the best estimator using the entire dataset
-            # clone first to work around broken estimators
-            best_estimator = clone(base_estimator).set_params(
-                **best.parameters)
-            if y is not None:
-                best_estimator.fit(X, y, **self.fit_params)
+            # fit the best estimator using the entire dataset, in parallel with its cross-validation predictions
+            _parallel_refit(self, base_estimator, X, y, best.parameters, cv)
+        return self
+
+
+# parallel adaptive search over a parameter grid: after a random first wave, every wave fits the candidates a
+# Gaussian process surrogate of the mean fold score expects to improve most, sized to keep every executor busy
+class BayesianGridSearchCVSparkParallel(RandomGridSearchCVSparkParallel):
+    def __init__(self, sc, estimator, param_distributions, n_iter, n_initial=None, wave_size=None, scoring=None,
+                 fit_params=None, n_jobs=1, iid=True, refit=True, cv=None, verbose=0,
+                 pre_dispatch='2*n_jobs', random_state=None, error_score='raise', precompute_kernel=False,
+                 result_store=None, n_partitions=None, telemetry=None, memory_budget=None):
+        super(BayesianGridSearchCVSparkParallel, self).__init__(
+            sc, estimator=estimator, param_distributions=param_distributions, n_iter=n_iter, scoring=scoring,
+            fit_params=fit_params, n_jobs=n_jobs, iid=iid, refit=refit, cv=cv, verbose=verbose,
+            pre_dispatch=pre_dispatch, random_state=random_state, error_score=error_score,
+            precompute_kernel=precompute_kernel, result_store=result_store, n_partitions=n_partitions,
+            telemetry=telemetry, memory_budget=memory_budget)
+
+        self.n_initial = n_initial
+        self.wave_size = wave_size
+
+    def fit(self, X, y):
+        """Actual fitting,  performing the search over parameters in waves chosen by the surrogate."""
+
+        estimator = self.estimator
+        cv = self.cv
+
+        n_samples = _num_samples(X)
+        X, y = indexable(X, y)
+
+        candidates = list(ParameterGrid(self.param_distributions))
+
+        if y is not None:
+            if len(y) != n_samples:
+                raise ValueError('Target variable (y) has a different number '
+                                 'of samples (%i) than data (X: %i samples)'
+                                 % (len(y), n_samples))
+        cv = check_cv(cv, X, y, classifier=is_classifier(estimator))
+        folds = list(cv)
+        n_folds = len(folds)
+
+        random_state = check_random_state(self.random_state)
+        encoded = encode_candidates(candidates)
+        n_iter = min(self.n_iter, len(candidates))
+        batch_size = self.wave_size or wave_size(as_backend(self.sc).parallelism, n_folds)
+        n_initial = self.n_initial or max(batch_size, encoded.shape[1] + 1)
+
+        if self.verbose > 0:
+            print("Adaptive search of {0} of {1} candidates over {2} folds in waves of {3}, totalling at most"
+                  " {4} fits".format(n_iter, len(candidates), n_folds, batch_size, n_iter * n_folds))
+
+        base_estimator = clone(self.estimator)
+        self.cv_predictions_ = {}
+
+        observed = []
+        observed_scores = []
+        grid_scores = list()
+        self.waves_ = []
+        while len(observed) < n_iter:
+            if len(observed) == 0:
+                batch = random_state.choice(len(candidates), min(n_initial, n_iter), replace=False).tolist()
             else:
-                best_estimator.fit(X, **self.fit_params)
-            self.best_estimator_ = best_estimator
+                batch = propose_batch(encoded, observed, observed_scores, min(batch_size, n_iter - len(observed)),
+                                      random_state)
+
+            out = _parallel_fit_and_score(self, base_estimator, X, y, [candidates[i] for i in batch], folds)
+            for position, index in enumerate(batch):
+                fold_results = out[position * n_folds:(position + 1) * n_folds]
+                score = _mean_fold_score(fold_results, self.iid)
+                observed.append(index)
+                observed_scores.append(score)
+                grid_scores.append(_CVScoreTuple(
+                    candidates[index],
+                    score,
+                    np.array([res[0] for res in fold_results])))
+
+            self.waves_.append({'n_candidates': len(batch), 'n_fits': len(out), 'best_score': max(observed_scores)})
+            if self.verbose > 0:
+                print("Wave {0}: {1} candidates, best score so far {2}".format(
+                    len(self.waves_), len(batch), max(observed_scores)))
+        # Store the computed scores, in the order the candidates were evaluated
+        self.grid_scores_ = grid_scores
+
+        # Find the best parameters by comparing on the mean validation score:
+        # note that `sorted` is deterministic in the way it breaks ties
+        best = sorted(grid_scores, key=lambda x: x.mean_validation_score,
+                      reverse=True)[0]
+        self.best_params_ = best.parameters
+        self.best_score_ = best.mean_validation_score
+
+        if self.refit:
+            # fit the best estimator using the entire dataset, in parallel with its cross-validation predictions
+            _parallel_refit(self, base_estimator, X, y, best.parameters, folds)
         return self
 
 
@@ -637,9 +1024,10 @@ def elapsed_time_format_day_hr_min_sec(seconds):
     print("%d:%d:%d:%d" % (d.day - 1, d.hour, d.minute, d.second))
 
 
-def cstress_spark_parallel_fold_param_model_main():
-    features = read_features(args.featureFolder, args.featureFile)
-    groundtruth = read_stress_marks(args.featureFolder, args.stressFile)
+def cstress_spark_parallel_fold_param_model_main(args):
+    cache_dir = None if args.noCache else (args.cacheFolder or os.path.join(args.featureFolder, '.cache'))
+    features = read_features(args.featureFolder, args.featureFile, cache_dir=cache_dir)
+    groundtruth = read_stress_marks(args.featureFolder, args.stressFile, cache_dir=cache_dir)
 
     traindata, trainlabels, subjects = analyze_events_with_features(features, groundtruth)
 
@@ -651,20 +1039,31 @@ def cstress_spark_parallel_fold_param_model_main():
 
     lkf = LabelKFold(subjects, n_folds=len(np.unique(subjects)))
 
-    # Original Parameters of cStress Model
-    # delta = 0.1
-    # parameters = {'kernel': ['rbf'],
-    #               'C': [2 ** x for x in np.arange(-12, 12, 0.5)],
-    #               'gamma': [2 ** x for x in np.arange(-12, 12, 0.5)],
-    #               'class_weight': [{0: w, 1: 1 - w} for w in np.arange(0.0, 1.0, delta)]}
+    if args.fullGrid:
+        # Original Parameters of cStress Model
+        delta = 0.1
+        parameters = {'kernel': ['rbf'],
+                      'C': [2 ** x for x in np.arange(-12, 12, 0.5)],
+                      'gamma': [2 ** x for x in np.arange(-12, 12, 0.5)],
+                      'class_weight': [{0: w, 1: 1 - w} for w in np.arange(0.0, 1.0, delta)]}
+    else:
+        # parameters for testing
+        delta = 0.5
+        parameters = {'kernel': ['rbf'], 'C': [2 ** x for x in np.arange(-2, 2, 0.5)],
+                      'gamma': [2 ** x for x in np.arange(-2, 2, 0.5)],
+                      'class_weight': [{0: w, 1: 1 - w} for w in np.arange(0.0, 1.0, delta)]}
+
+    # The cascade replaces only the full fit of the exported model: the search skips it, the Platt parameters come
+    # from the out-of-fold decision values of the search's own fold fits, and the search fits themselves still
+    # train every candidate on whole folds
+    fast_calibration = args.calibration == 'fast' or bool(args.cascadePartitions)
+    refit = 'folds' if args.cascadePartitions else True
+    svc = svm.SVC(probability=not fast_calibration, verbose=False, cache_size=2000)
 
-    # parameters for testing
-    delta = 0.5
-    parameters = {'kernel': ['rbf'], 'C': [2 ** x for x in np.arange(-2, 2, 0.5)],
-                  'gamma': [2 ** x for x in np.arange(-2, 2, 0.5)],
-                  'class_weight': [{0: w, 1: 1 - w} for w in np.arange(0.0, 1.0, delta)]}
+    backend = create_backend(args.backend, args.n_jobs)
 
-    svc = svm.SVC(probability=True, verbose=False, cache_size=2000)
+    result_store = ResultStore(args.resultStore) if args.resultStore else None
+    telemetry = SearchTelemetry(args.telemetryLog, args.progressInterval)
 
     if args.scorer == 'f1':
         scorer = f1_bias_scorer_CV
@@ -672,26 +1071,78 @@ def cstress_spark_parallel_fold_param_model_main():
         scorer = two_bias_scorer_CV
 
     if args.whichsearch == 'grid':
-        clf = GridSearchCVSparkParallel(sc=sc, estimator=svc, param_grid=parameters, cv=lkf, n_jobs=-1,
-                                        scoring=None, verbose=1, iid=False)
+        clf = GridSearchCVSparkParallel(sc=backend, estimator=svc, param_grid=parameters, cv=lkf, n_jobs=-1,
+                                        scoring=None, verbose=1, iid=False, refit=refit,
+                                        precompute_kernel=args.precomputeKernel, result_store=result_store,
+                                        telemetry=telemetry,
+                                        memory_budget=args.memoryBudget, prescreen_top_k=args.prescreenTopK,
+                                        prescreen_components=args.prescreenComponents)
+    elif args.whichsearch == 'halving':
+        clf = HalvingGridSearchCVSparkParallel(sc=backend, estimator=svc, param_grid=parameters, cv=lkf,
+                                               factor=args.halvingFactor, min_folds=args.minFolds, n_jobs=-1,
+                                               scoring=None, verbose=1, iid=False, refit=refit,
+                                               precompute_kernel=args.precomputeKernel, result_store=result_store,
+                                               telemetry=telemetry, memory_budget=args.memoryBudget)
+    elif args.whichsearch == 'bayes':
+        clf = BayesianGridSearchCVSparkParallel(backend, estimator=svc, param_distributions=parameters, cv=lkf,
+                                                n_iter=args.n_iter, wave_size=args.waveSize, n_jobs=-1, scoring=None,
+                                                verbose=1, iid=False, refit=refit,
+                                                precompute_kernel=args.precomputeKernel,
+                                                result_store=result_store, telemetry=telemetry,
+                                                memory_budget=args.memoryBudget)
     else:
-        clf = RandomGridSearchCVSparkParallel(sc, estimator=svc, param_distributions=parameters, cv=lkf,
-                                              n_jobs=-1, scoring=None, n_iter=args.n_iter, verbose=1, iid=False)
+        clf = RandomGridSearchCVSparkParallel(backend, estimator=svc, param_distributions=parameters, cv=lkf,
+                                              n_jobs=-1, scoring=None, n_iter=args.n_iter, verbose=1, iid=False,
+                                              refit=refit,
+                                              precompute_kernel=args.precomputeKernel, result_store=result_store,
+                                              telemetry=telemetry, memory_budget=args.memoryBudget)
 
     clf.fit(traindata, trainlabels)
 
-    sc.stop()
-    SparkSession._instantiatedContext = None
+    if args.featureSelection:
+        selected, history = sequential_feature_selection(backend, svc, clf.best_params_, traindata, trainlabels,
+                                                         list(lkf), check_scoring(svc),
+                                                         direction=args.featureSelection,
+                                                         n_features_to_select=args.selectFeatures, verbose=1)
+        print("selected features: ", sorted(selected))
+        print("selection score: ", history[-1]['score'] if history else None)
+
+    memory_budget = args.memoryBudget or backend.memory_budget_mb()
+    telemetry.report(memory_budget_mb=memory_budget)
 
     print("best score: ", clf.best_score_)
     print("best params: ", clf.best_params_)
 
-    CV_probs = cross_val_probs(clf.best_estimator_, traindata, trainlabels, lkf)
+    if fast_calibration:
+        CV_decision = clf.best_cv_decision_
+        probA, probB = fit_svc_platt(CV_decision, trainlabels, np.unique(trainlabels))
+        CV_probs = svc_platt_probability(CV_decision, probA, probB)
+    else:
+        CV_probs = clf.best_cv_probs_
+        probA, probB = None, None
+
+    if args.cascadePartitions:
+        cascade_start = time.time()
+        final_estimator = cascade_fit(backend, clone(svc).set_params(**clf.best_params_), traindata, trainlabels,
+                                      args.cascadePartitions, args.cascadeIterations, random_state=0, verbose=1)
+        cascade_time = time.time() - cascade_start
+        full_time = estimated_fit_time(telemetry.records, clf.best_params_, len(trainlabels))
+        print("support vectors: %d cascade" % len(final_estimator.support_))
+        if full_time is None:
+            print("cascade fit: %.2fs" % cascade_time)
+        else:
+            print("cascade fit: %.2fs, estimated full fit: %.2fs, saved: %.2fs"
+                  % (cascade_time, full_time, full_time - cascade_time))
+    else:
+        final_estimator = clf.best_estimator_
     score, bias = scorer(CV_probs, trainlabels, True)
     print("score and bias: ", score, bias)
 
     if not bias == []:
-        save_model(args.modelOutput, clf.best_estimator_, normalizer, bias)
+        if args.modelFormat == 'npz':
+            CompactSVCModel.from_estimator(final_estimator, normalizer, bias, probA, probB).save(args.modelOutput)
+        else:
+            save_model(args.modelOutput, final_estimator, normalizer, bias, probA, probB)
 
         n = len(trainlabels)
 
@@ -708,12 +1159,31 @@ def cstress_spark_parallel_fold_param_model_main():
         print(metrics.confusion_matrix(trainlabels[classified], predicted))
         print("Lost: %d (%f%%)" % (n - len(classified), (n - len(classified)) * 1.0 / n))
         print("Subjects: " + str(np.unique(subjects)))
+
+        if args.reduceTolerance is not None:
+            # With libsvm calibration probA and probB are None and the model takes them from the estimator
+            model = CompactSVCModel.from_estimator(final_estimator, normalizer, bias, probA, probB)
+            reduced, report = reduction_report(backend, model, final_estimator, traindata, trainlabels,
+                                               list(lkf), args.reduceTolerance)
+            print("Support vectors: %d -> %d (%.1f%% fewer)"
+                  % (report['n_support'], report['n_support_reduced'], 100.0 * report['reduction']))
+            print("Training F1: %.4f -> %.4f" % (report['f1'], report['f1_reduced']))
+            print("Cross-Subject F1: %.4f -> %.4f" % (report['cv_f1'], report['cv_f1_reduced']))
+
+            output = args.reducedModelOutput or args.modelOutput + '.reduced'
+            if args.modelFormat == 'npz':
+                reduced.save(output)
+            else:
+                reduced.to_json(output)
     else:
         print("Results not good")
 
+    backend.stop()
+
 
-start = time.time()
-print("start.............\n")
-cstress_spark_parallel_fold_param_model_main()
-end = time.time()
-elapsed_time_format_day_hr_min_sec(end - start)
+if __name__ == '__main__':
+    start = time.time()
+    print("start.............\n")
+    cstress_spark_parallel_fold_param_model_main(parser.parse_args())
+    end = time.time()
+    elapsed_time_format_day_hr_min_sec(end - start)
@@ -38,8 +38,10 @@ from sklearn.cross_validation import LabelKFold, check_cv
 from sklearn.grid_search import GridSearchCV, RandomizedSearchCV, ParameterSampler, ParameterGrid
 from sklearn.utils.validation import _num_samples, indexable
 from sklearn.metrics.scorer import check_scoring
-from pyspark.sql import SparkSession
-from pyspark import SparkContext
+
+from cerebralcortex.data_processor.model.backend import as_backend, create_backend
+from cerebralcortex.data_processor.model.scorer import f1_bias_scorer_CV, two_bias_scorer_CV
+from cerebralcortex.data_processor.model.stress_labels import StressMarkIndex, label_windows
 
 # Command line parameter configuration
 parser = argparse.ArgumentParser(description='Train and evaluate the cStress model')
@@ -57,9 +59,10 @@ parser.add_argument('--featureFile', type=str, required=True, dest='featureFile'
                     help='Feature vector file name')
 parser.add_argument('--stressFile', type=str, required=True, dest='stressFile',
                     help='Stress ground truth filename')
-args = parser.parse_args()
-
-sc = SparkContext()
+parser.add_argument('--backend', type=str, required=False, dest='backend', default='spark',
+                    help='Where the search tasks run (spark or local)')
+parser.add_argument('--n_jobs', type=int, required=False, dest='n_jobs',
+                    help='If the local backend is used, how many worker processes to use (all cores by default)')
 
 
 def cv_fit_and_score(estimator, X, y, scorer, parameters, cv, ):
@@ -151,33 +154,19 @@ def check_stress_mark(stress_mark, pid, start_time):
 
 
 def analyze_events_with_features(features, stress_marks):
-    feature_labels = []
-    final_features = []
-    subjects = []
-
-    start_times = {}
-    for pid, label, start, end in stress_marks:
-        if label == 'c4':
-            if pid not in start_times:
-                start_times[pid] = np.inf
-
-            start_times[pid] = min(start_times[pid], start)
+    if len(features) == 0:
+        return [], [], []
 
-    for line in features:
-        id_index = line[0]
-        ts = line[1]
-        f = line[2:]
+    participant_ids = [line[0] for line in features]
+    timestamps = [line[1] for line in features]
 
-        if ts < start_times[id_index]:
-            continue  # Outside of starting time
+    index = StressMarkIndex.from_marks(stress_marks)
+    labels = label_windows(index, participant_ids, timestamps)
+    labeled = np.flatnonzero(labels != '')
 
-        label = check_stress_mark(stress_marks, id_index, ts)
-        if len(label) > 0:
-            stress_class = decode_label(label[0][0])
-
-            feature_labels.append(stress_class)
-            final_features.append(f)
-            subjects.append(id_index)
+    final_features = [features[i][2:] for i in labeled]
+    feature_labels = [decode_label(label) for label in labels[labeled].tolist()]
+    subjects = [participant_ids[i] for i in labeled]
 
     return final_features, feature_labels, subjects
 
@@ -205,99 +194,6 @@ def reduce_data(data, r):
     return result
 
 
-def f1_bias_scorer(estimator, X, y, ret_bias=False):
-    probas_ = estimator.predict_proba(X)
-    precision, recall, thresholds = metrics.precision_recall_curve(y, probas_[:, 1])
-    bias = 0.0
-    f1 = 0.0
-    for i in range(0, len(thresholds)):
-        if not (precision[i] == 0 and recall[i] == 0):
-            f = 2 * (precision[i] * recall[i]) / (precision[i] + recall[i])
-            if f > f1:
-                f1 = f
-                bias = thresholds[i]
-
-    if ret_bias:
-        return f1, bias
-    else:
-        return f1
-
-
-def two_bias_scorer_CV(probs, y, ret_bias=False):
-    db = np.transpose(np.vstack([probs, y]))
-    db = db[np.argsort(db[:, 0]), :]
-
-    pos = np.sum(y == 1)
-    n = len(y)
-    neg = n - pos
-    tp, tn = pos, 0
-    lost = 0
-
-    optbias = []
-    minloss = 1
-
-    for i in range(n):
-        # p = db[i,1]
-        if db[i, 1] == 1:  # positive
-            tp -= 1.0
-        else:
-            tn += 1.0
-
-        # v1 = tp/pos
-        # v2 = tn/neg
-
-        if tp / pos >= 0.95 and tn / neg >= 0.95:
-            optbias = [db[i, 0], db[i, 0]]
-            continue
-
-        running_pos = pos
-        running_neg = neg
-        running_tp = tp
-        running_tn = tn
-
-        for j in range(i + 1, n):
-            # p1 = db[j,1]
-            if db[j, 1] == 1:  # positive
-                running_tp -= 1.0
-                running_pos -= 1
-            else:
-                running_neg -= 1
-
-            lost = (j - i) * 1.0 / n
-            if running_pos == 0 or running_neg == 0:
-                break
-
-            # v1 = running_tp/running_pos
-            # v2 = running_tn/running_neg
-
-            if running_tp / running_pos >= 0.95 and running_tn / running_neg >= 0.95 and lost < minloss:
-                minloss = lost
-                optbias = [db[i, 0], db[j, 0]]
-
-    if ret_bias:
-        return -minloss, optbias
-    else:
-        return -minloss
-
-
-def f1_bias_scorer_CV(probs, y, ret_bias=False):
-    precision, recall, thresholds = metrics.precision_recall_curve(y, probs)
-
-    f1 = 0.0
-    bias = 0.0
-    for i in range(0, len(thresholds)):
-        if not (precision[i] == 0 and recall[i] == 0):
-            f = 2 * (precision[i] * recall[i]) / (precision[i] + recall[i])
-            if f > f1:
-                f1 = f
-                bias = thresholds[i]
-
-    if ret_bias:
-        return f1, bias
-    else:
-        return f1
-
-
 def svm_output(filename, traindata, trainlabels):
     with open(filename, 'w') as f:
         for i in range(0, len(trainlabels)):
@@ -369,7 +265,7 @@ def cross_val_probs(estimator, X, y, cv):
 
 
 # parallel grid search(fit and cv) over entire data set for each parameter for all possible combination
-# in a given range of parameters on apache spark platform
+# in a given range of parameters on apache spark platform, or on a local process pool when sc is a backend
 
 class GridSearchCVSparkParallelParam(GridSearchCV):
     def __init__(self, sc, estimator, param_grid, scoring=None,
@@ -416,14 +312,15 @@ class GridSearchCVSparkParallelParam(GridSearchCV):
 
         # Because the original python code expects a certain order for the elements
         indexed_param_grid = list(zip(range(len(param_grid)), param_grid))
-        par_param_grid = self.sc.parallelize(indexed_param_grid, len(indexed_param_grid))
-        X_bc = self.sc.broadcast(X)
-        y_bc = self.sc.broadcast(y)
+        backend = as_backend(self.sc)
+        X_bc = backend.broadcast(X)
+        y_bc = backend.broadcast(y)
 
         scorer = self.scorer_
 
-        indexed_output = dict(par_param_grid.map(
-            lambda i: local_fit(i[0], i[1], base_estimator, X_bc.value, y_bc.value, scorer, cv)).collect())
+        indexed_output = dict(backend.run_tasks(
+            lambda i: local_fit(i[0], i[1], base_estimator, X_bc.value, y_bc.value, scorer, cv),
+            [[task] for task in indexed_param_grid]))
         out = [indexed_output[idx] for idx in range(len(param_grid))]
 
         X_bc.unpersist()
@@ -498,14 +395,15 @@ class RandomGridSearchCVSparkParallelParam(RandomizedSearchCV):
 
         base_estimator = clone(self.estimator)
         indexed_param_grid = list(zip(range(len(param_grid)), param_grid))
-        par_param_grid = self.sc.parallelize(indexed_param_grid, len(indexed_param_grid))
-        X_bc = self.sc.broadcast(X)
-        y_bc = self.sc.broadcast(y)
+        backend = as_backend(self.sc)
+        X_bc = backend.broadcast(X)
+        y_bc = backend.broadcast(y)
 
         scorer = self.scorer_
 
-        indexed_output = dict(par_param_grid.map(
-            lambda i: local_fit(i[0], i[1], base_estimator, X_bc.value, y_bc.value, scorer, cv)).collect())
+        indexed_output = dict(backend.run_tasks(
+            lambda i: local_fit(i[0], i[1], base_estimator, X_bc.value, y_bc.value, scorer, cv),
+            [[task] for task in indexed_param_grid]))
         out = [indexed_output[idx] for idx in range(len(param_grid))]
 
         X_bc.unpersist()
@@ -542,7 +440,7 @@ def elapsed_time_format_day_hr_min_sec(seconds):
     print("%d:%d:%d:%d" % (d.day - 1, d.hour, d.minute, d.second))
 
 
-def cstress_spark_parallel_param_model_main():
+def cstress_spark_parallel_param_model_main(args):
     features = read_features(args.featureFolder, args.featureFile)
     groundtruth = read_stress_marks(args.featureFolder, args.stressFile)
 
@@ -571,22 +469,23 @@ def cstress_spark_parallel_param_model_main():
 
     svc = svm.SVC(probability=True, verbose=False, cache_size=2000)
 
+    backend = create_backend(args.backend, args.n_jobs)
+
     if args.scorer == 'f1':
         scorer = f1_bias_scorer_CV
     else:
         scorer = two_bias_scorer_CV
 
     if args.whichsearch == 'grid':
-        clf = GridSearchCVSparkParallelParam(sc=sc, estimator=svc, param_grid=parameters, cv=lkf, n_jobs=-1,
+        clf = GridSearchCVSparkParallelParam(sc=backend, estimator=svc, param_grid=parameters, cv=lkf, n_jobs=-1,
                                              scoring=scorer, verbose=1, iid=False)
     else:
-        clf = RandomGridSearchCVSparkParallelParam(sc, estimator=svc, param_distributions=parameters, cv=lkf, n_jobs=-1,
-                                                   scoring=scorer, n_iter=args.n_iter, verbose=1, iid=False)
+        clf = RandomGridSearchCVSparkParallelParam(backend, estimator=svc, param_distributions=parameters, cv=lkf,
+                                                   n_jobs=-1, scoring=scorer, n_iter=args.n_iter, verbose=1, iid=False)
 
     clf.fit(traindata, trainlabels)
 
-    sc.stop()
-    SparkSession._instantiatedContext = None
+    backend.stop()
 
     print("best score: ", clf.best_score_)
     print("best params: ", clf.best_params_)
@@ -617,8 +516,9 @@ def cstress_spark_parallel_param_model_main():
         print("Results not good")
 
 
-start = time.time()
-print("start.............\n")
-cstress_spark_parallel_param_model_main()
-end = time.time()
-elapsed_time_format_day_hr_min_sec(end - start)
+if __name__ == '__main__':
+    start = time.time()
+    print("start.............\n")
+    cstress_spark_parallel_param_model_main(parser.parse_args())
+    end = time.time()
+    elapsed_time_format_day_hr_min_sec(end - start)
@@ -0,0 +1,118 @@
+# Copyright (c) 2016, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import argparse
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+
+from cerebralcortex.data_processor.model.backend import create_backend
+from cerebralcortex.data_processor.model.compact_model import CompactSVCModel
+from cerebralcortex.data_processor.model.dataset import load_features
+from cerebralcortex.data_processor.model.scoring import batch_score
+
+# Command line parameter configuration
+parser = argparse.ArgumentParser(description='Score cStress feature windows with a trained model')
+parser.add_argument('--featureFolder', dest='featureFolder', required=True,
+                    help='Directory containing feature files')
+parser.add_argument('--featureFile', type=str, required=True, dest='featureFile',
+                    help='Name of feature file in every participant folder')
+parser.add_argument('--model', type=str, required=True, dest='model',
+                    help='Model written by the training scripts, JSON or .npz')
+parser.add_argument('--output', type=str, required=True, dest='output',
+                    help='CSV receiving participant, window start, stress probability and classification')
+parser.add_argument('--backend', type=str, required=False, dest='backend', default='spark',
+                    help='Where the scoring tasks run (spark or local)')
+parser.add_argument('--n_jobs', type=int, required=False, dest='n_jobs',
+                    help='Number of worker processes of the local backend, all cores by default')
+parser.add_argument('--blockSize', type=int, required=False, dest='blockSize', default=4096,
+                    help='Number of windows scored at a time')
+parser.add_argument('--cacheFolder', type=str, required=False, dest='cacheFolder',
+                    help='Directory of the parsed feature cache, defaults to featureFolder/.cache')
+parser.add_argument('--noCache', action='store_true', dest='noCache',
+                    help='Parse the feature files without reading or writing the cache')
+
+WINDOW_LENGTH = 60000  # One minute windows, in milliseconds
+
+
+def load_model(filename):
+    """
+    :param filename: model written by save_model (JSON) or CompactSVCModel.save (.npz)
+    :return: CompactSVCModel
+    """
+    if filename.endswith('.npz'):
+        return CompactSVCModel.load(filename)
+    return CompactSVCModel.from_json(filename)
+
+
+def participant_windows(participant_ids, timestamps, features):
+    """
+    :param participant_ids: participant of every window
+    :param timestamps: window start times in milliseconds
+    :param features: feature matrix
+    :return: list of (participant, (start_time, end_time) of every window, feature matrix)
+    """
+    result = []
+    for pid in np.unique(participant_ids):
+        rows = np.flatnonzero(participant_ids == pid)
+        windows = [(datetime.utcfromtimestamp(t / 1000.0), datetime.utcfromtimestamp((t + WINDOW_LENGTH) / 1000.0))
+                   for t in timestamps[rows].tolist()]
+        result.append((int(pid), windows, features[rows]))
+    return result
+
+
+def write_scores(filename, scores):
+    """
+    :param filename: output CSV
+    :param scores: participant -> (stress probability DataStream, classification of every window)
+    """
+    with open(filename, 'w') as f:
+        for participant in sorted(scores):
+            stream, labels = scores[participant]
+            for dp, label in zip(stream.data, labels):
+                start = int(round((dp.start_time - datetime(1970, 1, 1)).total_seconds() * 1000))
+                f.write('%d,%d,%.6f,%d\n' % (participant, start, dp.sample, label))
+
+
+def cstress_score_main(args):
+    cache_dir = None if args.noCache else (args.cacheFolder or os.path.join(args.featureFolder, '.cache'))
+    participant_ids, timestamps, features = load_features(args.featureFolder, args.featureFile, cache_dir=cache_dir)
+    model = load_model(args.model)
+
+    backend = create_backend(args.backend, args.n_jobs)
+    scores, stats = batch_score(backend, model, participant_windows(participant_ids, timestamps, features),
+                                args.blockSize)
+    backend.stop()
+
+    write_scores(args.output, scores)
+    print("Scored %d windows of %d participants in %.2f s (%.1f windows/s)"
+          % (stats['windows'], len(scores), stats['seconds'], stats['windows_per_second']))
+
+
+if __name__ == '__main__':
+    start = time.time()
+    cstress_score_main(parser.parse_args())
+    print("total time: %.2f s" % (time.time() - start))
@@ -0,0 +1,291 @@
+# Copyright (c) 2016, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from typing import Any, Callable, List
+
+import numpy as np
+
+from cerebralcortex.data_processor.model.memory import available_memory_mb
+
+
+def _parse_spark_memory(value: str) -> float:
+    """
+    :param value: Spark memory setting such as 512m, 4g or 2048 (MiB)
+    :return: size in MB
+    """
+    value = value.strip().lower().rstrip('b')
+    units = {'k': 1.0 / 1024, 'm': 1.0, 'g': 1024.0, 't': 1024.0 ** 2}
+    if value and value[-1] in units:
+        return float(value[:-1]) * units[value[-1]]
+    return float(value)
+
+
+class SparkBackend:
+    """
+    Runs search tasks on a SparkContext
+    """
+
+    def __init__(self, sc):
+        self.sc = sc
+
+    @property
+    def parallelism(self) -> int:
+        return self.sc.defaultParallelism
+
+    def _is_local(self) -> bool:
+        return self.sc.master.startswith('local')
+
+    @property
+    def concurrent_tasks(self) -> int:
+        """
+        :return: number of tasks running at once on one executor
+        """
+        if self._is_local():
+            return self.parallelism
+        conf = self.sc.getConf()
+        return max(1, int(conf.get('spark.executor.cores', '1')) // int(conf.get('spark.task.cpus', '1')))
+
+    def memory_budget_mb(self):
+        """
+        :return: memory of the Python workers of one executor, spark.executor.pyspark.memory, or of this node in
+            local mode; None when unknown
+        """
+        if self._is_local():
+            return available_memory_mb()
+        value = self.sc.getConf().get('spark.executor.pyspark.memory', None)
+        return _parse_spark_memory(value) if value else None
+
+    def broadcast(self, value):
+        """
+        :param value: object shared read-only with every task
+        :return: handle with a value attribute and an unpersist method
+        """
+        return self.sc.broadcast(value)
+
+    def accumulator(self):
+        """
+        :return: list accumulator; tasks add lists of records, the driver reads the records of finished tasks
+        """
+        from pyspark.accumulators import AccumulatorParam
+
+        class ListParam(AccumulatorParam):
+            def zero(self, value):
+                return []
+
+            def addInPlace(self, value1, value2):
+                value1.extend(value2)
+                return value1
+
+        return self.sc.accumulator([], ListParam())
+
+    def run_tasks(self, func: Callable[[Any], Any], partitions: List[List[Any]]) -> List[Any]:
+        """
+        :param func: function applied to every task
+        :param partitions: tasks grouped into partitions, each partition runs as one unit of work
+        :return: func(task) for every task
+        """
+        return self.sc.parallelize(partitions, len(partitions)).flatMap(
+            lambda partition: [func(task) for task in partition]).collect()
+
+    def stop(self):
+        from pyspark.sql import SparkSession
+
+        self.sc.stop()
+        SparkSession._instantiatedContext = None
+
+
+class LocalBroadcast:
+    """
+    Broadcast of a Python object to forked worker processes, which inherit it without pickling
+    """
+
+    def __init__(self, value):
+        self.value = value
+
+    def unpersist(self):
+        self.value = None
+
+
+class MemmapBroadcast:
+    """
+    Broadcast of a NumPy array through a .npy file that every worker memory-maps read-only, so the array is
+    shared through the page cache instead of being copied into each process
+    """
+
+    def __init__(self, array: np.ndarray, directory: str):
+        self.filename = os.path.join(directory, uuid.uuid4().hex + '.npy')
+        np.save(self.filename, np.ascontiguousarray(array))
+        self._value = None
+
+    @property
+    def value(self) -> np.ndarray:
+        if self._value is None:
+            self._value = np.load(self.filename, mmap_mode='r')
+        return self._value
+
+    def unpersist(self):
+        self._value = None
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+
+
+class QueueAccumulator:
+    """
+    List accumulator for forked worker processes: workers write records to a pipe inherited through fork and a
+    driver thread appends them to the value as they arrive
+    """
+
+    def __init__(self):
+        self._queue = multiprocessing.get_context('fork').SimpleQueue()
+        self._records = []
+        self._lock = threading.Lock()
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self._reader.start()
+
+    def _read(self):
+        while True:
+            records = self._queue.get()
+            if records is None:
+                return
+            with self._lock:
+                self._records.extend(records)
+
+    def add(self, records: List[Any]):
+        self._queue.put(records)
+
+    @property
+    def value(self) -> List[Any]:
+        with self._lock:
+            return list(self._records)
+
+    def close(self):
+        """
+        Wait for the records already written, call once every task has finished
+        """
+        if self._reader.is_alive():
+            self._queue.put(None)
+            self._reader.join()
+
+
+_task_function = None
+
+
+def _run_partition(partition):
+    return [_task_function(task) for task in partition]
+
+
+class ProcessPoolBackend:
+    """
+    Runs search tasks in a pool of forked local processes, without Spark
+
+    The task function reaches the workers through fork rather than pickling, so closures work as they do on
+    Spark. NumPy arrays are broadcast as memory-mapped .npy files in a temporary directory.
+    """
+
+    def __init__(self, n_jobs: int = None, temp_folder: str = None):
+        self.n_jobs = n_jobs if n_jobs is not None and n_jobs > 0 else multiprocessing.cpu_count()
+        self.temp_folder = tempfile.mkdtemp(prefix='cstress_', dir=temp_folder)
+
+    @property
+    def parallelism(self) -> int:
+        return self.n_jobs
+
+    @property
+    def concurrent_tasks(self) -> int:
+        """
+        :return: number of tasks running at once on this node
+        """
+        return self.n_jobs
+
+    def memory_budget_mb(self):
+        """
+        :return: memory available on this node
+        """
+        return available_memory_mb()
+
+    def broadcast(self, value):
+        """
+        :param value: object shared read-only with every task
+        :return: handle with a value attribute and an unpersist method
+        """
+        if isinstance(value, np.ndarray) and value.dtype != object:
+            return MemmapBroadcast(value, self.temp_folder)
+        return LocalBroadcast(value)
+
+    def accumulator(self):
+        """
+        :return: list accumulator; tasks add lists of records, the driver reads the records of finished tasks
+        """
+        return QueueAccumulator()
+
+    def run_tasks(self, func: Callable[[Any], Any], partitions: List[List[Any]]) -> List[Any]:
+        """
+        :param func: function applied to every task
+        :param partitions: tasks grouped into partitions, each partition runs as one unit of work
+        :return: func(task) for every task
+        """
+        global _task_function
+
+        n_processes = min(self.n_jobs, max(len(partitions), 1))
+        _task_function = func
+        try:
+            with multiprocessing.get_context('fork').Pool(processes=n_processes) as pool:
+                results = pool.map(_run_partition, partitions, chunksize=1)
+        finally:
+            _task_function = None
+        return [result for partition in results for result in partition]
+
+    def stop(self):
+        shutil.rmtree(self.temp_folder, ignore_errors=True)
+
+
+def as_backend(sc):
+    """
+    :param sc: SparkContext or backend
+    :return: backend running tasks on sc
+    """
+    if hasattr(sc, 'run_tasks'):
+        return sc
+    return SparkBackend(sc)
+
+
+def create_backend(name: str, n_jobs: int = None):
+    """
+    :param name: 'spark' or 'local'
+    :param n_jobs: number of local worker processes, all cores by default
+    :return: backend
+    """
+    if name == 'spark':
+        from pyspark import SparkContext
+
+        return SparkBackend(SparkContext())
+    if name == 'local':
+        return ProcessPoolBackend(n_jobs)
+    raise ValueError('Unknown backend %s, expected spark or local' % name)
@@ -0,0 +1,149 @@
+# Copyright (c) 2016, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import math
+import numbers
+from typing import List
+
+import numpy as np
+from scipy.stats import norm
+from sklearn.gaussian_process import GaussianProcessRegressor
+from sklearn.gaussian_process.kernels import ConstantKernel, Matern, WhiteKernel
+
+
+def encode_candidates(candidates: List[dict]) -> np.ndarray:
+    """
+    Numeric coordinates of parameter candidates for the surrogate model, scaled to [0, 1] per coordinate
+
+    Strictly positive numbers such as C and gamma are placed on a log2 scale, dicts such as class_weight
+    contribute their values in key order and any other value is treated as a category.
+
+    :param candidates: list of parameter dicts sharing the same keys
+    :return: array of shape (len(candidates), n_coordinates)
+    """
+    if len(candidates) == 0:
+        return np.zeros((0, 0))
+
+    columns = []
+    for key in sorted(candidates[0]):
+        values = [candidate[key] for candidate in candidates]
+        if all(isinstance(v, numbers.Real) for v in values):
+            values = np.asarray(values, dtype=np.float64)
+            columns.append(np.log2(values) if np.all(values > 0) else values)
+        elif all(isinstance(v, dict) for v in values):
+            for k in sorted(values[0]):
+                columns.append(np.array([float(v[k]) for v in values]))
+        else:
+            categories = sorted(set(repr(v) for v in values))
+            columns.append(np.array([categories.index(repr(v)) for v in values], dtype=np.float64))
+
+    X = np.column_stack(columns)
+    low, high = X.min(axis=0), X.max(axis=0)
+    span = np.where(high > low, high - low, 1.0)
+    return (X - low) / span
+
+
+def expected_improvement(mean: np.ndarray,
+                         std: np.ndarray,
+                         best: float,
+                         xi: float = 0.01) -> np.ndarray:
+    """
+    :param mean: predicted score
+    :param std: predicted standard deviation
+    :param best: best score observed so far
+    :param xi: minimum improvement worth exploring
+    :return: expected improvement over best of every point, for maximization
+    """
+    std = np.maximum(std, 1e-12)
+    z = (mean - best - xi) / std
+    return (mean - best - xi) * norm.cdf(z) + std * norm.pdf(z)
+
+
+def _surrogate(random_state: np.random.RandomState) -> GaussianProcessRegressor:
+    kernel = ConstantKernel(1.0, (1e-3, 1e3)) * Matern(length_scale=0.3, length_scale_bounds=(1e-2, 1e2), nu=2.5) + \
+        WhiteKernel(1e-3, (1e-8, 1e-1))
+    return GaussianProcessRegressor(kernel=kernel, normalize_y=True, n_restarts_optimizer=2,
+                                    random_state=random_state)
+
+
+def propose_batch(X_pool: np.ndarray,
+                  observed: List[int],
+                  scores: List[float],
+                  batch_size: int,
+                  random_state=None) -> List[int]:
+    """
+    Choose the next batch of pool points by expected improvement under a Gaussian process fitted to the
+    observed scores
+
+    The batch is built greedily with the constant liar strategy: after each pick the surrogate, with its fitted
+    kernel kept, is told that the pick scored its predicted mean, which lowers the uncertainty around it so the
+    next pick explores elsewhere.
+
+    :param X_pool: encoded candidates, see encode_candidates
+    :param observed: pool indices already evaluated
+    :param scores: score of each observed index, larger is better
+    :param batch_size: number of indices to propose
+    :param random_state: None, int seed or np.random.RandomState
+    :return: up to batch_size pool indices not in observed, in order of choice
+    """
+    if not isinstance(random_state, np.random.RandomState):
+        random_state = np.random.RandomState(random_state)
+
+    available = np.setdiff1d(np.arange(len(X_pool)), observed)
+    batch_size = min(batch_size, len(available))
+    if batch_size <= 0:
+        return []
+
+    scores = np.asarray(scores, dtype=np.float64)
+    finite = np.isfinite(scores)
+    if finite.sum() < 2 or np.ptp(scores[finite]) == 0:
+        return random_state.choice(available, batch_size, replace=False).tolist()
+
+    X_train = X_pool[np.asarray(observed)[finite]]
+    y_train = scores[finite]
+    gp = _surrogate(random_state).fit(X_train, y_train)
+    best = y_train.max()
+
+    batch = []
+    for _ in range(batch_size):
+        mean, std = gp.predict(X_pool[available], return_std=True)
+        improvement = expected_improvement(mean, std, best)
+        pick = int(np.argmax(improvement))
+        batch.append(int(available[pick]))
+
+        X_train = np.vstack([X_train, X_pool[available[pick]]])
+        y_train = np.append(y_train, mean[pick])
+        available = np.delete(available, pick)
+        gp = GaussianProcessRegressor(kernel=gp.kernel_, normalize_y=True, optimizer=None).fit(X_train, y_train)
+    return batch
+
+
+def wave_size(parallelism: int,
+              n_folds: int) -> int:
+    """
+    :param parallelism: number of tasks the backend runs at once
+    :param n_folds: number of fold tasks per candidate
+    :return: number of candidates per wave that keeps every executor busy
+    """
+    return max(1, int(math.ceil(parallelism / float(max(1, n_folds)))))
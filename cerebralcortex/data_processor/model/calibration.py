@@ -0,0 +1,145 @@
+# Copyright (c) 2016, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import warnings
+
+import numpy as np
+
+
+def _sigmoid_loss(decision_values, targets, A, B):
+    fApB = decision_values * A + B
+    return np.sum(np.where(fApB >= 0,
+                           targets * fApB + np.log1p(np.exp(-np.abs(fApB))),
+                           (targets - 1) * fApB + np.log1p(np.exp(-np.abs(fApB)))))
+
+
+def sigmoid_train(decision_values: np.ndarray,
+                  labels: np.ndarray,
+                  max_iter: int = 100,
+                  min_step: float = 1e-10,
+                  sigma: float = 1e-12,
+                  eps: float = 1e-5):
+    """
+    Platt scaling as implemented by libsvm (Lin, Lin and Weng, A note on Platt's probabilistic outputs for
+    support vector machines, 2007): Newton's method with backtracking on regularized targets
+
+    References:
+        https://www.csie.ntu.edu.tw/~cjlin/papers/plattprob.pdf
+
+    :param decision_values: decision values
+    :param labels: True (or > 0) for the class whose probability is modelled
+    :return: (A, B) such that P(label | f) = 1 / (1 + exp(A * f + B))
+    """
+    decision_values = np.asarray(decision_values, dtype=np.float64)
+    positive = np.asarray(labels) > 0
+
+    prior1 = float(np.sum(positive))
+    prior0 = float(len(positive)) - prior1
+    hi_target = (prior1 + 1.0) / (prior1 + 2.0)
+    lo_target = 1.0 / (prior0 + 2.0)
+    targets = np.where(positive, hi_target, lo_target)
+
+    A = 0.0
+    B = np.log((prior0 + 1.0) / (prior1 + 1.0))
+    fval = _sigmoid_loss(decision_values, targets, A, B)
+
+    for iteration in range(max_iter):
+        fApB = decision_values * A + B
+        # p = 1 / (1 + exp(fApB)) and q = 1 - p, evaluated without overflow
+        p = np.where(fApB >= 0, np.exp(-np.abs(fApB)), 1.0) / (1.0 + np.exp(-np.abs(fApB)))
+        q = 1.0 - p
+        d2 = p * q
+        h11 = sigma + np.sum(decision_values * decision_values * d2)
+        h22 = sigma + np.sum(d2)
+        h21 = np.sum(decision_values * d2)
+        d1 = targets - p
+        g1 = np.sum(decision_values * d1)
+        g2 = np.sum(d1)
+
+        if abs(g1) < eps and abs(g2) < eps:
+            break
+
+        det = h11 * h22 - h21 * h21
+        dA = -(h22 * g1 - h21 * g2) / det
+        dB = -(-h21 * g1 + h11 * g2) / det
+        gd = g1 * dA + g2 * dB
+
+        stepsize = 1.0
+        while stepsize >= min_step:
+            new_A = A + stepsize * dA
+            new_B = B + stepsize * dB
+            new_f = _sigmoid_loss(decision_values, targets, new_A, new_B)
+            if new_f < fval + 0.0001 * stepsize * gd:
+                A, B, fval = new_A, new_B, new_f
+                break
+            stepsize /= 2.0
+
+        if stepsize < min_step:
+            warnings.warn('Platt scaling line search failed')
+            break
+    else:
+        warnings.warn('Platt scaling reached the maximal number of iterations')
+
+    return A, B
+
+
+def sigmoid_predict(decision_values: np.ndarray, A: float, B: float) -> np.ndarray:
+    """
+    :param decision_values: decision values
+    :param A: slope from sigmoid_train
+    :param B: offset from sigmoid_train
+    :return: 1 / (1 + exp(A * f + B)), evaluated without overflow
+    """
+    fApB = np.asarray(decision_values, dtype=np.float64) * A + B
+    return np.where(fApB >= 0, np.exp(-np.abs(fApB)), 1.0) / (1.0 + np.exp(-np.abs(fApB)))
+
+
+def fit_svc_platt(decision_function: np.ndarray,
+                  y: np.ndarray,
+                  classes: np.ndarray):
+    """
+    Fit Platt parameters for a binary SVC from its decision_function outputs, in the convention of the probA_
+    and probB_ attributes libsvm sets with probability=True
+
+    libsvm's decision value is the negated decision_function and its sigmoid models the first class, so
+    P(classes[1] | f) = 1 - 1 / (1 + exp(-probA * f + probB)).
+
+    :param decision_function: decision_function outputs, ideally out-of-fold
+    :param y: labels
+    :param classes: classes_ of the estimator
+    :return: (probA, probB)
+    """
+    return sigmoid_train(-np.asarray(decision_function, dtype=np.float64), np.asarray(y) == classes[0])
+
+
+def svc_platt_probability(decision_function: np.ndarray,
+                          probA: float,
+                          probB: float) -> np.ndarray:
+    """
+    :param decision_function: decision_function outputs of a binary SVC
+    :param probA: probA_ of the SVC or from fit_svc_platt
+    :param probB: probB_ of the SVC or from fit_svc_platt
+    :return: probability of the second class
+    """
+    return 1.0 - sigmoid_predict(-np.asarray(decision_function, dtype=np.float64), probA, probB)
@@ -0,0 +1,145 @@
+# Copyright (c) 2016, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from typing import List, Tuple
+
+import numpy as np
+from sklearn.base import clone
+from sklearn.utils import check_random_state
+
+
+def stratified_partitions(y: np.ndarray,
+                          n_partitions: int,
+                          random_state=None) -> List[np.ndarray]:
+    """
+    :param y: labels
+    :param n_partitions: number of partitions
+    :param random_state: None, int seed or np.random.RandomState
+    :return: sorted row indices of every partition, each class dealt round robin so partitions keep the class ratio
+    """
+    random_state = check_random_state(random_state)
+    partitions = [[] for _ in range(n_partitions)]
+    offset = 0
+    for label in np.unique(y):
+        rows = random_state.permutation(np.flatnonzero(y == label))
+        for i, row in enumerate(rows):
+            partitions[(offset + i) % n_partitions].append(row)
+        offset += len(rows)
+    return [np.sort(np.asarray(p, dtype=np.int64)) for p in partitions]
+
+
+def _make_local_sub_svm(estimator, data_bc, y_bc):
+    def local_sub_svm(rows):
+        local_y = y_bc.value[rows]
+        if len(np.unique(local_y)) < 2:
+            # A single class has no margin, every row stays a candidate
+            return rows
+        svc = clone(estimator).set_params(probability=False).fit(data_bc.value[rows], local_y)
+        return rows[svc.support_]
+
+    return local_sub_svm
+
+
+def cascade_support_vectors(backend,
+                            estimator,
+                            X: np.ndarray,
+                            y: np.ndarray,
+                            n_partitions: int,
+                            max_iterations: int = 5,
+                            random_state=None,
+                            verbose: int = 0) -> Tuple[np.ndarray, List[dict]]:
+    """
+    Support vectors of the whole training set by a cascade of SVMs on partitions of it (Graf et al., 2005)
+
+    The first layer trains one SVC per partition. Every following layer merges the support vectors of pairs of
+    SVCs and trains on the union, until a single SVC remains. Its support vectors are fed back into every first
+    layer partition and the cascade repeats until they no longer change. Every layer runs as one parallel job;
+    the training data is broadcast once and tasks exchange row indices only.
+
+    :param backend: backend running the tasks
+    :param estimator: SVC with the training parameters
+    :param X: training data
+    :param y: training labels
+    :param n_partitions: number of first layer partitions
+    :param max_iterations: maximum number of passes through the cascade
+    :param random_state: None, int seed or np.random.RandomState of the partitioning
+    :param verbose: print every pass when > 0
+    :return: sorted row indices of the support vectors and the size of every layer of every pass
+    """
+    partitions = stratified_partitions(y, n_partitions, random_state)
+    data_bc = backend.broadcast(X)
+    y_bc = backend.broadcast(y)
+    local_sub_svm = _make_local_sub_svm(estimator, data_bc, y_bc)
+
+    support = np.empty(0, dtype=np.int64)
+    history = []
+    for iteration in range(max_iterations):
+        layer = [np.union1d(p, support) for p in partitions]
+        layer_sizes = []
+        while True:
+            layer_sizes.append([len(rows) for rows in layer])
+            vectors = backend.run_tasks(local_sub_svm, [[rows] for rows in layer])
+            if len(vectors) == 1:
+                break
+            layer = [np.union1d(vectors[i], vectors[i + 1]) if i + 1 < len(vectors) else vectors[i]
+                     for i in range(0, len(vectors), 2)]
+
+        previous, support = support, np.sort(vectors[0])
+        history.append({'iteration': iteration, 'n_support': len(support), 'layers': layer_sizes})
+        if verbose > 0:
+            print("Cascade pass {0}: {1} support vectors, layers {2}".format(iteration + 1, len(support),
+                                                                            layer_sizes))
+        if np.array_equal(previous, support):
+            break
+
+    data_bc.unpersist()
+    y_bc.unpersist()
+    return support, history
+
+
+def cascade_fit(backend,
+                estimator,
+                X: np.ndarray,
+                y: np.ndarray,
+                n_partitions: int,
+                max_iterations: int = 5,
+                random_state=None,
+                verbose: int = 0):
+    """
+    :param backend: backend running the tasks
+    :param estimator: SVC with the training parameters
+    :param X: training data
+    :param y: training labels
+    :param n_partitions: number of first layer partitions
+    :param max_iterations: maximum number of passes through the cascade
+    :param random_state: None, int seed or np.random.RandomState of the partitioning
+    :param verbose: print every pass when > 0
+    :return: clone of estimator fitted on the support vectors found by the cascade, with the cascade history in
+        its cascade_history_ attribute
+    """
+    support, history = cascade_support_vectors(backend, estimator, X, y, n_partitions, max_iterations,
+                                               random_state, verbose)
+    model = clone(estimator).fit(X[support], y[support])
+    model.cascade_history_ = history
+    return model
@@ -0,0 +1,204 @@
+# Copyright (c) 2016, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import json
+
+import numpy as np
+
+from cerebralcortex.data_processor.model.calibration import svc_platt_probability
+from cerebralcortex.data_processor.model.kernel import rbf_kernel_matrix
+
+FORMAT_VERSION = 1
+
+
+class CompactSVCModel:
+    """
+    Binary RBF SVC in a compact array layout, together with the feature normalization and decision biases of
+    the cStress model, for fast batch scoring
+
+    The model is stored as an uncompressed .npz archive of contiguous float64 arrays, so loading it is a few
+    reads instead of parsing one JSON object per support vector.
+    """
+
+    def __init__(self,
+                 support_vectors: np.ndarray,
+                 dual_coef: np.ndarray,
+                 intercept: float,
+                 gamma: float,
+                 probA: float,
+                 probB: float,
+                 bias,
+                 mean: np.ndarray,
+                 scale: np.ndarray,
+                 model_name: str = 'cStress'):
+        self.support_vectors = np.ascontiguousarray(support_vectors, dtype=np.float64)
+        self.dual_coef = np.ascontiguousarray(dual_coef, dtype=np.float64).ravel()
+        self.intercept = float(intercept)
+        self.gamma = float(gamma)
+        self.probA = float(probA)
+        self.probB = float(probB)
+        self.bias = np.atleast_1d(np.asarray(bias, dtype=np.float64))
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.model_name = model_name
+
+        if self.support_vectors.shape[0] != len(self.dual_coef):
+            raise ValueError('Got %d support vectors but %d dual coefficients'
+                             % (self.support_vectors.shape[0], len(self.dual_coef)))
+
+    @property
+    def n_support(self) -> int:
+        return len(self.dual_coef)
+
+    @classmethod
+    def from_estimator(cls, model, normparams, bias=0.5, probA=None, probB=None, model_name='cStress'):
+        """
+        :param model: fitted binary sklearn SVC with an rbf kernel
+        :param normparams: fitted StandardScaler applied before the SVC
+        :param bias: decision threshold, or [low, high] thresholds of the two-bias scorer
+        :param probA: Platt slope, defaults to model.probA_
+        :param probB: Platt offset, defaults to model.probB_
+        :param model_name: name stored with the model
+        :return: CompactSVCModel
+        """
+        if probA is None or probB is None:
+            probA, probB = model.probA_[0], model.probB_[0]
+        return cls(model.support_vectors_, model.dual_coef_[0], model.intercept_[0], model._gamma, probA, probB,
+                   bias, normparams.mean_, normparams.scale_, model_name)
+
+    def save(self, filename: str):
+        """
+        :param filename: output file, conventionally with an .npz extension
+        """
+        with open(filename, 'wb') as f:
+            np.savez(f, format_version=np.array(FORMAT_VERSION), model_name=np.array(self.model_name),
+                     support_vectors=self.support_vectors, dual_coef=self.dual_coef,
+                     intercept=np.array(self.intercept), gamma=np.array(self.gamma),
+                     probA=np.array(self.probA), probB=np.array(self.probB), bias=self.bias,
+                     mean=self.mean, scale=self.scale)
+
+    @classmethod
+    def load(cls, filename: str):
+        """
+        :param filename: file written by CompactSVCModel.save
+        :return: CompactSVCModel
+        """
+        with np.load(filename) as data:
+            if int(data['format_version']) > FORMAT_VERSION:
+                raise ValueError('Unsupported model format version %d' % int(data['format_version']))
+            return cls(data['support_vectors'], data['dual_coef'], data['intercept'], data['gamma'],
+                       data['probA'], data['probB'], data['bias'], data['mean'], data['scale'],
+                       str(data['model_name']))
+
+    @classmethod
+    def from_json(cls, filename: str):
+        """
+        :param filename: JSON model written by save_model of the training scripts
+        :return: CompactSVCModel
+        """
+        with open(filename) as f:
+            model = json.load(f)
+
+        gamma = [p['value'] for p in model['kernel']['parameters'] if p['name'] == 'gamma'][0]
+        return cls(np.array([s['supportVector'] for s in model['support']], dtype=np.float64),
+                   np.array([s['dualCoef'] for s in model['support']], dtype=np.float64),
+                   model['intercept'], gamma, model['probA'], model['probB'], model['bias'],
+                   np.array([p['mean'] for p in model['normparams']], dtype=np.float64),
+                   np.array([p['std'] for p in model['normparams']], dtype=np.float64),
+                   model['modelName'])
+
+    def to_json(self, filename: str):
+        """
+        :param filename: output file in the JSON layout of save_model of the training scripts
+        """
+        model = {'modelName': self.model_name, 'modelType': 'svc', 'intercept': self.intercept,
+                 'bias': self.bias.tolist() if len(self.bias) > 1 else float(self.bias[0]),
+                 'probA': self.probA, 'probB': self.probB,
+                 'kernel': {'type_val': 'rbf', 'parameters': [{'name': 'gamma', 'value': self.gamma}]},
+                 'support': [{'dualCoef': float(c), 'supportVector': v.tolist()}
+                             for c, v in zip(self.dual_coef, self.support_vectors)],
+                 'normparams': [{'mean': float(m), 'std': float(s)} for m, s in zip(self.mean, self.scale)]}
+        with open(filename, 'w') as f:
+            f.write(json.dumps(model, sort_keys=True, indent=4))
+
+    def standardize(self, X: np.ndarray) -> np.ndarray:
+        """
+        :param X: raw feature matrix
+        :return: features normalized with the training mean and standard deviation
+        """
+        return (np.asarray(X, dtype=np.float64) - self.mean) / self.scale
+
+    def decision_function(self, X: np.ndarray, block_size: int = 4096, standardized: bool = False) -> np.ndarray:
+        """
+        RBF decision function evaluated block by block, so memory stays at block_size x n_support kernel entries
+
+        :param X: feature matrix
+        :param block_size: number of rows scored at a time
+        :param standardized: True when X is already normalized
+        :return: decision values, positive for the stress class
+        """
+        X = np.asarray(X, dtype=np.float64)
+        if not standardized:
+            X = self.standardize(X)
+
+        result = np.empty(X.shape[0], dtype=np.float64)
+        for start in range(0, X.shape[0], block_size):
+            stop = min(start + block_size, X.shape[0])
+            K = rbf_kernel_matrix(X[start:stop], self.support_vectors, gamma=self.gamma, block_size=block_size)
+            result[start:stop] = K.dot(self.dual_coef) + self.intercept
+        return result
+
+    def predict_proba(self, X: np.ndarray, block_size: int = 4096, standardized: bool = False) -> np.ndarray:
+        """
+        :param X: feature matrix
+        :param block_size: number of rows scored at a time
+        :param standardized: True when X is already normalized
+        :return: probability of stress for every row
+        """
+        return svc_platt_probability(self.decision_function(X, block_size, standardized), self.probA, self.probB)
+
+    def classify(self, probabilities: np.ndarray) -> np.ndarray:
+        """
+        Apply the stored decision biases to stress probabilities
+
+        :param probabilities: output of predict_proba
+        :return: 1 for stress, 0 for no stress and -1 for windows between the two biases of a two-bias model
+        """
+        probabilities = np.asarray(probabilities)
+        if len(self.bias) == 1:
+            return np.asarray(probabilities >= self.bias[0], dtype=int)
+
+        labels = np.full(len(probabilities), -1, dtype=int)
+        labels[probabilities <= self.bias[0]] = 0
+        labels[probabilities >= self.bias[1]] = 1
+        return labels
+
+    def predict(self, X: np.ndarray, block_size: int = 4096, standardized: bool = False) -> np.ndarray:
+        """
+        :param X: feature matrix
+        :param block_size: number of rows scored at a time
+        :param standardized: True when X is already normalized
+        :return: output of classify for every row
+        """
+        return self.classify(self.predict_proba(X, block_size, standardized))
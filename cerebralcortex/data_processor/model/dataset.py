@@ -0,0 +1,182 @@
+# Copyright (c) 2016, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+
+def participant_id(path: Path) -> int:
+    """
+    :param path: file inside a participant folder such as SI01
+    :return: numeric participant id taken from the folder name
+    """
+    return int(path.parent.name[2:])
+
+
+def parse_feature_file(filename: str) -> Dict[str, np.ndarray]:
+    """
+    Parse a feature file of comma separated rows 'timestamp, feature_1, ..., feature_n' in one pass over the
+    whole text instead of splitting every line in Python
+
+    :param filename: feature file
+    :return: dict of 'timestamps' (int64) and 'features' (float64, one row per line)
+    """
+    with open(filename) as f:
+        text = f.read()
+
+    first_line = text.split('\n', 1)[0].strip()
+    if not first_line:
+        return {'timestamps': np.zeros(0, dtype=np.int64), 'features': np.zeros((0, 0), dtype=np.float64)}
+
+    n_columns = len(first_line.split(','))
+    values = np.array(text.replace(',', ' ').split(), dtype=np.float64)
+    if len(values) % n_columns != 0:
+        raise ValueError('%s does not have %d columns on every line' % (filename, n_columns))
+    values = values.reshape(-1, n_columns)
+
+    # Millisecond timestamps are far below 2^53 and therefore exact in float64
+    return {'timestamps': values[:, 0].astype(np.int64), 'features': np.ascontiguousarray(values[:, 1:])}
+
+
+def parse_stress_mark_file(filename: str) -> Dict[str, np.ndarray]:
+    """
+    Parse a stress mark file of comma separated rows 'label, ..., start, end'
+
+    :param filename: stress mark file
+    :return: dict of 'labels' (two character label codes), 'starts' and 'ends' (int64)
+    """
+    labels, starts, ends = [], [], []
+    with open(filename) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            parts = [x.strip() for x in line.split(',')]
+            labels.append(parts[0][:2])
+            starts.append(int(parts[2]))
+            ends.append(int(parts[3]))
+    return {'labels': np.array(labels, dtype='U2'), 'starts': np.array(starts, dtype=np.int64),
+            'ends': np.array(ends, dtype=np.int64)}
+
+
+class ColumnarCache:
+    """
+    Binary cache of parsed files, one .npz of columns per source file, keyed by the file's path, size and
+    modification time so an edited file is parsed again
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _filename(self, kind: str, source: str) -> str:
+        stat = os.stat(source)
+        key = '%s|%s|%d|%d' % (kind, os.path.abspath(source), stat.st_size, stat.st_mtime_ns)
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.npz')
+
+    def load(self, kind: str, source: str, parse: Callable[[str], Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+        """
+        :param kind: name of the parser, part of the key
+        :param source: file to load
+        :param parse: parser used on a cache miss
+        :return: dict of columns
+        """
+        filename = self._filename(kind, source)
+        if os.path.exists(filename):
+            with np.load(filename) as data:
+                return dict((name, data[name]) for name in data.files)
+
+        columns = parse(source)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            handle, temporary = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(handle, 'wb') as f:
+                np.savez(f, **columns)
+            os.replace(temporary, filename)
+        except OSError:
+            # A read-only cache location only costs the speedup
+            pass
+        return columns
+
+
+def _load_files(folder: str,
+                filename: str,
+                kind: str,
+                parse: Callable[[str], Dict[str, np.ndarray]],
+                cache_dir: str = None) -> Tuple[List[int], List[Dict[str, np.ndarray]]]:
+    files = list(Path(folder).glob('**/' + filename))
+    cache = ColumnarCache(cache_dir) if cache_dir is not None else None
+
+    def load(f):
+        if cache is None:
+            return parse(str(f))
+        return cache.load(kind, str(f), parse)
+
+    return [participant_id(f) for f in files], [load(f) for f in files]
+
+
+def load_features(folder: str,
+                  filename: str,
+                  cache_dir: str = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Load the feature files of every participant below folder
+
+    :param folder: directory with one sub folder per participant
+    :param filename: name of the feature file in each participant folder
+    :param cache_dir: directory of the columnar cache, None disables caching
+    :return: participant ids, timestamps and feature matrix, one entry per row in file order
+    """
+    ids, columns = _load_files(folder, filename, 'features', parse_feature_file, cache_dir)
+    columns = [(pid, c) for pid, c in zip(ids, columns) if len(c['timestamps']) > 0]
+    if len(columns) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros((0, 0), dtype=np.float64)
+
+    participant_ids = np.concatenate([np.full(len(c['timestamps']), pid, dtype=np.int64) for pid, c in columns])
+    timestamps = np.concatenate([c['timestamps'] for _, c in columns])
+    features = np.concatenate([c['features'] for _, c in columns])
+    return participant_ids, timestamps, features
+
+
+def load_stress_marks(folder: str,
+                      filename: str,
+                      cache_dir: str = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Load the stress mark files of every participant below folder
+
+    :param folder: directory with one sub folder per participant
+    :param filename: name of the stress mark file in each participant folder
+    :param cache_dir: directory of the columnar cache, None disables caching
+    :return: participant ids, label codes, start times and end times, one entry per mark in file order
+    """
+    ids, columns = _load_files(folder, filename, 'stress_marks', parse_stress_mark_file, cache_dir)
+
+    participant_ids = np.concatenate([np.full(len(c['starts']), pid, dtype=np.int64)
+                                      for pid, c in zip(ids, columns)] + [np.zeros(0, dtype=np.int64)])
+    labels = np.concatenate([c['labels'] for c in columns] + [np.zeros(0, dtype='U2')])
+    starts = np.concatenate([c['starts'] for c in columns] + [np.zeros(0, dtype=np.int64)])
+    ends = np.concatenate([c['ends'] for c in columns] + [np.zeros(0, dtype=np.int64)])
+    return participant_ids, labels, starts, ends
@@ -0,0 +1,175 @@
+# Copyright (c) 2016, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from typing import Callable, List, Tuple
+
+import numpy as np
+from sklearn.base import clone
+
+from cerebralcortex.data_processor.model.kernel import precomputed_parameters, resolve_gamma
+
+
+def feature_squared_distances(column: np.ndarray) -> np.ndarray:
+    """
+    :param column: values of one feature
+    :return: matrix of the squared differences of the feature between every pair of samples
+    """
+    column = np.asarray(column, dtype=np.float64)
+    distances = np.subtract.outer(column, column)
+    distances *= distances
+    return distances
+
+
+def squared_distances(X: np.ndarray,
+                      features: List[int] = None) -> np.ndarray:
+    """
+    Squared Euclidean distances between samples as the sum of the per-feature squared differences, the form
+    that lets a feature be added or removed by adding or subtracting one feature_squared_distances matrix
+
+    :param X: data
+    :param features: columns to include, all by default
+    :return: array of shape (n_samples, n_samples)
+    """
+    features = range(X.shape[1]) if features is None else features
+    distances = np.zeros((X.shape[0], X.shape[0]))
+    for feature in features:
+        distances += feature_squared_distances(X[:, feature])
+    return distances
+
+
+def _make_local_evaluate(estimator, parameters, data_bc, y_bc, distances_bc, folds_bc, scorer, sign):
+    def local_evaluate(task):
+        (feature, n_features) = task
+        # The broadcast matrix is shared read-only; the kernel is the only n x n array a task allocates
+        if feature is None:
+            kernel = np.array(distances_bc.value, dtype=np.float64)
+        else:
+            kernel = feature_squared_distances(data_bc.value[:, feature])
+            kernel *= sign
+            kernel += distances_bc.value
+            # Subtraction can leave rounding residue below zero on the diagonal
+            np.maximum(kernel, 0.0, out=kernel)
+        kernel *= -resolve_gamma(parameters, estimator, n_features)
+        np.exp(kernel, out=kernel)
+
+        local_y = y_bc.value
+        scores = []
+        for train, test in folds_bc.value:
+            # Only the decision values rank the candidates, libsvm's internal Platt cross-validation is wasted
+            model = clone(estimator).set_params(probability=False, **precomputed_parameters(parameters))
+            model.fit(kernel[np.ix_(train, train)], local_y[train])
+            scores.append(scorer(model, kernel[np.ix_(test, train)], local_y[test]))
+        return feature, float(np.mean(scores))
+
+    return local_evaluate
+
+
+def sequential_feature_selection(backend,
+                                 estimator,
+                                 parameters: dict,
+                                 X: np.ndarray,
+                                 y: np.ndarray,
+                                 folds: List[tuple],
+                                 scorer: Callable,
+                                 direction: str = 'forward',
+                                 n_features_to_select: int = None,
+                                 tol: float = 0.0,
+                                 verbose: int = 0) -> Tuple[List[int], List[dict]]:
+    """
+    Greedy forward or backward selection of the features of an RBF SVC
+
+    The driver keeps the squared distance matrix of the current subset. Every step broadcasts it once, and each
+    task evaluates one candidate subset by adding (forward) or subtracting (backward) the squared differences
+    of a single feature before taking the kernel, instead of recomputing the kernel over all features. The
+    candidate subsets of a step are evaluated in parallel on the backend.
+
+    :param backend: backend running the tasks
+    :param estimator: SVC the parameters apply to
+    :param parameters: SVC parameters, usually the best ones of a grid search; gamma='auto' follows the subset size
+    :param X: training data
+    :param y: training labels
+    :param folds: list of (train, test) indices
+    :param scorer: scorer(estimator, X, y) called with the fold model and the test rows of the kernel
+    :param direction: 'forward' starts from no feature and adds, 'backward' starts from all and removes
+    :param n_features_to_select: stop at this many features; by default stop when a step does not improve the
+        mean fold score by more than tol
+    :param tol: minimum improvement of a step without n_features_to_select
+    :param verbose: print every step when > 0
+    :return: selected features in the order chosen (forward) or in column order (backward), and one dict per
+        step with the feature added or removed, the number of features and the mean fold score
+    """
+    if direction not in ('forward', 'backward'):
+        raise ValueError('direction must be forward or backward, got %s' % direction)
+    forward = direction == 'forward'
+    n_total = X.shape[1]
+    limit = n_features_to_select if n_features_to_select is not None else (n_total if forward else 1)
+
+    y_bc = backend.broadcast(y)
+    data_bc = backend.broadcast(X)
+    folds_bc = backend.broadcast(folds)
+
+    selected = [] if forward else list(range(n_total))
+    distances = np.zeros((X.shape[0], X.shape[0])) if forward else squared_distances(X)
+    score = -np.inf
+    history = []
+    if not forward:
+        distances_bc = backend.broadcast(distances)
+        local_evaluate = _make_local_evaluate(estimator, parameters, data_bc, y_bc, distances_bc, folds_bc, scorer, 0)
+        score = backend.run_tasks(local_evaluate, [[(None, n_total)]])[0][1]
+        distances_bc.unpersist()
+        history.append({'feature': None, 'action': 'start', 'n_features': n_total, 'score': score})
+
+    while (len(selected) < limit) if forward else (len(selected) > limit):
+        candidates = [f for f in range(n_total) if f not in selected] if forward else list(selected)
+        n_features = len(selected) + (1 if forward else -1)
+
+        distances_bc = backend.broadcast(distances)
+        local_evaluate = _make_local_evaluate(estimator, parameters, data_bc, y_bc, distances_bc, folds_bc, scorer,
+                                              1 if forward else -1)
+        results = dict(backend.run_tasks(local_evaluate, [[(f, n_features)] for f in candidates]))
+        distances_bc.unpersist()
+
+        # Ties go to the lowest column
+        best = max(candidates, key=lambda f: (results[f], -f))
+        if n_features_to_select is None and results[best] <= score + tol:
+            break
+
+        score = results[best]
+        if forward:
+            selected.append(best)
+            distances += feature_squared_distances(X[:, best])
+        else:
+            selected.remove(best)
+            distances -= feature_squared_distances(X[:, best])
+            np.maximum(distances, 0.0, out=distances)
+        history.append({'feature': best, 'action': 'add' if forward else 'remove', 'n_features': len(selected),
+                        'score': score})
+        if verbose > 0:
+            print("{0} feature {1}: {2} features, score {3}".format(
+                'Added' if forward else 'Removed', best, len(selected), score))
+
+    folds_bc.unpersist()
+    data_bc.unpersist()
+    y_bc.unpersist()
+    return selected, history
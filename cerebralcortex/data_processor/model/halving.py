@@ -0,0 +1,94 @@
+# Copyright (c) 2016, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import math
+from typing import List, Tuple
+
+import numpy as np
+
+
+def halving_schedule(n_candidates: int,
+                     n_folds: int,
+                     factor: int = 3,
+                     min_folds: int = 1) -> List[Tuple[int, int]]:
+    """
+    Rungs of a successive-halving search that spends cross-validation folds as its resource
+
+    Each rung keeps 1/factor of the candidates of the previous rung and evaluates them on factor times as many
+    folds, until the survivors are evaluated on every fold.
+
+    :param n_candidates: number of candidates in the first rung
+    :param n_folds: total number of cross-validation folds
+    :param factor: reduction factor between rungs
+    :param min_folds: number of folds every candidate is evaluated on in the first rung
+    :return: list of (number of candidates, number of folds) per rung
+    """
+    if factor < 2:
+        raise ValueError('factor must be at least 2, got %d' % factor)
+    if n_candidates < 1 or n_folds < 1:
+        raise ValueError('A halving search needs at least one candidate and one fold')
+
+    min_folds = max(1, min(min_folds, n_folds))
+    n_rungs = 1 + int(math.ceil(math.log(float(n_folds) / min_folds, factor) - 1e-9))
+    # No point in further rungs once a single candidate is left
+    n_rungs = max(1, min(n_rungs, 1 + int(math.ceil(math.log(n_candidates, factor) - 1e-9))))
+
+    schedule = []
+    for rung in range(n_rungs):
+        if rung == n_rungs - 1:
+            folds = n_folds
+        else:
+            folds = min(n_folds, min_folds * factor ** rung)
+        candidates = max(1, int(math.ceil(n_candidates / float(factor ** rung))))
+        schedule.append((candidates, folds))
+    return schedule
+
+
+def fold_order(n_folds: int,
+               random_state=None) -> np.ndarray:
+    """
+    Order in which folds are added to the rungs; every rung uses a prefix so earlier results are reused
+
+    :param n_folds: total number of cross-validation folds
+    :param random_state: None, int seed or np.random.RandomState
+    :return: permutation of range(n_folds)
+    """
+    if not isinstance(random_state, np.random.RandomState):
+        random_state = np.random.RandomState(random_state)
+    return random_state.permutation(n_folds)
+
+
+def top_candidates(candidate_ids: List[int],
+                   scores: List[float],
+                   n_keep: int) -> List[int]:
+    """
+    Candidates with the highest scores; ties keep their original order
+
+    :param candidate_ids: candidate identifiers
+    :param scores: score of each candidate, higher is better
+    :param n_keep: number of candidates to keep
+    :return: kept candidate identifiers ordered by decreasing score
+    """
+    order = sorted(range(len(candidate_ids)), key=lambda i: scores[i], reverse=True)
+    return [candidate_ids[i] for i in order[:n_keep]]
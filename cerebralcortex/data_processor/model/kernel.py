@@ -0,0 +1,114 @@
+# Copyright (c) 2016, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from collections import OrderedDict
+from typing import List
+
+import numpy as np
+
+
+def rbf_kernel_matrix(X: np.ndarray,
+                      Y: np.ndarray = None,
+                      gamma: float = 1.0,
+                      block_size: int = 4096) -> np.ndarray:
+    """
+    RBF (Gaussian) kernel matrix evaluated with the same expansion libsvm uses during training,
+    exp(-gamma * (|x|^2 + |y|^2 - 2 x.y)), so that an SVC fit on the result with kernel='precomputed'
+    reproduces an SVC fit with kernel='rbf'
+
+    :param X: array of shape (n_samples_X, n_features)
+    :param Y: array of shape (n_samples_Y, n_features), defaults to X
+    :param gamma: RBF kernel coefficient
+    :param block_size: number of rows of X evaluated at a time to bound temporary memory
+    :return: array of shape (n_samples_X, n_samples_Y)
+    """
+    X = np.asarray(X, dtype=np.float64)
+    Y = X if Y is None else np.asarray(Y, dtype=np.float64)
+
+    x_square = np.einsum('ij,ij->i', X, X)
+    y_square = x_square if Y is X else np.einsum('ij,ij->i', Y, Y)
+
+    K = np.empty((X.shape[0], Y.shape[0]), dtype=np.float64)
+    for start in range(0, X.shape[0], block_size):
+        stop = min(start + block_size, X.shape[0])
+        block = K[start:stop]
+        np.dot(X[start:stop], Y.T, out=block)
+        block *= -2.0
+        block += x_square[start:stop, np.newaxis]
+        block += y_square[np.newaxis, :]
+        block *= -gamma
+        np.exp(block, out=block)
+    return K
+
+
+def resolve_gamma(parameters: dict,
+                  base_estimator,
+                  n_features: int) -> float:
+    """
+    Numeric gamma an RBF SVC would use for a candidate parameter set
+
+    :param parameters: candidate parameters
+    :param base_estimator: SVC the candidate parameters are applied to
+    :param n_features: number of columns of the training data
+    :return: gamma as a float
+    """
+    kernel = parameters.get('kernel', base_estimator.get_params()['kernel'])
+    if kernel != 'rbf':
+        raise ValueError('Kernel precomputation requires an rbf kernel, got %s' % kernel)
+
+    gamma = parameters.get('gamma', base_estimator.get_params()['gamma'])
+    if gamma == 'auto':
+        gamma = 1.0 / n_features
+    return float(gamma)
+
+
+def precomputed_parameters(parameters: dict) -> dict:
+    """
+    Translate RBF candidate parameters into the equivalent parameters for a precomputed kernel
+
+    :param parameters: candidate parameters
+    :return: copy of parameters with kernel='precomputed' and gamma removed
+    """
+    result = dict(parameters)
+    result.pop('gamma', None)
+    result['kernel'] = 'precomputed'
+    return result
+
+
+def group_by_gamma(candidates: List[dict],
+                   base_estimator,
+                   n_features: int) -> OrderedDict:
+    """
+    Group candidate indices by the gamma they share so a single Gram matrix serves every C and class_weight
+
+    :param candidates: list of candidate parameter dicts
+    :param base_estimator: SVC the candidate parameters are applied to
+    :param n_features: number of columns of the training data
+    :return: OrderedDict of gamma -> [candidate index, ...] in first-seen order
+    """
+    groups = OrderedDict()
+    for index, parameters in enumerate(candidates):
+        gamma = resolve_gamma(parameters, base_estimator, n_features)
+        groups.setdefault(gamma, []).append(index)
+    return groups
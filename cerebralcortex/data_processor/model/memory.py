@@ -0,0 +1,95 @@
+# Copyright (c) 2016, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import resource
+
+MIN_CACHE_SIZE = 16
+MAX_CACHE_SIZE = 2000
+
+
+def available_memory_mb() -> float:
+    """
+    :return: memory available to new processes on this node, from /proc/meminfo
+    """
+    with open('/proc/meminfo') as f:
+        for line in f:
+            name, value = line.split(':', 1)
+            if name == 'MemAvailable':
+                return int(value.split()[0]) / 1024.0
+    raise OSError('MemAvailable not found in /proc/meminfo')
+
+
+def kernel_cache_size(n_train: int,
+                      n_features: int,
+                      memory_budget_mb: float,
+                      concurrent_tasks: int,
+                      reserve_fraction: float = 0.25) -> int:
+    """
+    libsvm kernel cache size for one fit so that concurrent_tasks fits stay within a memory budget
+
+    Each task gets an equal share of the budget left after a safety reserve, minus its copy of the training
+    data (held twice, as the NumPy array and as libsvm's sparse nodes). The cache is also capped at the full
+    kernel matrix of the training set (float32 rows), beyond which libsvm cannot use it.
+
+    :param n_train: number of training samples of the fit
+    :param n_features: number of features, or of columns of a precomputed kernel
+    :param memory_budget_mb: memory of the executor or node running the tasks
+    :param concurrent_tasks: number of fits running at once within the budget
+    :param reserve_fraction: part of the budget kept free for the interpreter and broadcast data
+    :return: cache_size in MB for sklearn.svm.SVC
+    """
+    share = memory_budget_mb * (1.0 - reserve_fraction) / max(1, concurrent_tasks)
+    data = n_train * n_features * (8 + 16) / 2.0 ** 20
+    full_kernel = n_train * float(n_train) * 4 / 2.0 ** 20
+    cache = min(share - data, full_kernel + 1, MAX_CACHE_SIZE)
+    return int(max(MIN_CACHE_SIZE, cache))
+
+
+def reset_peak_memory() -> bool:
+    """
+    Restart the peak resident memory (VmHWM) of this process at its current size, so peak_memory_mb measures
+    the task that runs next in a reused worker process
+
+    :return: False where the kernel does not support it, peak_memory_mb then reports the process lifetime peak
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except (IOError, OSError):
+        return False
+
+
+def peak_memory_mb() -> float:
+    """
+    :return: peak resident memory of this process in MB since the last reset_peak_memory
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024.0
+    except (IOError, OSError):
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
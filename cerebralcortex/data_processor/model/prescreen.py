@@ -0,0 +1,131 @@
+# Copyright (c) 2016, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from typing import Callable, List
+
+import numpy as np
+from scipy.stats import kendalltau, spearmanr
+from sklearn.kernel_approximation import Nystroem
+from sklearn.svm import LinearSVC
+
+from cerebralcortex.data_processor.model.kernel import group_by_gamma
+from cerebralcortex.data_processor.model.scheduler import pack_tasks
+
+
+def nystroem_features(X: np.ndarray,
+                      gamma: float,
+                      n_components: int = 300,
+                      random_state=None) -> np.ndarray:
+    """
+    Low rank feature map whose inner products approximate the RBF kernel, so a linear classifier on it
+    approximates an RBF SVC at the same gamma
+
+    :param X: data
+    :param gamma: RBF kernel coefficient
+    :param n_components: number of landmark samples, the rank of the approximation
+    :param random_state: None, int seed or np.random.RandomState choosing the landmarks
+    :return: array of shape (n_samples, min(n_components, n_samples))
+    """
+    n_components = min(n_components, X.shape[0])
+    return Nystroem(kernel='rbf', gamma=gamma, n_components=n_components,
+                    random_state=random_state).fit_transform(X)
+
+
+def _make_local_screen(features_bc, y_bc, params_bc, folds_bc, scorer):
+    def local_screen(task):
+        (param_id, fold_id) = task
+        parameters = params_bc.value[param_id]
+        train, test = folds_bc.value[fold_id]
+        local_features = features_bc.value
+        local_y = y_bc.value
+        # The primal solver converges in a few iterations on n_samples >> n_components, unlike the dual hinge
+        model = LinearSVC(C=parameters.get('C', 1.0), class_weight=parameters.get('class_weight'), dual=False,
+                          tol=1e-3, random_state=0)
+        model.fit(local_features[train], local_y[train])
+        return task, scorer(model, local_features[test], local_y[test])
+
+    return local_screen
+
+
+def prescreen_scores(backend,
+                     X: np.ndarray,
+                     y: np.ndarray,
+                     candidates: List[dict],
+                     folds: List[tuple],
+                     scorer: Callable,
+                     base_estimator,
+                     n_components: int = 300,
+                     random_state=None,
+                     n_partitions: int = None) -> np.ndarray:
+    """
+    Approximate cross-validation score of every RBF SVC candidate: a linear SVM (squared hinge loss) with the
+    candidate's C and class_weight on the Nystroem features of its gamma, fitted per fold on the backend
+
+    :param backend: backend running the tasks
+    :param X: training data
+    :param y: training labels
+    :param candidates: candidate parameter dicts of an RBF SVC
+    :param folds: list of (train, test) indices
+    :param scorer: scorer(estimator, X, y) of the search, called with the linear model and Nystroem features
+    :param base_estimator: estimator whose gamma applies to candidates without one
+    :param n_components: rank of the kernel approximation
+    :param random_state: None, int seed or np.random.RandomState choosing the landmarks
+    :param n_partitions: number of partitions per gamma, four per core by default
+    :return: mean fold score of every candidate
+    """
+    n_partitions = n_partitions or 4 * backend.parallelism
+    scores = np.zeros((len(candidates), len(folds)))
+
+    y_bc = backend.broadcast(y)
+    params_bc = backend.broadcast(candidates)
+    folds_bc = backend.broadcast(folds)
+    for gamma, indices in group_by_gamma(candidates, base_estimator, X.shape[1]).items():
+        features_bc = backend.broadcast(nystroem_features(X, gamma, n_components, random_state))
+        tasks = [(param_id, fold_id) for param_id in indices for fold_id in range(len(folds))]
+        partitions = pack_tasks(tasks, [len(folds[fold_id][0]) for _, fold_id in tasks], n_partitions)
+        local_screen = _make_local_screen(features_bc, y_bc, params_bc, folds_bc, scorer)
+        for (param_id, fold_id), score in backend.run_tasks(local_screen, partitions):
+            scores[param_id, fold_id] = score
+        features_bc.unpersist()
+    folds_bc.unpersist()
+    params_bc.unpersist()
+    y_bc.unpersist()
+
+    return scores.mean(axis=1)
+
+
+def rank_agreement(approximate: np.ndarray,
+                   exact: np.ndarray) -> dict:
+    """
+    :param approximate: pre-screening scores of some candidates
+    :param exact: exact cross-validation scores of the same candidates
+    :return: Spearman and Kendall rank correlations and whether both agree on the best candidate
+    """
+    approximate = np.asarray(approximate, dtype=np.float64)
+    exact = np.asarray(exact, dtype=np.float64)
+    if len(exact) < 2:
+        return {'n_candidates': len(exact), 'spearman': float('nan'), 'kendall': float('nan'), 'same_best': True}
+    return {'n_candidates': len(exact), 'spearman': float(spearmanr(approximate, exact)[0]),
+            'kendall': float(kendalltau(approximate, exact)[0]),
+            'same_best': bool(np.argmax(approximate) == np.argmax(exact))}
@@ -0,0 +1,193 @@
+# Copyright (c) 2016, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import math
+from typing import List, Tuple
+
+import numpy as np
+from sklearn.base import clone
+from sklearn.metrics import f1_score
+
+from cerebralcortex.data_processor.model.calibration import svc_platt_probability
+from cerebralcortex.data_processor.model.compact_model import CompactSVCModel
+from cerebralcortex.data_processor.model.kernel import rbf_kernel_matrix
+
+
+def prune_support_vectors(model: CompactSVCModel,
+                          n_keep: int,
+                          refit: bool = True) -> CompactSVCModel:
+    """
+    Keep the n_keep support vectors with the largest |dual_coef|
+
+    With refit, the dual coefficients of the kept vectors are the least squares fit of the full decision function
+    at all original support vectors (a reduced-set projection), which recovers most of the contribution of the
+    dropped vectors instead of discarding it.
+
+    :param model: trained model
+    :param n_keep: number of support vectors to keep
+    :param refit: refit the dual coefficients of the kept vectors
+    :return: model with n_keep support vectors, the same normalization, intercept, Platt parameters and biases
+    """
+    n_keep = min(max(int(n_keep), 1), model.n_support)
+    order = np.argsort(-np.abs(model.dual_coef), kind='mergesort')
+    keep = np.sort(order[:n_keep])
+    dual_coef = model.dual_coef[keep]
+    if refit and n_keep < model.n_support:
+        K = rbf_kernel_matrix(model.support_vectors, model.support_vectors[keep], gamma=model.gamma)
+        target = rbf_kernel_matrix(model.support_vectors, gamma=model.gamma).dot(model.dual_coef)
+        dual_coef = np.linalg.lstsq(K, target, rcond=1e-10)[0]
+    return CompactSVCModel(model.support_vectors[keep], dual_coef, model.intercept, model.gamma, model.probA,
+                           model.probB, model.bias, model.mean, model.scale, model.model_name)
+
+
+def classified_f1(labels: np.ndarray, y: np.ndarray) -> float:
+    """
+    :param labels: output of CompactSVCModel.classify, -1 for windows between the two biases
+    :param y: true labels
+    :return: F1 of the stress class over the classified windows, as reported by the training scripts
+    """
+    classified = labels >= 0
+    if not np.any(classified):
+        return 0.0
+    return float(f1_score(np.asarray(y)[classified], labels[classified]))
+
+
+def reduce_support_vectors(model: CompactSVCModel,
+                           X: np.ndarray,
+                           y: np.ndarray,
+                           tolerance: float = 0.01,
+                           refit: bool = True,
+                           standardized: bool = False) -> Tuple[CompactSVCModel, dict]:
+    """
+    Smallest pruned model whose F1 on X stays within tolerance of the full model, by bisection on the number of
+    support vectors
+
+    :param model: trained model
+    :param X: evaluation windows
+    :param y: labels of the evaluation windows
+    :param tolerance: largest accepted drop of F1
+    :param refit: refit the dual coefficients of the kept vectors
+    :param standardized: True when X is already normalized
+    :return: reduced model and the support vector counts and F1 of both models
+    """
+    def f1(candidate):
+        return classified_f1(candidate.predict(X, standardized=standardized), y)
+
+    full_f1 = f1(model)
+    low, high = 1, model.n_support
+    best, best_f1 = model, full_f1
+    while low < high:
+        middle = (low + high) // 2
+        candidate = prune_support_vectors(model, middle, refit)
+        candidate_f1 = f1(candidate)
+        if candidate_f1 >= full_f1 - tolerance:
+            best, best_f1, high = candidate, candidate_f1, middle
+        else:
+            low = middle + 1
+
+    return best, {'n_support': model.n_support, 'n_support_reduced': best.n_support,
+                  'reduction': 1.0 - best.n_support / float(model.n_support), 'f1': full_f1, 'f1_reduced': best_f1}
+
+
+def _make_local_fold_reduction(estimator, data_bc, y_bc, keep_fraction, refit):
+    def local_fold_reduction(fold):
+        train, test = fold
+        local_X, local_y = data_bc.value, y_bc.value
+        svc = clone(estimator).set_params(probability=False).fit(local_X[train], local_y[train])
+        n_features = local_X.shape[1]
+        model = CompactSVCModel(svc.support_vectors_, svc.dual_coef_[0], svc.intercept_[0], svc._gamma, 0.0, 0.0,
+                                0.5, np.zeros(n_features), np.ones(n_features))
+        reduced = prune_support_vectors(model, int(math.ceil(keep_fraction * model.n_support)), refit)
+        return (test, model.decision_function(local_X[test], standardized=True),
+                reduced.decision_function(local_X[test], standardized=True))
+
+    return local_fold_reduction
+
+
+def cross_subject_reduction(backend,
+                            estimator,
+                            X: np.ndarray,
+                            y: np.ndarray,
+                            folds: List[tuple],
+                            keep_fraction: float,
+                            refit: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Out-of-fold decision values of the fold models and of the fold models pruned to the same fraction of their
+    support vectors, one parallel task per fold
+
+    :param backend: backend running the tasks
+    :param estimator: SVC with the parameters of the model
+    :param X: normalized training data
+    :param y: training labels
+    :param folds: list of (train, test) indices
+    :param keep_fraction: fraction of the support vectors of every fold model to keep
+    :param refit: refit the dual coefficients of the kept vectors
+    :return: decision values of the full and of the pruned fold models for every window
+    """
+    data_bc = backend.broadcast(X)
+    y_bc = backend.broadcast(y)
+    results = backend.run_tasks(_make_local_fold_reduction(estimator, data_bc, y_bc, keep_fraction, refit),
+                                [[fold] for fold in folds])
+    data_bc.unpersist()
+    y_bc.unpersist()
+
+    full = np.zeros(len(y))
+    reduced = np.zeros(len(y))
+    for test, full_decision, reduced_decision in results:
+        full[test] = full_decision
+        reduced[test] = reduced_decision
+    return full, reduced
+
+
+def reduction_report(backend,
+                     model: CompactSVCModel,
+                     estimator,
+                     X: np.ndarray,
+                     y: np.ndarray,
+                     folds: List[tuple],
+                     tolerance: float = 0.01,
+                     refit: bool = True) -> Tuple[CompactSVCModel, dict]:
+    """
+    Reduce a model within an F1 tolerance on the training windows and measure the change of cross-subject F1 by
+    pruning every fold model to the same fraction of support vectors
+
+    :param backend: backend running the fold tasks
+    :param model: trained model; its Platt parameters and biases turn fold decision values into classifications,
+        whether they come from libsvm or from a fit on the out-of-fold decision values
+    :param estimator: SVC with the parameters of the model
+    :param X: normalized training data
+    :param y: training labels
+    :param folds: list of (train, test) indices
+    :param tolerance: largest accepted drop of the training F1
+    :param refit: refit the dual coefficients of the kept vectors
+    :return: reduced model and the report of reduce_support_vectors with the cross-subject F1 of the full and
+        reduced fold models under 'cv_f1' and 'cv_f1_reduced'
+    """
+    reduced, report = reduce_support_vectors(model, X, y, tolerance, refit, standardized=True)
+    full_cv, reduced_cv = cross_subject_reduction(backend, estimator, X, y, folds,
+                                                  reduced.n_support / float(model.n_support), refit)
+    report['cv_f1'] = classified_f1(model.classify(svc_platt_probability(full_cv, model.probA, model.probB)), y)
+    report['cv_f1_reduced'] = classified_f1(
+        model.classify(svc_platt_probability(reduced_cv, model.probA, model.probB)), y)
+    return reduced, report
@@ -0,0 +1,150 @@
+# Copyright (c) 2016, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+
+import numpy as np
+
+
+def array_fingerprint(*arrays) -> str:
+    """
+    Content hash of one or more arrays, including their dtype and shape
+
+    :param arrays: array-like objects
+    :return: hex digest
+    """
+    digest = hashlib.sha1()
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        digest.update(str(array.dtype).encode('utf-8'))
+        digest.update(str(array.shape).encode('utf-8'))
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+def parameters_fingerprint(parameters: dict) -> str:
+    """
+    Canonical text form of a parameter dict, independent of key order
+
+    :param parameters: estimator or candidate parameters
+    :return: canonical string
+    """
+    return json.dumps(parameters, sort_keys=True, default=repr)
+
+
+class ResultStore:
+    """
+    Persistent content-addressed store of search results
+
+    Every result is written to its own file named by a hash of everything that determines it (training matrix,
+    labels, fold assignment, estimator parameters and scorer), so an interrupted search resumes where it stopped
+    and an extended grid only evaluates its new candidates. Files are written atomically, which makes the store
+    safe to share between concurrent tasks; on a cluster the directory must be on a filesystem every executor
+    can reach.
+    """
+
+    def __init__(self, path: str):
+        self.path = os.path.abspath(path)
+        os.makedirs(self.path, exist_ok=True)
+
+    @staticmethod
+    def dataset_digest(X, y, estimator=None, scorer=None) -> str:
+        """
+        Digest of the inputs shared by every task of a search, computed once on the driver
+
+        :param X: training data
+        :param y: training labels
+        :param estimator: base estimator whose parameters are part of the key
+        :param scorer: scorer callable used to evaluate the folds
+        :return: hex digest
+        """
+        digest = hashlib.sha1(array_fingerprint(X, y).encode('utf-8'))
+        if estimator is not None:
+            digest.update(type(estimator).__name__.encode('utf-8'))
+            digest.update(parameters_fingerprint(estimator.get_params()).encode('utf-8'))
+        if scorer is not None:
+            digest.update(getattr(scorer, '__name__', type(scorer).__name__).encode('utf-8'))
+        return digest.hexdigest()
+
+    @staticmethod
+    def key(dataset_digest: str, parameters: dict, *folds) -> str:
+        """
+        Key of a single result
+
+        :param dataset_digest: output of ResultStore.dataset_digest
+        :param parameters: candidate parameters
+        :param folds: train and test index arrays the result was computed on
+        :return: hex digest
+        """
+        digest = hashlib.sha1(dataset_digest.encode('utf-8'))
+        digest.update(parameters_fingerprint(parameters).encode('utf-8'))
+        for fold in folds:
+            digest.update(array_fingerprint(fold).encode('utf-8'))
+        return digest.hexdigest()
+
+    def _filename(self, key: str) -> str:
+        return os.path.join(self.path, key[:2], key + '.pkl')
+
+    def get(self, key: str, default=None):
+        """
+        :param key: result key
+        :param default: value returned when the key is not stored
+        :return: stored result or default
+        """
+        try:
+            with open(self._filename(key), 'rb') as f:
+                return pickle.load(f)
+        except (IOError, OSError, EOFError, pickle.UnpicklingError):
+            return default
+
+    def __contains__(self, key: str) -> bool:
+        return os.path.exists(self._filename(key))
+
+    def put(self, key: str, result):
+        """
+        Atomically store a result
+
+        :param key: result key
+        :param result: picklable result
+        """
+        filename = self._filename(key)
+        directory = os.path.dirname(filename)
+        os.makedirs(directory, exist_ok=True)
+
+        handle, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(handle, 'wb') as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary, filename)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+
+    def __len__(self) -> int:
+        return sum(len([f for f in files if f.endswith('.pkl')]) for _, _, files in os.walk(self.path))
@@ -0,0 +1,112 @@
+# Copyright (c) 2016, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import heapq
+import math
+from collections import OrderedDict
+from typing import Any, Callable, List
+
+import numpy as np
+
+
+def estimate_fit_cost(parameters: dict,
+                      n_train: int,
+                      n_features: int = 1,
+                      precomputed: bool = False) -> float:
+    """
+    Relative cost of fitting an RBF SVC, used only to balance tasks against each other
+
+    libsvm evaluates O(n_train^2) kernel entries, each costing O(n_features) unless the kernel is precomputed.
+    Larger C means more SMO iterations and larger gamma means more support vectors; both grow roughly with the
+    logarithm of the parameter.
+
+    :param parameters: candidate parameters
+    :param n_train: number of training samples of the fold
+    :param n_features: number of features
+    :param precomputed: True when the kernel is looked up in a precomputed Gram matrix
+    :return: cost in arbitrary units
+    """
+    C = float(parameters.get('C', 1.0))
+    gamma = parameters.get('gamma', 1.0 / max(n_features, 1))
+    gamma = 1.0 / max(n_features, 1) if gamma == 'auto' else float(gamma)
+
+    kernel_cost = 1.0 if precomputed else float(n_features)
+    return float(n_train) ** 2 * kernel_cost * (1.0 + math.log2(1.0 + C)) * (1.0 + math.log2(1.0 + gamma))
+
+
+def pack_tasks(tasks: List[Any],
+               costs: List[float],
+               n_partitions: int,
+               group_key: Callable[[Any], Any] = None) -> List[List[Any]]:
+    """
+    Pack tasks into partitions of similar total cost
+
+    Tasks sharing a group key stay together in chunks no larger than the per-partition cost target. Chunks are
+    assigned heaviest first to the least loaded partition (longest processing time first), each partition runs
+    its most expensive chunk first and the partitions themselves are returned heaviest first, which keeps the
+    expensive fits away from the tail of the job.
+
+    :param tasks: tasks to pack
+    :param costs: estimated cost of each task
+    :param n_partitions: maximum number of partitions
+    :param group_key: function of a task returning the key of tasks that should share a partition
+    :return: list of partitions, each a list of tasks
+    """
+    if len(tasks) == 0:
+        return []
+    if len(tasks) != len(costs):
+        raise ValueError('Got %d tasks but %d costs' % (len(tasks), len(costs)))
+
+    n_partitions = max(1, min(n_partitions, len(tasks)))
+    target = float(np.sum(costs)) / n_partitions
+
+    groups = OrderedDict()
+    for index, task in enumerate(tasks):
+        key = group_key(task) if group_key is not None else None
+        groups.setdefault(key, []).append(index)
+
+    chunks = []
+    for indices in groups.values():
+        indices = sorted(indices, key=lambda i: costs[i], reverse=True)
+        chunk, load = [], 0.0
+        for i in indices:
+            if chunk and load + costs[i] > target:
+                chunks.append((load, chunk))
+                chunk, load = [], 0.0
+            chunk.append(i)
+            load += costs[i]
+        chunks.append((load, chunk))
+
+    chunks.sort(key=lambda c: c[0], reverse=True)
+
+    partitions = [[] for _ in range(n_partitions)]
+    loads = [(0.0, p) for p in range(n_partitions)]
+    for load, chunk in chunks:
+        partition_load, p = heapq.heappop(loads)
+        partitions[p].extend(chunk)
+        heapq.heappush(loads, (partition_load + load, p))
+
+    totals = dict((p, load) for load, p in loads)
+    order = sorted((p for p in range(n_partitions) if partitions[p]), key=lambda p: totals[p], reverse=True)
+    return [[tasks[i] for i in partitions[p]] for p in order]
@@ -0,0 +1,149 @@
+# Copyright (c) 2016, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import numpy as np
+from sklearn import metrics
+
+
+def _best_f1_threshold(y, probs):
+    """
+    Highest F1 over the precision-recall curve and the first threshold that reaches it
+
+    :param y: binary labels
+    :param probs: scores of the positive class
+    :return: (f1, threshold), (0.0, 0.0) when no threshold gives a positive F1
+    """
+    precision, recall, thresholds = metrics.precision_recall_curve(y, probs)
+    precision = precision[:len(thresholds)]
+    recall = recall[:len(thresholds)]
+
+    denominator = precision + recall
+    valid = denominator > 0
+    f = np.zeros(len(thresholds))
+    f[valid] = 2 * (precision[valid] * recall[valid]) / denominator[valid]
+
+    if len(f) == 0 or not f.max() > 0.0:
+        return 0.0, 0.0
+    best = int(np.argmax(f))
+    return f[best], thresholds[best]
+
+
+def f1_bias_scorer(estimator, X, y, ret_bias=False):
+    probas_ = estimator.predict_proba(X)
+    f1, bias = _best_f1_threshold(y, probas_[:, 1])
+
+    if ret_bias:
+        return f1, bias
+    else:
+        return f1
+
+
+def f1_bias_scorer_CV(probs, y, ret_bias=False):
+    f1, bias = _best_f1_threshold(y, probs)
+
+    if ret_bias:
+        return f1, bias
+    else:
+        return f1
+
+
+def two_bias_scorer_CV(probs, y, ret_bias=False, min_rate=0.95):
+    """
+    Two-threshold scorer: windows with probabilities between the two biases are left unclassified, and the
+    score is minus the smallest fraction of lost windows for which both the true positive and the true negative
+    rate of the classified windows reach min_rate.
+
+    Sorted sweep with prefix sums: for every lower bias the smallest upper bias meeting the true negative rate is
+    found by a vectorized bisection, which makes the scorer O(n log n). Results, including which bias pair is
+    returned when several reach the same loss, are identical to the original O(n^2) double loop.
+
+    :param probs: cross-validated probabilities of the positive class
+    :param y: binary labels
+    :param ret_bias: also return the bias pair
+    :param min_rate: minimum true positive and true negative rate
+    :return: -loss or (-loss, [low bias, high bias]); the bias list is empty when no pair qualifies
+    """
+    db = np.transpose(np.vstack([probs, y]))
+    db = db[np.argsort(db[:, 0]), :]
+    sorted_probs = db[:, 0]
+    positive = db[:, 1] == 1
+
+    pos = np.sum(y == 1)
+    n = len(y)
+    neg = n - pos
+
+    minloss = 1
+    optbias = []
+
+    if n > 0 and pos > 0 and neg > 0:
+        # P[k] / N[k]: positives / negatives among the k+1 lowest probabilities
+        P = np.cumsum(positive).astype(np.float64)
+        N = np.cumsum(~positive).astype(np.float64)
+        index = np.arange(n)
+
+        # Every window up to i classified negative and every window above it positive
+        tp = pos - P
+        tn = N
+        single = (tp / pos >= min_rate) & (tn / neg >= min_rate)
+
+        # Windows i+1..j are lost; the true negative rate only grows with j, so find its first qualifying j
+        with np.errstate(divide='ignore', invalid='ignore'):
+            def tn_rate_met(i, j):
+                return N[i] / (neg - N[j] + N[i]) >= min_rate
+
+            candidates = index[~single & (N > 0) & (index < n - 1)]
+            lo = candidates + 1
+            hi = np.full(len(candidates), n)
+            while np.any(lo < hi):
+                searching = lo < hi
+                mid = (lo + hi) // 2
+                met = np.zeros(len(candidates), dtype=bool)
+                met[searching] = tn_rate_met(candidates[searching], mid[searching])
+                hi = np.where(searching & met, mid, hi)
+                lo = np.where(searching & ~met, mid + 1, lo)
+
+            found = lo < n
+            i = candidates[found]
+            j = lo[found]
+            running_pos = pos - P[j] + P[i]
+            running_tp = pos - P[j]
+            # The true positive rate only falls with j, so the first j meeting the negative rate is the only one left
+            valid = (running_pos > 0) & (running_tp / running_pos >= min_rate)
+            i = i[valid]
+            j = j[valid]
+
+        # The double loop only accepts a strictly smaller loss, so the first lower bias with the smallest loss wins
+        last_single = index[single][-1] if np.any(single) else -1
+        if len(i) > 0:
+            best = int(np.argmin(j - i))
+            minloss = (j[best] - i[best]) * 1.0 / n
+            if i[best] > last_single:
+                optbias = [sorted_probs[i[best]], sorted_probs[j[best]]]
+        if last_single >= 0 and not (len(i) > 0 and i[best] > last_single):
+            optbias = [sorted_probs[last_single], sorted_probs[last_single]]
+
+    if ret_bias:
+        return -minloss, optbias
+    else:
+        return -minloss
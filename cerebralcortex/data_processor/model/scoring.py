@@ -0,0 +1,132 @@
+# Copyright (c) 2016, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import time
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from cerebralcortex.data_processor.model.compact_model import CompactSVCModel
+from cerebralcortex.kernel.datatypes.datapoint import DataPoint
+from cerebralcortex.kernel.datatypes.datastream import DataStream
+
+STRESS_PROBABILITY = 'org.md2k.cerebralcortex.cstress.probability'
+
+
+def feature_matrix(feature_streams: List[DataStream]) -> Tuple[List[Tuple], np.ndarray]:
+    """
+    Align per-feature DataStreams on their windows
+
+    :param feature_streams: one DataStream per model feature, in the order of the model features
+    :return: (start_time, end_time) of every window present in all streams, in time order, and the matrix of
+        feature values with one row per window
+    """
+    samples = [{dp.start_time: dp.sample for dp in stream.data} for stream in feature_streams]
+    end_times = {dp.start_time: dp.end_time for dp in feature_streams[0].data}
+    starts = sorted(set(samples[0]).intersection(*samples[1:]))
+    X = np.array([[values[start] for values in samples] for start in starts], dtype=np.float64)
+    return [(start, end_times[start]) for start in starts], X.reshape(len(starts), len(feature_streams))
+
+
+def probability_datastream(windows: List[Tuple], probabilities: np.ndarray, owner=None) -> DataStream:
+    """
+    :param windows: (start_time, end_time) of every window
+    :param probabilities: stress probability of every window
+    :param owner: owner of the output stream, usually the participant
+    :return: DataStream of stress probabilities
+    """
+    data = [DataPoint(start_time=start, end_time=end, sample=float(p)) for (start, end), p in
+            zip(windows, probabilities)]
+    return DataStream(owner=owner, name=STRESS_PROBABILITY, data=data)
+
+
+def score_feature_streams(model: CompactSVCModel,
+                          feature_streams: List[DataStream],
+                          block_size: int = 4096) -> Tuple[DataStream, np.ndarray]:
+    """
+    :param model: trained cStress model
+    :param feature_streams: one DataStream per model feature, in the order of the model features
+    :param block_size: number of windows scored at a time
+    :return: stress probability DataStream and the output of model.classify for every window
+    """
+    if len(feature_streams) != model.support_vectors.shape[1]:
+        raise ValueError('Model expects %d features, got %d streams'
+                         % (model.support_vectors.shape[1], len(feature_streams)))
+    windows, X = feature_matrix(feature_streams)
+    probabilities = model.predict_proba(X, block_size) if len(windows) else np.empty(0)
+    return probability_datastream(windows, probabilities, feature_streams[0].user), model.classify(probabilities)
+
+
+def score_feature_rdd(rdd, model: CompactSVCModel, block_size: int = 4096):
+    """
+    Score the output of a feature pipeline on Spark
+
+    :param rdd: RDD of (participant, feature DataStreams in the order of the model features)
+    :param model: trained cStress model, broadcast once to the executors
+    :param block_size: number of windows scored at a time
+    :return: RDD of (participant, (stress probability DataStream, classification of every window))
+    """
+    model_bc = rdd.context.broadcast(model)
+    return rdd.mapValues(lambda streams: score_feature_streams(model_bc.value, streams, block_size))
+
+
+def _make_local_score(model_bc, block_size):
+    def local_score(task):
+        participant, windows, X = task
+        model = model_bc.value
+        probabilities = model.predict_proba(X, block_size) if len(X) else np.empty(0)
+        return participant, probability_datastream(windows, probabilities, participant), \
+            model.classify(probabilities)
+
+    return local_score
+
+
+def batch_score(backend,
+                model: CompactSVCModel,
+                participants: List[Tuple[Any, List[Tuple], np.ndarray]],
+                block_size: int = 4096) -> Tuple[Dict[Any, Tuple[DataStream, np.ndarray]], dict]:
+    """
+    Score the feature matrices of many participants in parallel, one task per participant
+
+    :param backend: backend running the tasks
+    :param model: trained cStress model
+    :param participants: list of (participant, (start_time, end_time) of every window, raw feature matrix)
+    :param block_size: number of windows scored at a time
+    :return: participant -> (stress probability DataStream, classification of every window), and the number of
+        windows, elapsed seconds and windows per second
+    """
+    for participant, windows, X in participants:
+        if len(windows) != len(X):
+            raise ValueError('Participant %s has %d windows but %d feature rows' % (participant, len(windows), len(X)))
+
+    start = time.time()
+    model_bc = backend.broadcast(model)
+    results = backend.run_tasks(_make_local_score(model_bc, block_size), [[p] for p in participants])
+    model_bc.unpersist()
+    elapsed = time.time() - start
+
+    n_windows = sum(len(X) for _, _, X in participants)
+    stats = {'windows': n_windows, 'seconds': elapsed,
+             'windows_per_second': n_windows / elapsed if elapsed > 0 else float('inf')}
+    return {participant: (stream, labels) for participant, stream, labels in results}, stats
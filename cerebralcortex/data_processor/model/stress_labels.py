@@ -0,0 +1,153 @@
+# Copyright (c) 2016, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from collections import OrderedDict
+from typing import List
+
+import numpy as np
+
+
+class StressMarkIndex:
+    """
+    Per participant sorted index of stress marks answering, for a batch of one minute windows, which label the
+    majority of the marks containing each window carry
+
+    A mark (st, et) contains the window [t, t + window] when st < t and t + window < et. That only happens for
+    marks longer than the window, and for those it is equivalent to st < t and et - window > t, so the number of
+    marks of a label containing t is the number of starts below t minus the number of ends at or below
+    t + window, two binary searches per label.
+    """
+
+    def __init__(self,
+                 participant_ids: np.ndarray,
+                 labels: np.ndarray,
+                 starts: np.ndarray,
+                 ends: np.ndarray,
+                 window: int = 60000,
+                 exclude: tuple = ('c7',)):
+        """
+        :param participant_ids: participant of each mark
+        :param labels: label code of each mark
+        :param starts: start time of each mark
+        :param ends: end time of each mark
+        :param window: window length, in the unit of the time stamps
+        :param exclude: labels never assigned to a window
+        """
+        self.window = window
+        participant_ids = np.asarray(participant_ids, dtype=np.int64)
+        labels = np.asarray(labels).astype(str)
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = np.asarray(ends, dtype=np.int64)
+
+        self.first_starts = {}
+        self._index = {}
+        for pid in OrderedDict.fromkeys(participant_ids.tolist()):
+            rows = np.flatnonzero(participant_ids == pid)
+            self.first_starts[pid] = dict((str(label), int(starts[rows][labels[rows] == label].min()))
+                                          for label in np.unique(labels[rows]))
+
+            rows = rows[~np.isin(labels[rows], exclude)]
+            rows = rows[ends[rows] - starts[rows] > window]
+            by_label = OrderedDict()
+            for label in OrderedDict.fromkeys(labels[rows].tolist()):
+                label_rows = rows[labels[rows] == label]
+                by_label[label] = (np.sort(starts[label_rows]), np.sort(ends[label_rows]))
+            self._index[pid] = (by_label, starts[rows], ends[rows], labels[rows])
+
+    @classmethod
+    def from_marks(cls, stress_marks: List, window: int = 60000, exclude: tuple = ('c7',)):
+        """
+        :param stress_marks: list of [participant id, label, start, end]
+        :param window: window length, in the unit of the time stamps
+        :param exclude: labels never assigned to a window
+        :return: StressMarkIndex
+        """
+        if len(stress_marks) == 0:
+            return cls([], [], [], [], window, exclude)
+        participant_ids, labels, starts, ends = zip(*stress_marks)
+        return cls(participant_ids, labels, starts, ends, window, exclude)
+
+    def first_start(self, participant_id: int, label: str) -> int:
+        """
+        :param participant_id: participant
+        :param label: label code
+        :return: earliest start of a mark with this label, KeyError when the participant has none
+        """
+        return self.first_starts[participant_id][label]
+
+    def label(self, participant_id: int, timestamps: np.ndarray) -> np.ndarray:
+        """
+        :param participant_id: participant
+        :param timestamps: window start times
+        :return: majority label of the marks containing each window, '' where no mark contains it. Ties go to the
+            label whose first containing mark comes first, as Counter.most_common does on the marks in file order
+        """
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        result = np.full(len(timestamps), '', dtype='U2')
+        if participant_id not in self._index or len(timestamps) == 0:
+            return result
+        by_label, starts, ends, labels = self._index[participant_id]
+        if len(by_label) == 0:
+            return result
+
+        counts = np.empty((len(by_label), len(timestamps)), dtype=np.int64)
+        for i, (label_starts, label_ends) in enumerate(by_label.values()):
+            counts[i] = np.searchsorted(label_starts, timestamps, side='left') - \
+                        np.searchsorted(label_ends, timestamps + self.window, side='right')
+
+        names = np.array(list(by_label.keys()), dtype='U2')
+        best = counts.max(axis=0)
+        result[best > 0] = names[counts.argmax(axis=0)][best > 0]
+
+        tied = np.flatnonzero((best > 0) & ((counts == best).sum(axis=0) > 1))
+        for j in tied:
+            t = timestamps[j]
+            containing = labels[(starts < t) & (t + self.window < ends)]
+            candidates = set(names[counts[:, j] == best[j]].tolist())
+            result[j] = next(label for label in containing.tolist() if label in candidates)
+        return result
+
+
+def label_windows(index: StressMarkIndex,
+                  participant_ids: np.ndarray,
+                  timestamps: np.ndarray,
+                  start_label: str = 'c4') -> np.ndarray:
+    """
+    Label every feature window at once, skipping windows before a participant's first start_label mark
+
+    :param index: stress mark index
+    :param participant_ids: participant of each window
+    :param timestamps: start time of each window
+    :param start_label: label whose first mark starts the usable part of a session
+    :return: label of each window, '' for unlabeled or skipped windows. KeyError for a participant without a
+        start_label mark
+    """
+    participant_ids = np.asarray(participant_ids, dtype=np.int64)
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    result = np.full(len(timestamps), '', dtype='U2')
+    for pid in OrderedDict.fromkeys(participant_ids.tolist()):
+        rows = np.flatnonzero(participant_ids == pid)
+        rows = rows[timestamps[rows] >= index.first_start(pid, start_label)]
+        result[rows] = index.label(pid, timestamps[rows])
+    return result
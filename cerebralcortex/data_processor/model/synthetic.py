@@ -0,0 +1,72 @@
+# Copyright (c) 2016, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from typing import Tuple
+
+import numpy as np
+
+
+def make_cstress_dataset(n_subjects: int = 10,
+                         n_windows: int = 200,
+                         n_features: int = 37,
+                         positive_fraction: float = 0.4,
+                         separation: float = 1.0,
+                         random_state=None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Synthetic training set shaped like the cStress one: one row of features per one minute window, a block of
+    windows per subject and a binary stress label
+
+    Each subject gets an individual baseline added to all of its windows, stress windows are shifted along a
+    random direction and the features are correlated, so the classes overlap the way subject data does and the
+    best parameters are not at the edge of the grid.
+
+    :param n_subjects: number of subjects, the cross-validation labels
+    :param n_windows: number of windows per subject
+    :param n_features: number of features per window
+    :param positive_fraction: fraction of stress windows of every subject
+    :param separation: distance between the class means, in units of the within-class noise
+    :param random_state: None, int seed or np.random.RandomState
+    :return: features, labels (0 or 1) and subject of every window
+    """
+    if not 0.0 < positive_fraction < 1.0:
+        raise ValueError('positive_fraction must be between 0 and 1, got %f' % positive_fraction)
+    if not isinstance(random_state, np.random.RandomState):
+        random_state = np.random.RandomState(random_state)
+
+    mixing = random_state.randn(n_features, n_features) / np.sqrt(n_features)
+    direction = random_state.randn(n_features)
+    direction *= separation / np.linalg.norm(direction)
+
+    n_positive = int(round(positive_fraction * n_windows))
+    X, y, subjects = [], [], []
+    for subject in range(n_subjects):
+        labels = np.zeros(n_windows, dtype=np.int64)
+        labels[random_state.permutation(n_windows)[:n_positive]] = 1
+        baseline = 0.5 * random_state.randn(n_features)
+        noise = random_state.randn(n_windows, n_features)
+        X.append(baseline + np.outer(labels, direction) + noise.dot(mixing))
+        y.append(labels)
+        subjects.append(np.full(n_windows, subject + 1, dtype=np.int64))
+
+    return np.vstack(X), np.concatenate(y), np.concatenate(subjects)
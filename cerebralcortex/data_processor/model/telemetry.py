@@ -0,0 +1,212 @@
+# Copyright (c) 2016, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import List, Sequence
+
+import numpy as np
+
+
+def task_record(index: int,
+                parameters: dict,
+                fit_time: float,
+                score_time: float,
+                score: float,
+                n_train: int,
+                n_test: int,
+                n_support: int,
+                peak_rss_mb: float = None,
+                cache_size: int = None) -> dict:
+    """
+    :param index: position of the task in the search output
+    :param parameters: candidate parameters
+    :param fit_time: seconds spent fitting
+    :param score_time: seconds spent scoring the test fold
+    :param score: test fold score
+    :param n_train: number of training samples
+    :param n_test: number of test samples
+    :param n_support: number of support vectors of the fitted model
+    :param peak_rss_mb: peak resident memory of the worker process during the fit
+    :param cache_size: libsvm kernel cache size of the fit in MB
+    :return: telemetry record of one fit, JSON serializable
+    """
+    return {'index': int(index), 'parameters': parameters, 'fit_time': float(fit_time),
+            'score_time': float(score_time), 'score': float(score), 'n_train': int(n_train), 'n_test': int(n_test),
+            'n_support': int(n_support), 'peak_rss_mb': peak_rss_mb, 'cache_size': cache_size,
+            'finished': time.time()}
+
+
+def format_progress(done: int,
+                    total: int,
+                    elapsed: float) -> str:
+    """
+    :param done: number of finished fits
+    :param total: number of fits of the job
+    :param elapsed: seconds since the job started
+    :return: progress line with throughput and estimated time left
+    """
+    rate = done / elapsed if elapsed > 0 else 0.0
+    eta = timedelta(seconds=int(round((total - done) / rate))) if rate > 0 else '?'
+    return '{0}/{1} fits ({2:.1f}%), {3:.2f} fits/s, ETA {4}'.format(
+        done, total, 100.0 * done / max(total, 1), rate, eta)
+
+
+def cost_by_parameters(records: List[dict],
+                       keys: Sequence[str] = ('C', 'gamma')) -> List[tuple]:
+    """
+    Total fit time per region of the parameter space
+
+    :param records: telemetry records
+    :param keys: parameters defining a region
+    :return: list of (parameter values, total fit time, number of fits, mean support vectors), most expensive first
+    """
+    regions = OrderedDict()
+    for record in records:
+        region = tuple(record['parameters'].get(key) for key in keys)
+        fit_time, n_fits, n_support = regions.get(region, (0.0, 0, 0))
+        regions[region] = (fit_time + record['fit_time'], n_fits + 1, n_support + record['n_support'])
+    return sorted([(region, fit_time, n_fits, n_support / float(n_fits))
+                   for region, (fit_time, n_fits, n_support) in regions.items()], key=lambda x: -x[1])
+
+
+def estimated_fit_time(records: List[dict],
+                       parameters: dict,
+                       n_train: int,
+                       exponent: float = 2.0) -> float:
+    """
+    Time a fit of one candidate on n_train samples is expected to take, from the fold fits of that candidate
+
+    libsvm training time grows about quadratically with the number of samples, so every fold fit time is scaled
+    by (n_train / fold train size) ** exponent and the estimates are averaged.
+
+    :param records: telemetry records
+    :param parameters: candidate parameters
+    :param n_train: number of training samples of the fit
+    :param exponent: growth of the fit time with the number of samples
+    :return: estimated seconds, or None without a fold fit of the candidate
+    """
+    estimates = [record['fit_time'] * (n_train / float(record['n_train'])) ** exponent for record in records
+                 if record['parameters'] == parameters and record['n_train'] > 0]
+    if not estimates:
+        return None
+    return float(np.mean(estimates))
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    return repr(value)
+
+
+class SearchTelemetry:
+    """
+    Driver side view of a running search: collects the records the tasks add to a backend accumulator, prints
+    progress, throughput and ETA every interval seconds and appends every record to a JSONL log
+    """
+
+    def __init__(self, log_path: str = None, interval: float = 10.0, verbose: int = 1):
+        """
+        :param log_path: JSONL file the records are appended to, None for no log
+        :param interval: seconds between progress lines
+        :param verbose: print progress when > 0
+        """
+        self.log_path = log_path
+        self.interval = interval
+        self.verbose = verbose
+        self.records = []
+        self._lock = threading.Lock()
+
+    def _collect(self, accumulator, seen: int) -> int:
+        new_records = accumulator.value[seen:]
+        with self._lock:
+            self.records.extend(new_records)
+            if self.log_path is not None and len(new_records) > 0:
+                with open(self.log_path, 'a') as f:
+                    for record in new_records:
+                        f.write(json.dumps(record, default=_json_default) + '\n')
+        return seen + len(new_records)
+
+    @contextmanager
+    def track(self, accumulator, n_tasks: int):
+        """
+        Follow one parallel job while the body runs
+
+        :param accumulator: backend accumulator the tasks add their records to
+        :param n_tasks: number of fits of the job
+        """
+        start = time.time()
+        stopped = threading.Event()
+        seen = [0]
+        printed = [None]
+
+        def progress():
+            if self.verbose > 0 and printed[0] != seen[0]:
+                print(format_progress(seen[0], n_tasks, time.time() - start))
+                printed[0] = seen[0]
+
+        def poll():
+            while not stopped.wait(self.interval):
+                seen[0] = self._collect(accumulator, seen[0])
+                progress()
+
+        monitor = threading.Thread(target=poll, daemon=True)
+        monitor.start()
+        try:
+            yield self
+        finally:
+            stopped.set()
+            monitor.join()
+            if hasattr(accumulator, 'close'):
+                accumulator.close()
+            seen[0] = self._collect(accumulator, seen[0])
+            progress()
+
+    def report(self, keys: Sequence[str] = ('C', 'gamma'), top: int = 5, memory_budget_mb: float = None):
+        """
+        Print the totals of the search, its most expensive parameter regions and the peak memory of a task
+
+        :param keys: parameters defining a region
+        :param top: number of regions to print
+        :param memory_budget_mb: memory of a node, to print how many fits of the measured peak it holds
+        """
+        if len(self.records) == 0:
+            return
+        fit_time = sum(record['fit_time'] for record in self.records)
+        print('{0} fits, {1:.1f} s of fitting, {2:.3f} s per fit'.format(
+            len(self.records), fit_time, fit_time / len(self.records)))
+        for region, region_time, n_fits, n_support in cost_by_parameters(self.records, keys)[:top]:
+            print('  {0}: {1:.1f} s in {2} fits, {3:.0f} support vectors on average'.format(
+                dict(zip(keys, region)), region_time, n_fits, n_support))
+
+        peaks = [record['peak_rss_mb'] for record in self.records if record.get('peak_rss_mb') is not None]
+        if len(peaks) > 0:
+            print('Peak task memory {0:.0f} MB (median {1:.0f} MB)'.format(max(peaks), np.median(peaks)))
+            if memory_budget_mb is not None:
+                print('{0:.0f} MB hold {1} concurrent fits at that peak'.format(
+                    memory_budget_mb, int(memory_budget_mb // max(peaks))))
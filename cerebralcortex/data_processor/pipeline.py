@@ -0,0 +1,162 @@
+# Copyright (c) 2016, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+from collections import OrderedDict
+from typing import Callable, Sequence, Tuple
+
+from cerebralcortex.data_processor.preprocessor.reader import ArrayStream
+
+
+class ParticipantPlan:
+    """
+    Execution plan of the per-participant stages of a feature pipeline
+
+    Every stage reads named streams of one participant record, or outputs of earlier stages, and adds its own
+    output under its name. Running the plan on a record executes all the stages the requested outputs depend on in
+    one task, so every participant is loaded once and no stage needs a join to find the other streams of the same
+    participant.
+    """
+
+    def __init__(self):
+        self.stages = OrderedDict()
+        self.halos = {}
+
+    def stage(self, name: str, inputs: Sequence[str], function: Callable, halo: float = 0.0):
+        """
+        :param name: name of the stage output
+        :param inputs: names of the record streams or earlier stage outputs passed to function, in order
+        :param function: function computing the stage output from its inputs
+        :param halo: seconds of input the stage looks at around an output sample (filter length, window size)
+        :return: self, so stages can be chained
+        """
+        if name in self.stages:
+            raise ValueError('Stage %s is already defined' % name)
+        self.stages[name] = (tuple(inputs), function)
+        self.halos[name] = float(halo)
+        return self
+
+    def halo(self, outputs: Sequence[str]) -> float:
+        """
+        :param outputs: names of the requested stage outputs
+        :return: seconds of input the filters and windows of the stages need around a time range, the largest sum
+            of stage halos along any chain of stages leading to an output; outputs of stages that also adapt to
+            their whole input, such as a timestamp correction anchored to the first sample or thresholds taken
+            from signal statistics, only approximate a run on the whole recording
+        """
+        chain = {}
+        for name in self.required_stages(outputs):
+            inputs = self.stages[name][0]
+            chain[name] = self.halos[name] + max([chain[source] for source in inputs if source in chain] + [0.0])
+        return max([chain[name] for name in outputs] + [0.0])
+
+    def required_stages(self, outputs: Sequence[str]) -> Tuple[str, ...]:
+        """
+        :param outputs: names of the requested stage outputs
+        :return: names of the stages the outputs depend on, in definition order
+        """
+        required = set()
+        pending = list(outputs)
+        while pending:
+            name = pending.pop()
+            if name in required:
+                continue
+            if name not in self.stages:
+                raise KeyError('Unknown stage %s' % name)
+            required.add(name)
+            pending.extend(source for source in self.stages[name][0] if source in self.stages)
+        return tuple(name for name in self.stages if name in required)
+
+    def compile(self, outputs: Sequence[str]) -> Callable[[dict], tuple]:
+        """
+        :param outputs: names of the requested stage outputs
+        :return: function running the required stages on one participant record and returning the outputs in
+            order; intermediate results are released as soon as no later stage reads them
+        """
+        outputs = tuple(outputs)
+        stages = [(name,) + self.stages[name] for name in self.required_stages(outputs)]
+        last_use = {}
+        for position, (_, inputs, _) in enumerate(stages):
+            for source in inputs:
+                last_use[source] = position
+
+        def run(record):
+            values = dict(record)
+            for position, (name, inputs, function) in enumerate(stages):
+                values[name] = function(*[values[source] for source in inputs])
+                for source in inputs:
+                    if last_use[source] == position and source not in outputs and source in self.stages:
+                        del values[source]
+            return tuple(values[name] for name in outputs)
+
+        return run
+
+
+def materialize_record(record: dict) -> dict:
+    """
+    :param record: participant record or shard
+    :return: copy of the record with every ArrayStream turned into a DataStream, for the stages that work on
+        DataPoints
+    """
+    return {name: value.to_datastream() if isinstance(value, ArrayStream) else value
+            for name, value in record.items()}
+
+
+def load_record(participant, datasources: Sequence[str], read: Callable):
+    """
+    :param participant: participant identifier
+    :param datasources: names of the streams to load, e.g. ('ecg', 'rip', 'accelx', 'accely', 'accelz')
+    :param read: function (participant, datasource) -> DataStream or ArrayStream
+    :return: record with the participant and all its streams, None when a stream file is missing
+    """
+    record = {'participant': participant}
+    try:
+        for datasource in datasources:
+            record[datasource] = read(participant, datasource)
+    except (IOError, OSError):
+        print("File missing for %s" % participant)
+        return None
+    return record
+
+
+def participant_records(sc, participants: Sequence, datasources: Sequence[str], read: Callable,
+                        n_partitions: int = None):
+    """
+    Load all the streams of every participant into one record, co-partitioned by participant
+
+    The participant identifiers are hash partitioned before anything is read and every task loads all the
+    streams of its participants, so streams that belong together are never joined or shuffled. Later mapValues,
+    filter and per-participant plans keep the partitioning, and cogroups or joins by participant with RDDs
+    partitioned the same way stay narrow.
+
+    :param sc: SparkContext
+    :param participants: participant identifiers
+    :param datasources: names of the streams to load
+    :param read: function (participant, datasource) -> DataStream or ArrayStream
+    :param n_partitions: number of partitions, one per participant by default
+    :return: RDD of (participant, record)
+    """
+    n_partitions = n_partitions or len(participants)
+    return sc.parallelize([(p, p) for p in participants]).partitionBy(n_partitions) \
+        .mapValues(lambda participant: load_record(participant, datasources, read)) \
+        .filter(lambda pair: pair[1] is not None)
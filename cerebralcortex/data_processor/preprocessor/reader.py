@@ -0,0 +1,195 @@
+# Copyright (c) 2017, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import gzip
+from datetime import datetime
+from typing import Iterator, List, Tuple
+
+import numpy as np
+import pytz
+
+from cerebralcortex.kernel.datatypes.datapoint import DataPoint
+from cerebralcortex.kernel.datatypes.datastream import DataStream
+
+
+def _parse_lines(lines: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Line by line parse of 'value timestamp' lines, skipping the lines that do not parse like parser.data_processor
+    """
+    values = []
+    for line in lines:
+        try:
+            [val, ts] = line.split(' ')
+            values.append((float(ts), float(val)))
+        except ValueError:
+            pass
+    values = np.array(values, dtype=np.float64).reshape(-1, 2)
+    return values[:, 0], values[:, 1]
+
+
+def parse_block(text: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    :param text: complete 'value timestamp' lines
+    :return: millisecond timestamps and samples of the valid lines
+    """
+    n_lines = text.count('\n') + (0 if text.endswith('\n') or not text else 1)
+    try:
+        values = np.array(text.split(), dtype=np.float64)
+    except ValueError:
+        values = None
+    if values is None or len(values) != 2 * n_lines or text.count(' ') != n_lines:
+        return _parse_lines(text.splitlines())
+    values = values.reshape(-1, 2)
+    return values[:, 1], values[:, 0]
+
+
+def read_chunks(filename: str,
+                chunk_size: int = 65536,
+                block_size: int = 1 << 22,
+                max_samples: int = None) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Stream a gzip compressed 'value timestamp' sensor file as NumPy arrays
+
+    The file is decompressed block_size bytes at a time and every block is parsed in one call, so memory stays at a
+    block and a chunk whatever the length of the recording, and no Python object is built per sample.
+
+    :param filename: path of a basedir/<participant>/<datasource>.txt.gz file
+    :param chunk_size: number of samples of every yielded chunk, except the last one
+    :param block_size: number of decompressed bytes parsed at a time
+    :param max_samples: stop after this many samples, the whole file by default
+    :return: generator of (millisecond timestamps, samples) float64 arrays
+    """
+    pending_timestamps, pending_samples = [], []
+    n_pending = 0
+    n_read = 0
+    remainder = b''
+    with gzip.open(filename, 'rb') as f:
+        while max_samples is None or n_read < max_samples:
+            block = f.read(block_size)
+            if block:
+                block = remainder + block
+                end = block.rfind(b'\n') + 1
+                remainder = block[end:]
+                block = block[:end]
+            else:
+                block, remainder = remainder, b''
+                if not block:
+                    break
+
+            timestamps, samples = parse_block(block.decode('ascii', 'replace'))
+            if max_samples is not None:
+                timestamps, samples = timestamps[:max_samples - n_read], samples[:max_samples - n_read]
+            n_read += len(samples)
+            pending_timestamps.append(timestamps)
+            pending_samples.append(samples)
+            n_pending += len(samples)
+
+            if n_pending >= chunk_size:
+                timestamps = np.concatenate(pending_timestamps)
+                samples = np.concatenate(pending_samples)
+                n_full = n_pending - n_pending % chunk_size
+                for start in range(0, n_full, chunk_size):
+                    yield timestamps[start:start + chunk_size], samples[start:start + chunk_size]
+                pending_timestamps, pending_samples = [timestamps[n_full:]], [samples[n_full:]]
+                n_pending -= n_full
+
+    if n_pending:
+        yield np.concatenate(pending_timestamps), np.concatenate(pending_samples)
+
+
+def read_arrays(filename: str,
+                max_samples: int = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    :param filename: path of a gzip compressed 'value timestamp' file
+    :param max_samples: stop after this many samples, the whole file by default
+    :return: millisecond timestamps and samples of the whole file
+    """
+    chunks = list(read_chunks(filename, max_samples=max_samples))
+    if not chunks:
+        return np.zeros(0), np.zeros(0)
+    return np.concatenate([c[0] for c in chunks]), np.concatenate([c[1] for c in chunks])
+
+
+def to_datapoints(timestamps: np.ndarray,
+                  samples: np.ndarray,
+                  time_zone=pytz.timezone('US/Central')) -> List[DataPoint]:
+    """
+    :param timestamps: millisecond timestamps
+    :param samples: sample values
+    :param time_zone: time zone of the DataPoint start times, the one of parser.data_processor by default
+    :return: DataPoints for the stages that work on lists of them
+    """
+    return [DataPoint(start_time=datetime.fromtimestamp(ts, time_zone), sample=val)
+            for ts, val in zip((timestamps / 1000.0).tolist(), samples.tolist())]
+
+
+class ArrayStream:
+    """
+    Samples of one sensor stream kept as NumPy arrays until a stage needs DataPoints
+
+    A loaded recording takes a few bytes per sample this way instead of a DataPoint and its datetime, and time
+    shards slice it without building any Python object per sample.
+    """
+
+    def __init__(self,
+                 timestamps: np.ndarray,
+                 samples: np.ndarray,
+                 owner=None,
+                 time_zone=pytz.timezone('US/Central')):
+        """
+        :param timestamps: millisecond timestamps in time order
+        :param samples: sample values
+        :param owner: owner of the DataStream built from the arrays
+        :param time_zone: time zone of the DataPoint start times
+        """
+        self.timestamps = timestamps
+        self.samples = samples
+        self.owner = owner
+        self.time_zone = time_zone
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    @property
+    def start_time(self) -> datetime:
+        return datetime.fromtimestamp(self.timestamps[0] / 1000.0, self.time_zone) if len(self) else None
+
+    @property
+    def end_time(self) -> datetime:
+        return datetime.fromtimestamp(self.timestamps[-1] / 1000.0, self.time_zone) if len(self) else None
+
+    def slice(self, start: datetime, end: datetime) -> 'ArrayStream':
+        """
+        :param start: first timestamp included
+        :param end: first timestamp excluded
+        :return: ArrayStream viewing the samples in [start, end)
+        """
+        first, last = np.searchsorted(self.timestamps, [start.timestamp() * 1000.0, end.timestamp() * 1000.0])
+        return ArrayStream(self.timestamps[first:last], self.samples[first:last], self.owner, self.time_zone)
+
+    def to_datastream(self) -> DataStream:
+        """
+        :return: DataStream with one DataPoint per sample, for the stages that work on lists of them
+        """
+        return DataStream(None, self.owner, data=to_datapoints(self.timestamps, self.samples, self.time_zone))
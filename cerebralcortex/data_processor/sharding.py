@@ -0,0 +1,155 @@
+# Copyright (c) 2016, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import bisect
+import math
+from datetime import datetime, timedelta
+from typing import Callable, List, Sequence, Tuple
+
+from cerebralcortex.data_processor.preprocessor.reader import ArrayStream
+from cerebralcortex.kernel.datatypes.datastream import DataStream
+
+
+def _with_data(datastream: DataStream, data: list) -> DataStream:
+    return DataStream(datastream.identifier, datastream.user, datastream.name, datastream.description,
+                      datastream.data_descriptor, datastream.execution_context, datastream.annotations, data)
+
+
+def time_shards(start: datetime,
+                end: datetime,
+                shard_length: timedelta) -> List[Tuple[datetime, datetime]]:
+    """
+    :param start: first timestamp of the recording
+    :param end: last timestamp of the recording
+    :param shard_length: length of every shard; boundaries are multiples of it since the epoch, so they line up
+        with the epoch aligned windows of the feature stages
+    :return: (core start, core end) of every shard covering [start, end]
+    """
+    length = shard_length.total_seconds()
+    first = math.floor(start.timestamp() / length) * length
+    last = math.floor(end.timestamp() / length) * length
+    shards = []
+    boundary = first
+    while boundary <= last:
+        shards.append((datetime.fromtimestamp(boundary, start.tzinfo),
+                       datetime.fromtimestamp(boundary + length, start.tzinfo)))
+        boundary += length
+    return shards
+
+
+def slice_datastream(datastream: DataStream,
+                     start: datetime,
+                     end: datetime,
+                     times: List[datetime] = None) -> DataStream:
+    """
+    :param datastream: DataStream with data in time order
+    :param start: first start_time included
+    :param end: first start_time excluded
+    :param times: start_time of every data point, when already extracted
+    :return: copy of the DataStream with the data points starting in [start, end)
+    """
+    times = [dp.start_time for dp in datastream.data] if times is None else times
+    return _with_data(datastream, datastream.data[bisect.bisect_left(times, start):bisect.bisect_left(times, end)])
+
+
+def _time_index(stream) -> Tuple[Sequence, Callable[[datetime], object]]:
+    """
+    :return: sorted start times of the samples of a DataStream or ArrayStream and the function putting a datetime
+        on the same scale
+    """
+    if isinstance(stream, ArrayStream):
+        return stream.timestamps, lambda time: time.timestamp() * 1000.0
+    return [dp.start_time for dp in stream.data], lambda time: time
+
+
+def _extent(stream) -> List[datetime]:
+    if isinstance(stream, ArrayStream):
+        return [stream.start_time, stream.end_time] if len(stream) else []
+    return [dp.start_time for dp in stream.data[:1] + stream.data[-1:]]
+
+
+def _count(index, start: datetime, end: datetime) -> int:
+    times, scale = index
+    return bisect.bisect_left(times, scale(end)) - bisect.bisect_left(times, scale(start))
+
+
+def shard_record(record: dict,
+                 stream_names: Sequence[str],
+                 shard_length: timedelta,
+                 halo: float) -> List[dict]:
+    """
+    Split the streams of one participant record into time shards with halo overlap
+
+    :param record: loader record with the participant and its DataStreams or ArrayStreams
+    :param stream_names: names of the streams to split, other entries are copied into every shard
+    :param shard_length: length of the core of every shard
+    :param halo: seconds of data added before and after the core, at least the halo of the pipeline stages; stages
+        that adapt to their whole input still only see the shard
+    :return: one record per shard with data in its core, with the streams sliced to the core plus halo and the
+        core bounds under 'shard_start' and 'shard_end'
+    """
+    index = {name: _time_index(record[name]) for name in stream_names}
+    bounds = [t for name in stream_names for t in _extent(record[name])]
+    if not bounds:
+        return []
+
+    margin = timedelta(seconds=halo)
+    shards = []
+    for core_start, core_end in time_shards(min(bounds), max(bounds), shard_length):
+        if not any(_count(index[name], core_start, core_end) for name in stream_names):
+            continue
+        shard = dict(record)
+        for name in stream_names:
+            if isinstance(record[name], ArrayStream):
+                shard[name] = record[name].slice(core_start - margin, core_end + margin)
+            else:
+                shard[name] = slice_datastream(record[name], core_start - margin, core_end + margin,
+                                               index[name][0])
+        shard['shard_start'] = core_start
+        shard['shard_end'] = core_end
+        shards.append(shard)
+    return shards
+
+
+def stitch(parts: List[Tuple[datetime, datetime, object]]):
+    """
+    Merge the outputs of the shards of one participant, keeping from every shard only the data points starting
+    in its core so the halo overlap is not duplicated
+
+    :param parts: (core start, core end, output) of every shard; an output is a DataStream, None or a tuple or
+        list of them
+    :return: output of the same structure covering all the shards
+    """
+    parts = sorted(parts, key=lambda part: part[0])
+    outputs = [output for _, _, output in parts if output is not None]
+    if not outputs:
+        return None
+
+    if isinstance(outputs[0], (tuple, list)):
+        return tuple(stitch([(start, end, output[i]) for start, end, output in parts if output is not None])
+                     for i in range(len(outputs[0])))
+
+    return _with_data(outputs[0], [dp for start, end, output in parts if output is not None for dp in output.data
+                                   if start <= dp.start_time < end])
+
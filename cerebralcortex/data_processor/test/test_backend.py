@@ -0,0 +1,90 @@
+# Copyright (c) 2016, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import os
+import unittest
+
+import numpy as np
+
+from cerebralcortex.data_processor.model.backend import ProcessPoolBackend, LocalBroadcast, MemmapBroadcast, \
+    as_backend, create_backend
+
+
+class TestBackend(unittest.TestCase):
+    def setUp(self):
+        self.backend = ProcessPoolBackend(n_jobs=2)
+
+    def tearDown(self):
+        self.backend.stop()
+        self.assertFalse(os.path.exists(self.backend.temp_folder))
+
+    def test_broadcast(self):
+        array = np.arange(12, dtype=np.float64).reshape(3, 4)
+        array_bc = self.backend.broadcast(array)
+        self.assertIsInstance(array_bc, MemmapBroadcast)
+        np.testing.assert_array_equal(array_bc.value, array)
+        array_bc.unpersist()
+        self.assertFalse(os.path.exists(array_bc.filename))
+
+        dict_bc = self.backend.broadcast({'a': 1})
+        self.assertIsInstance(dict_bc, LocalBroadcast)
+        self.assertDictEqual(dict_bc.value, {'a': 1})
+
+    def test_run_tasks(self):
+        array_bc = self.backend.broadcast(np.arange(10, dtype=np.float64))
+        offset = 100
+
+        def task(index):
+            return index, os.getpid(), float(array_bc.value[index]) + offset
+
+        results = self.backend.run_tasks(task, [[0, 1, 2], [3, 4], [5, 6, 7, 8, 9]])
+        self.assertListEqual([r[0] for r in results], list(range(10)))
+        self.assertListEqual([r[2] for r in results], [100.0 + i for i in range(10)])
+        self.assertNotIn(os.getpid(), [r[1] for r in results])
+
+    def test_accumulator(self):
+        accumulator = self.backend.accumulator()
+
+        def task(index):
+            accumulator.add([{'index': index, 'pid': os.getpid()}])
+            return index
+
+        self.backend.run_tasks(task, [[0, 1, 2], [3, 4], [5, 6, 7, 8, 9]])
+        accumulator.close()
+        self.assertListEqual(sorted(record['index'] for record in accumulator.value), list(range(10)))
+        self.assertNotIn(os.getpid(), [record['pid'] for record in accumulator.value])
+
+    def test_as_backend(self):
+        self.assertIs(as_backend(self.backend), self.backend)
+
+    def test_create_backend(self):
+        backend = create_backend('local', 3)
+        self.assertIsInstance(backend, ProcessPoolBackend)
+        self.assertEqual(backend.parallelism, 3)
+        backend.stop()
+        self.assertRaises(ValueError, create_backend, 'mpi')
+
+
+if __name__ == '__main__':
+    unittest.main()
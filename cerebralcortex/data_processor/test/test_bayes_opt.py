@@ -0,0 +1,80 @@
+# Copyright (c) 2016, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import itertools
+import unittest
+
+import numpy as np
+
+from cerebralcortex.data_processor.model.bayes_opt import encode_candidates, expected_improvement, propose_batch, \
+    wave_size
+
+
+class TestBayesOpt(unittest.TestCase):
+    def setUp(self):
+        self.candidates = [{'kernel': 'rbf', 'C': 2 ** c, 'gamma': 2 ** g, 'class_weight': {0: w, 1: 1 - w}}
+                           for c, g, w in itertools.product(np.arange(-6, 6, 0.5), np.arange(-6, 6, 0.5), [0.25, 0.5])]
+        self.encoded = encode_candidates(self.candidates)
+
+        # A smooth score with a single peak at C = 2^2, gamma = 2^-3, class_weight {0: 0.5}
+        def score(c):
+            return -(np.log2(c['C']) - 2) ** 2 - (np.log2(c['gamma']) + 3) ** 2 - 4 * (c['class_weight'][0] - 0.5)
+        self.scores = np.array([score(c) for c in self.candidates])
+
+    def test_encode_candidates(self):
+        self.assertEqual(self.encoded.shape, (len(self.candidates), 5))
+        self.assertAlmostEqual(self.encoded.min(), 0.0)
+        self.assertAlmostEqual(self.encoded.max(), 1.0)
+        c = self.candidates[int(np.argmax(self.encoded[:, 0]))]
+        self.assertEqual(c['C'], 2 ** 5.5)
+
+    def test_expected_improvement(self):
+        improvement = expected_improvement(np.array([0.0, 1.0, 1.0]), np.array([1.0, 1.0, 0.0]), 1.0)
+        self.assertGreater(improvement[1], improvement[0])
+        self.assertGreater(improvement[1], improvement[2])
+        self.assertGreaterEqual(improvement[2], 0.0)
+
+    def test_propose_batch(self):
+        random = np.random.RandomState(0)
+        observed = random.choice(len(self.candidates), 10, replace=False).tolist()
+        batch = propose_batch(self.encoded, observed, self.scores[observed].tolist(), 4, random)
+        self.assertEqual(len(batch), 4)
+        self.assertEqual(len(set(batch)), 4)
+        self.assertFalse(set(batch) & set(observed))
+
+    def test_finds_peak(self):
+        random = np.random.RandomState(0)
+        observed = random.choice(len(self.candidates), 10, replace=False).tolist()
+        while len(observed) < 50:
+            observed += propose_batch(self.encoded, observed, self.scores[observed].tolist(), 4, random)
+        self.assertEqual(self.scores[observed].max(), self.scores.max())
+
+    def test_wave_size(self):
+        self.assertEqual(wave_size(64, 20), 4)
+        self.assertEqual(wave_size(1, 20), 1)
+        self.assertEqual(wave_size(8, 0), 8)
+
+
+if __name__ == '__main__':
+    unittest.main()
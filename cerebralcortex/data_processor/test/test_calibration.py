@@ -0,0 +1,74 @@
+# Copyright (c) 2016, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+
+import numpy as np
+from sklearn import svm
+
+from cerebralcortex.data_processor.model.calibration import sigmoid_train, sigmoid_predict, fit_svc_platt, \
+    svc_platt_probability
+
+
+class TestCalibration(unittest.TestCase):
+    def test_sigmoid_train_recovers_parameters(self):
+        random = np.random.RandomState(0)
+        f = random.uniform(-4, 4, 20000)
+        labels = random.rand(20000) < sigmoid_predict(f, -1.5, 0.5)
+        A, B = sigmoid_train(f, labels)
+        self.assertAlmostEqual(A, -1.5, delta=0.1)
+        self.assertAlmostEqual(B, 0.5, delta=0.1)
+
+    def test_sigmoid_predict_extremes(self):
+        probs = sigmoid_predict(np.array([-1e4, 0.0, 1e4]), 1.0, 0.0)
+        np.testing.assert_allclose(probs, [1.0, 0.5, 0.0])
+        self.assertTrue(np.all(np.isfinite(probs)))
+
+    def test_svc_convention(self):
+        random = np.random.RandomState(1)
+        X = random.randn(200, 3)
+        y = (X[:, 0] + 0.5 * random.randn(200) > 0).astype(int)
+        estimator = svm.SVC(probability=True, random_state=0).fit(X, y)
+        f = estimator.decision_function(X)
+
+        # libsvm resolves the binary probability with an iterative solver stopped at a tolerance of 0.005
+        probs = svc_platt_probability(f, estimator.probA_[0], estimator.probB_[0])
+        np.testing.assert_allclose(probs, estimator.predict_proba(X)[:, 1], atol=0.005)
+
+    def test_fit_svc_platt(self):
+        random = np.random.RandomState(2)
+        X = random.randn(300, 3)
+        y = (X[:, 0] + 0.5 * random.randn(300) > 0).astype(int)
+        estimator = svm.SVC().fit(X, y)
+        f = estimator.decision_function(X)
+
+        probA, probB = fit_svc_platt(f, y, estimator.classes_)
+        probs = svc_platt_probability(f, probA, probB)
+        self.assertTrue(np.all(np.diff(probs[np.argsort(f)]) >= 0))
+        self.assertGreater(np.mean(probs[y == 1]), 0.7)
+        self.assertLess(np.mean(probs[y == 0]), 0.3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+# Copyright (c) 2016, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+
+import numpy as np
+from sklearn import svm
+
+from cerebralcortex.data_processor.model.backend import ProcessPoolBackend
+from cerebralcortex.data_processor.model.cascade import cascade_fit, cascade_support_vectors, stratified_partitions
+
+
+class TestCascade(unittest.TestCase):
+    def setUp(self):
+        random = np.random.RandomState(2)
+        self.X = random.randn(400, 3)
+        self.y = (self.X[:, 0] - self.X[:, 2] + 0.5 * random.randn(400) > 0.3).astype(int)
+        self.svc = svm.SVC(C=1.0, gamma=0.5)
+
+    def test_stratified_partitions(self):
+        partitions = stratified_partitions(self.y, 3, random_state=0)
+        np.testing.assert_array_equal(np.sort(np.concatenate(partitions)), np.arange(len(self.y)))
+        for rows in partitions:
+            self.assertLessEqual(abs(self.y[rows].sum() - self.y.sum() / 3.0), 1)
+
+    def test_cascade_support_vectors(self):
+        backend = ProcessPoolBackend(n_jobs=2)
+        try:
+            support, history = cascade_support_vectors(backend, self.svc, self.X, self.y, 5, random_state=0)
+            model = cascade_fit(backend, self.svc, self.X, self.y, 4, random_state=0)
+        finally:
+            backend.stop()
+        # Five partitions merge pairwise in three layers, the odd one passing through
+        self.assertEqual([len(layer) for layer in history[0]['layers']], [5, 3, 2, 1])
+        self.assertEqual(history[-1]['n_support'], len(support))
+
+        full = svm.SVC(C=1.0, gamma=0.5).fit(self.X, self.y)
+        self.assertLessEqual(abs(len(support) - len(full.support_)), 0.05 * len(full.support_))
+        self.assertGreater(len(np.intersect1d(support, full.support_)), 0.95 * len(full.support_))
+        self.assertGreater(np.mean(model.predict(self.X) == full.predict(self.X)), 0.99)
+        self.assertLessEqual(len(model.support_), model.cascade_history_[-1]['n_support'])
+
+
+if __name__ == '__main__':
+    unittest.main()
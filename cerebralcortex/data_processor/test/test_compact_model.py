@@ -0,0 +1,111 @@
+# Copyright (c) 2016, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+from sklearn import preprocessing, svm
+
+from cerebralcortex.data_processor.model.compact_model import CompactSVCModel
+
+
+class TestCompactModel(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super(TestCompactModel, cls).setUpClass()
+        random = np.random.RandomState(11)
+        cls.X = random.randn(300, 5) * [1.0, 2.0, 0.5, 10.0, 1.0] + [0.0, 1.0, -3.0, 50.0, 0.0]
+        cls.y = (cls.X[:, 0] + 0.2 * cls.X[:, 1] + 0.5 * random.randn(300) > 0.2).astype(int)
+        cls.normalizer = preprocessing.StandardScaler()
+        cls.Z = cls.normalizer.fit_transform(cls.X)
+        cls.svc = svm.SVC(probability=True, gamma=0.3, C=2.0, random_state=0).fit(cls.Z, cls.y)
+        cls.model = CompactSVCModel.from_estimator(cls.svc, cls.normalizer, [0.3, 0.7])
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_decision_function(self):
+        self.assertEqual(self.model.n_support, len(self.svc.support_))
+        np.testing.assert_allclose(self.model.decision_function(self.X, block_size=17),
+                                   self.svc.decision_function(self.Z), rtol=1e-8, atol=1e-10)
+        np.testing.assert_allclose(self.model.decision_function(self.Z, standardized=True),
+                                   self.svc.decision_function(self.Z), rtol=1e-8, atol=1e-10)
+
+    def test_predict_proba(self):
+        np.testing.assert_allclose(self.model.predict_proba(self.X), self.svc.predict_proba(self.Z)[:, 1],
+                                   atol=0.005)
+
+    def test_classify(self):
+        labels = self.model.classify(np.array([0.1, 0.3, 0.5, 0.7, 0.9]))
+        np.testing.assert_array_equal(labels, [0, 0, -1, 1, 1])
+
+        single = CompactSVCModel.from_estimator(self.svc, self.normalizer, 0.5)
+        np.testing.assert_array_equal(single.classify(np.array([0.2, 0.5, 0.8])), [0, 1, 1])
+        self.assertEqual(len(single.predict(self.X)), len(self.X))
+
+    def test_save_load(self):
+        filename = os.path.join(self.path, 'model.npz')
+        self.model.save(filename)
+        loaded = CompactSVCModel.load(filename)
+        self.assertEqual(loaded.model_name, 'cStress')
+        self.assertEqual(loaded.gamma, self.model.gamma)
+        np.testing.assert_array_equal(loaded.bias, [0.3, 0.7])
+        np.testing.assert_array_equal(loaded.support_vectors, self.model.support_vectors)
+        np.testing.assert_array_equal(loaded.decision_function(self.X), self.model.decision_function(self.X))
+
+    def test_from_json(self):
+        filename = os.path.join(self.path, 'model.json')
+        with open(filename, 'w') as f:
+            json.dump({'modelName': 'cStress', 'modelType': 'svc', 'intercept': self.model.intercept,
+                       'bias': [0.3, 0.7], 'probA': self.model.probA, 'probB': self.model.probB,
+                       'kernel': {'type_val': 'rbf', 'parameters': [{'name': 'gamma', 'value': self.model.gamma}]},
+                       'support': [{'dualCoef': c, 'supportVector': list(v)}
+                                   for c, v in zip(self.model.dual_coef, self.model.support_vectors)],
+                       'normparams': [{'mean': m, 'std': s} for m, s in zip(self.model.mean, self.model.scale)]},
+                      f)
+        loaded = CompactSVCModel.from_json(filename)
+        np.testing.assert_allclose(loaded.predict_proba(self.X), self.model.predict_proba(self.X))
+
+    def test_to_json(self):
+        filename = os.path.join(self.path, 'model.json')
+        self.model.to_json(filename)
+        loaded = CompactSVCModel.from_json(filename)
+        np.testing.assert_array_equal(loaded.bias, [0.3, 0.7])
+        np.testing.assert_array_equal(loaded.support_vectors, self.model.support_vectors)
+        np.testing.assert_allclose(loaded.predict_proba(self.X), self.model.predict_proba(self.X))
+
+    def test_mismatched_arrays(self):
+        self.assertRaises(ValueError, CompactSVCModel, np.zeros((3, 2)), np.zeros(2), 0.0, 1.0, -1.0, 0.0, 0.5,
+                          np.zeros(2), np.ones(2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+# Copyright (c) 2016, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from cerebralcortex.data_processor.model.dataset import ColumnarCache, load_features, load_stress_marks, \
+    parse_feature_file
+
+
+class TestDataset(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.cache = os.path.join(self.path, 'cache')
+        self.rows = {}
+        random = np.random.RandomState(0)
+        for pid in [1, 12]:
+            os.makedirs(os.path.join(self.path, 'SI%02d' % pid))
+            timestamps = 1500000000000 + 60000 * np.arange(5)
+            values = random.randn(5, 3)
+            self.rows[pid] = (timestamps, values)
+            with open(os.path.join(self.path, 'SI%02d' % pid, 'features.csv'), 'w') as f:
+                for ts, v in zip(timestamps, values):
+                    f.write('%d, %s\n' % (ts, ', '.join(repr(float(x)) for x in v)))
+            with open(os.path.join(self.path, 'SI%02d' % pid, 'stress_marks.csv'), 'w') as f:
+                f.write('c4 baseline, x, 1500000000000, 1500000100000\n')
+                f.write('c2 stress, x, 1500000100000, 1500000300000\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_load_features(self):
+        participant_ids, timestamps, features = load_features(self.path, 'features.csv')
+        self.assertEqual(features.shape, (10, 3))
+        for pid in [1, 12]:
+            rows = participant_ids == pid
+            np.testing.assert_array_equal(timestamps[rows], self.rows[pid][0])
+            np.testing.assert_array_equal(features[rows], self.rows[pid][1])
+
+    def test_load_stress_marks(self):
+        participant_ids, labels, starts, ends = load_stress_marks(self.path, 'stress_marks.csv')
+        self.assertEqual(sorted(participant_ids.tolist()), [1, 1, 12, 12])
+        self.assertEqual(sorted(labels.tolist()), ['c2', 'c2', 'c4', 'c4'])
+        self.assertEqual(starts.dtype, np.int64)
+        self.assertTrue(np.all(ends > starts))
+
+    def test_cache(self):
+        expected = load_features(self.path, 'features.csv')
+        cached = load_features(self.path, 'features.csv', cache_dir=self.cache)
+        self.assertEqual(len(os.listdir(self.cache)), 2)
+        cached_again = load_features(self.path, 'features.csv', cache_dir=self.cache)
+        for a, b, c in zip(expected, cached, cached_again):
+            np.testing.assert_array_equal(a, b)
+            np.testing.assert_array_equal(a, c)
+
+    def test_cache_invalidated_on_change(self):
+        filename = os.path.join(self.path, 'SI01', 'features.csv')
+        cache = ColumnarCache(self.cache)
+        cache.load('features', filename, parse_feature_file)
+        with open(filename, 'a') as f:
+            f.write('1500000300000, 1.0, 2.0, 3.0\n')
+        self.assertEqual(len(cache.load('features', filename, parse_feature_file)['timestamps']), 6)
+
+    def test_ragged_file(self):
+        filename = os.path.join(self.path, 'SI01', 'features.csv')
+        with open(filename, 'a') as f:
+            f.write('1500000300000, 1.0\n')
+        with self.assertRaises(ValueError):
+            parse_feature_file(filename)
+
+
+if __name__ == '__main__':
+    unittest.main()
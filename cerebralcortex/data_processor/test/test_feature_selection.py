@@ -0,0 +1,94 @@
+# Copyright (c) 2016, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+
+import numpy as np
+from sklearn import svm
+from sklearn.metrics import accuracy_score
+
+from cerebralcortex.data_processor.model.backend import ProcessPoolBackend
+from cerebralcortex.data_processor.model.feature_selection import feature_squared_distances, \
+    sequential_feature_selection, squared_distances
+from cerebralcortex.data_processor.model.kernel import rbf_kernel_matrix
+
+
+def accuracy_scorer(estimator, X, y):
+    return accuracy_score(y, estimator.predict(X))
+
+
+class TestFeatureSelection(unittest.TestCase):
+    def setUp(self):
+        random_state = np.random.RandomState(0)
+        subjects = np.repeat([1, 2, 3], 40)
+        self.y = random_state.randint(2, size=len(subjects))
+        # Columns 0-2 separate the classes, 3-5 are noise
+        self.X = random_state.normal(size=(len(subjects), 6))
+        self.X[:, :3] += 1.5 * self.y[:, np.newaxis]
+        self.folds = [(np.flatnonzero(subjects != s), np.flatnonzero(subjects == s)) for s in np.unique(subjects)]
+        self.parameters = {'kernel': 'rbf', 'C': 1.0, 'gamma': 'auto', 'class_weight': {0: 0.5, 1: 0.5}}
+
+    def test_incremental_distances(self):
+        distances = squared_distances(self.X, [0, 2, 4])
+        np.testing.assert_allclose(np.exp(-0.3 * distances), rbf_kernel_matrix(self.X[:, [0, 2, 4]], gamma=0.3),
+                                   atol=1e-8)
+        np.testing.assert_allclose(distances + feature_squared_distances(self.X[:, 1]),
+                                   squared_distances(self.X, [0, 1, 2, 4]))
+        np.testing.assert_allclose(distances - feature_squared_distances(self.X[:, 4]),
+                                   squared_distances(self.X, [0, 2]), atol=1e-10)
+
+    def _select(self, direction, n_features_to_select, estimator=None):
+        backend = ProcessPoolBackend(n_jobs=2)
+        try:
+            return sequential_feature_selection(backend, estimator or svm.SVC(), self.parameters, self.X, self.y, self.folds,
+                                                accuracy_scorer, direction=direction,
+                                                n_features_to_select=n_features_to_select)
+        finally:
+            backend.stop()
+
+    def test_forward(self):
+        selected, history = self._select('forward', 3)
+        self.assertEqual(sorted(selected), [0, 1, 2])
+        self.assertEqual([step['n_features'] for step in history], [1, 2, 3])
+        self.assertEqual([step['feature'] for step in history], selected)
+
+    def test_probability_estimator(self):
+        # The fold fits skip libsvm's Platt cross-validation, so a probability SVC selects exactly the same way
+        self.assertEqual(self._select('forward', 2, svm.SVC(probability=True, random_state=0)),
+                         self._select('forward', 2))
+
+    def test_backward(self):
+        selected, history = self._select('backward', 3)
+        self.assertEqual(selected, [0, 1, 2])
+        self.assertEqual(history[0]['action'], 'start')
+        self.assertEqual(sorted(step['feature'] for step in history[1:]), [3, 4, 5])
+
+    def test_invalid_direction(self):
+        with self.assertRaises(ValueError):
+            sequential_feature_selection(None, svm.SVC(), self.parameters, self.X, self.y, self.folds,
+                                         accuracy_scorer, direction='sideways')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+# Copyright (c) 2016, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+
+import numpy as np
+
+from cerebralcortex.data_processor.model.halving import halving_schedule, fold_order, top_candidates
+
+
+class TestHalving(unittest.TestCase):
+    def test_halving_schedule(self):
+        schedule = halving_schedule(27, 24, factor=3, min_folds=1)
+        self.assertListEqual(schedule, [(27, 1), (9, 3), (3, 9), (1, 24)])
+
+    def test_halving_schedule_few_candidates(self):
+        schedule = halving_schedule(4, 24, factor=2, min_folds=2)
+        self.assertListEqual(schedule, [(4, 2), (2, 4), (1, 24)])
+        self.assertEqual(schedule[-1][1], 24)
+
+    def test_halving_schedule_min_folds(self):
+        self.assertListEqual(halving_schedule(100, 5, factor=3, min_folds=10), [(100, 5)])
+
+    def test_halving_schedule_invalid(self):
+        self.assertRaises(ValueError, halving_schedule, 10, 5, factor=1)
+        self.assertRaises(ValueError, halving_schedule, 0, 5)
+
+    def test_fold_order(self):
+        order = fold_order(10, random_state=0)
+        self.assertListEqual(sorted(order), list(range(10)))
+        np.testing.assert_array_equal(order, fold_order(10, random_state=0))
+
+    def test_top_candidates(self):
+        self.assertListEqual(top_candidates([5, 6, 7, 8], [0.1, 0.9, 0.5, 0.9], 3), [6, 8, 7])
+
+
+if __name__ == '__main__':
+    unittest.main()
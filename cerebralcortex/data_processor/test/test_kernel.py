@@ -0,0 +1,88 @@
+# Copyright (c) 2016, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+
+import numpy as np
+from sklearn import svm
+
+from cerebralcortex.data_processor.model.kernel import rbf_kernel_matrix, resolve_gamma, precomputed_parameters, \
+    group_by_gamma
+
+
+class TestKernel(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super(TestKernel, cls).setUpClass()
+        random = np.random.RandomState(42)
+        cls.X = random.randn(120, 6)
+        cls.y = (cls.X[:, 0] + 0.5 * random.randn(120) > 0).astype(int)
+
+    def test_rbf_kernel_matrix(self):
+        gamma = 0.25
+        K = rbf_kernel_matrix(self.X, gamma=gamma, block_size=7)
+        diff = self.X[:, np.newaxis, :] - self.X[np.newaxis, :, :]
+        expected = np.exp(-gamma * np.sum(diff ** 2, axis=2))
+        self.assertEqual(K.shape, (120, 120))
+        np.testing.assert_allclose(K, expected, rtol=1e-10, atol=1e-12)
+
+    def test_rbf_kernel_matrix_rectangular(self):
+        K = rbf_kernel_matrix(self.X[:10], self.X[10:], gamma=0.5)
+        self.assertEqual(K.shape, (10, 110))
+        np.testing.assert_allclose(K, rbf_kernel_matrix(self.X, gamma=0.5)[:10, 10:])
+
+    def test_precomputed_fit_matches_rbf(self):
+        gamma = 0.5
+        train = np.arange(0, 90)
+        test = np.arange(90, 120)
+        K = rbf_kernel_matrix(self.X, gamma=gamma)
+
+        rbf = svm.SVC(kernel='rbf', gamma=gamma, C=2.0).fit(self.X[train], self.y[train])
+        precomputed = svm.SVC(kernel='precomputed', C=2.0).fit(K[np.ix_(train, train)], self.y[train])
+
+        np.testing.assert_array_equal(rbf.support_, precomputed.support_)
+        np.testing.assert_allclose(rbf.decision_function(self.X[test]),
+                                   precomputed.decision_function(K[np.ix_(test, train)]), rtol=1e-7, atol=1e-9)
+
+    def test_resolve_gamma(self):
+        svc = svm.SVC(kernel='rbf', gamma='auto')
+        self.assertEqual(resolve_gamma({'C': 1.0}, svc, 4), 0.25)
+        self.assertEqual(resolve_gamma({'gamma': 2.0}, svc, 4), 2.0)
+        self.assertRaises(ValueError, resolve_gamma, {'kernel': 'linear'}, svc, 4)
+
+    def test_precomputed_parameters(self):
+        parameters = {'kernel': 'rbf', 'C': 1.0, 'gamma': 0.5}
+        self.assertDictEqual(precomputed_parameters(parameters), {'kernel': 'precomputed', 'C': 1.0})
+        self.assertIn('gamma', parameters)
+
+    def test_group_by_gamma(self):
+        candidates = [{'C': c, 'gamma': g} for c in [1.0, 2.0] for g in [0.5, 0.25]]
+        groups = group_by_gamma(candidates, svm.SVC(), 6)
+        self.assertListEqual(list(groups.keys()), [0.5, 0.25])
+        self.assertListEqual(groups[0.5], [0, 2])
+        self.assertListEqual(groups[0.25], [1, 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
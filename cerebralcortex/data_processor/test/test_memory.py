@@ -0,0 +1,57 @@
+# Copyright (c) 2016, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+
+import numpy as np
+
+from cerebralcortex.data_processor.model.memory import MAX_CACHE_SIZE, MIN_CACHE_SIZE, available_memory_mb, \
+    kernel_cache_size, peak_memory_mb, reset_peak_memory
+
+
+class TestMemory(unittest.TestCase):
+    def test_kernel_cache_size(self):
+        # A small training set never needs more than its full kernel matrix
+        self.assertEqual(kernel_cache_size(3000, 37, 64000, 1), 35)
+        self.assertEqual(kernel_cache_size(100, 37, 64000, 1), MIN_CACHE_SIZE)
+        self.assertEqual(kernel_cache_size(100000, 37, 64000, 1), MAX_CACHE_SIZE)
+        # Many concurrent fits share the budget
+        self.assertEqual(kernel_cache_size(100000, 37, 64000, 64), int(64000 * 0.75 / 64 - 100000 * 37 * 24 / 2 ** 20))
+        self.assertEqual(kernel_cache_size(100000, 37, 1000, 64), MIN_CACHE_SIZE)
+
+    def test_available_memory(self):
+        self.assertGreater(available_memory_mb(), 0)
+
+    def test_peak_memory(self):
+        reset_peak_memory()
+        before = peak_memory_mb()
+        array = np.ones(64 * 2 ** 20 // 8)
+        self.assertGreaterEqual(peak_memory_mb(), before + 60)
+        del array
+        if reset_peak_memory():
+            self.assertLess(peak_memory_mb(), before + 60)
+
+
+if __name__ == '__main__':
+    unittest.main()
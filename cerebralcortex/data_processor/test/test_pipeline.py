@@ -0,0 +1,92 @@
+# Copyright (c) 2016, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+
+from cerebralcortex.data_processor.pipeline import ParticipantPlan, load_record
+
+
+class TestParticipantPlan(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+
+        def traced(name, function):
+            def stage(*args):
+                self.calls.append(name)
+                return function(*args)
+
+            return stage
+
+        self.plan = ParticipantPlan()
+        self.plan.stage('a2', ['a'], traced('a2', lambda a: a * 2))
+        self.plan.stage('b2', ['b'], traced('b2', lambda b: b * 2))
+        self.plan.stage('sum', ['a2', 'b2'], traced('sum', lambda a, b: a + b))
+        self.plan.stage('c1', ['c'], traced('c1', lambda c: c + 1))
+
+    def test_required_stages(self):
+        self.assertEqual(self.plan.required_stages(['sum']), ('a2', 'b2', 'sum'))
+        self.assertEqual(self.plan.required_stages(['c1', 'a2']), ('a2', 'c1'))
+        with self.assertRaises(KeyError):
+            self.plan.required_stages(['missing'])
+
+    def test_compile(self):
+        run = self.plan.compile(['sum'])
+        self.assertEqual(run({'participant': 'SI01', 'a': 1, 'b': 10, 'c': 100}), (22,))
+        # Stages no output depends on do not run
+        self.assertEqual(self.calls, ['a2', 'b2', 'sum'])
+
+        self.calls = []
+        self.assertEqual(self.plan.compile(['c1', 'a2', 'sum'])({'a': 1, 'b': 10, 'c': 100}), (101, 2, 22))
+        self.assertEqual(sorted(self.calls), ['a2', 'b2', 'c1', 'sum'])
+
+    def test_halo(self):
+        plan = ParticipantPlan()
+        plan.stage('corrected', ['raw'], lambda raw: raw, halo=1.0)
+        plan.stage('peaks', ['corrected'], lambda corrected: corrected, halo=8.0)
+        plan.stage('features', ['peaks', 'corrected'], lambda peaks, corrected: peaks, halo=60.0)
+        plan.stage('other', ['raw'], lambda raw: raw, halo=10.0)
+        self.assertEqual(plan.halo(['features']), 69.0)
+        self.assertEqual(plan.halo(['corrected', 'other']), 10.0)
+        self.assertEqual(self.plan.halo(['sum']), 0.0)
+
+    def test_duplicate_stage(self):
+        with self.assertRaises(ValueError):
+            self.plan.stage('sum', ['a'], lambda a: a)
+
+
+class TestLoadRecord(unittest.TestCase):
+    def test_load_record(self):
+        def read(participant, datasource):
+            if datasource == 'missing':
+                raise IOError('No such file')
+            return participant + '/' + datasource
+
+        self.assertEqual(load_record('SI01', ['accelx', 'accely', 'accelz'], read),
+                         {'participant': 'SI01', 'accelx': 'SI01/accelx', 'accely': 'SI01/accely',
+                          'accelz': 'SI01/accelz'})
+        self.assertIsNone(load_record('SI01', ['ecg', 'missing'], read))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+# Copyright (c) 2016, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+
+import numpy as np
+from sklearn import svm
+from sklearn.metrics import accuracy_score
+
+from cerebralcortex.data_processor.model.backend import ProcessPoolBackend
+from cerebralcortex.data_processor.model.kernel import rbf_kernel_matrix
+from cerebralcortex.data_processor.model.prescreen import nystroem_features, prescreen_scores, rank_agreement
+from cerebralcortex.data_processor.model.synthetic import make_cstress_dataset
+
+
+def accuracy_scorer(estimator, X, y):
+    return accuracy_score(y, estimator.predict(X))
+
+
+class TestPrescreen(unittest.TestCase):
+    def setUp(self):
+        self.X, self.y, subjects = make_cstress_dataset(n_subjects=3, n_windows=60, n_features=5, separation=2.0,
+                                                        random_state=0)
+        self.folds = [(np.flatnonzero(subjects != s), np.flatnonzero(subjects == s)) for s in np.unique(subjects)]
+
+    def test_nystroem_features(self):
+        features = nystroem_features(self.X, 0.1, n_components=len(self.X), random_state=0)
+        np.testing.assert_allclose(features.dot(features.T), rbf_kernel_matrix(self.X, gamma=0.1), atol=1e-6)
+        self.assertEqual(nystroem_features(self.X, 0.1, n_components=20, random_state=0).shape, (180, 20))
+
+    def test_prescreen_scores(self):
+        candidates = [{'kernel': 'rbf', 'C': c, 'gamma': g, 'class_weight': {0: w, 1: 1 - w}}
+                      for c in [0.01, 1.0, 100.0] for g in [0.01, 0.1] for w in [0.0, 0.5]]
+        backend = ProcessPoolBackend(n_jobs=2)
+        try:
+            scores = prescreen_scores(backend, self.X, self.y, candidates, self.folds, accuracy_scorer, svm.SVC(),
+                                      n_components=50, random_state=0)
+        finally:
+            backend.stop()
+        self.assertEqual(scores.shape, (len(candidates),))
+        self.assertTrue(np.all((scores >= 0) & (scores <= 1)))
+        # Ignoring the stress class entirely cannot beat a balanced weighting
+        for i in range(0, len(candidates), 2):
+            self.assertLessEqual(scores[i], scores[i + 1])
+
+    def test_rank_agreement(self):
+        agreement = rank_agreement([0.1, 0.2, 0.3, 0.4], [0.5, 0.6, 0.7, 0.8])
+        self.assertAlmostEqual(agreement['spearman'], 1.0)
+        self.assertAlmostEqual(agreement['kendall'], 1.0)
+        self.assertTrue(agreement['same_best'])
+        agreement = rank_agreement([0.4, 0.3, 0.2, 0.1], [0.5, 0.6, 0.7, 0.8])
+        self.assertAlmostEqual(agreement['spearman'], -1.0)
+        self.assertFalse(agreement['same_best'])
+
+
+if __name__ == '__main__':
+    unittest.main()
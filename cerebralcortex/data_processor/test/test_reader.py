@@ -0,0 +1,103 @@
+# Copyright (c) 2017, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytz
+
+from cerebralcortex.data_processor.preprocessor.reader import ArrayStream, parse_block, read_arrays, read_chunks, \
+    to_datapoints
+
+
+class TestReader(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        random = np.random.RandomState(4)
+        self.timestamps = 1480453825375.0 + np.arange(1000) * 15.625
+        self.samples = np.round(random.randn(1000) * 500 + 2000)
+        self.filename = os.path.join(self.path, 'ecg.txt.gz')
+        with gzip.open(self.filename, 'wt') as f:
+            for i, (ts, val) in enumerate(zip(self.timestamps, self.samples)):
+                f.write('%r %r\n' % (float(val), float(ts)))
+                if i == 500:
+                    f.write('bad line\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_parse_block(self):
+        timestamps, samples = parse_block('2076 1480453825375\n2412 1480453825390.5\n2003 1480453825392')
+        np.testing.assert_array_equal(timestamps, [1480453825375, 1480453825390.5, 1480453825392])
+        np.testing.assert_array_equal(samples, [2076, 2412, 2003])
+
+        # Lines parser.data_processor would reject are skipped
+        timestamps, samples = parse_block('2076 1480453825375\nnan?\n\n1 2 3\n2003 1480453825392\n')
+        np.testing.assert_array_equal(timestamps, [1480453825375, 1480453825392])
+        np.testing.assert_array_equal(samples, [2076, 2003])
+
+    def test_read_chunks(self):
+        chunks = list(read_chunks(self.filename, chunk_size=300, block_size=1000))
+        self.assertEqual([len(c[0]) for c in chunks], [300, 300, 300, 100])
+        np.testing.assert_array_equal(np.concatenate([c[0] for c in chunks]), self.timestamps)
+        np.testing.assert_array_equal(np.concatenate([c[1] for c in chunks]), self.samples)
+
+    def test_read_arrays(self):
+        timestamps, samples = read_arrays(self.filename, max_samples=700)
+        np.testing.assert_array_equal(timestamps, self.timestamps[:700])
+        np.testing.assert_array_equal(samples, self.samples[:700])
+
+        empty = os.path.join(self.path, 'empty.txt.gz')
+        with gzip.open(empty, 'wt'):
+            pass
+        self.assertEqual(len(read_arrays(empty)[0]), 0)
+
+    def test_to_datapoints(self):
+        datapoints = to_datapoints(self.timestamps[:3], self.samples[:3])
+        self.assertEqual([dp.sample for dp in datapoints], list(self.samples[:3]))
+        self.assertAlmostEqual(datapoints[1].start_time.timestamp() * 1000.0, self.timestamps[1], places=3)
+        self.assertIsNotNone(datapoints[0].start_time.tzinfo)
+
+    def test_array_stream(self):
+        stream = ArrayStream(self.timestamps, self.samples, owner='SI01')
+        self.assertEqual(len(stream), 1000)
+        self.assertAlmostEqual(stream.start_time.timestamp() * 1000.0, self.timestamps[0], places=3)
+
+        sliced = stream.slice(stream.start_time, datetime.fromtimestamp(self.timestamps[10] / 1000.0, pytz.utc))
+        np.testing.assert_array_equal(sliced.samples, self.samples[:10])
+        self.assertIsNone(stream.slice(sliced.end_time + timedelta(days=1), sliced.end_time + timedelta(days=2))
+                          .start_time)
+
+        datastream = sliced.to_datastream()
+        self.assertEqual(datastream.user, 'SI01')
+        self.assertEqual([dp.sample for dp in datastream.data], list(self.samples[:10]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+# Copyright (c) 2016, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+
+import numpy as np
+from sklearn import preprocessing, svm
+
+from cerebralcortex.data_processor.model.backend import ProcessPoolBackend
+from cerebralcortex.data_processor.model.compact_model import CompactSVCModel
+from cerebralcortex.data_processor.model.reduction import classified_f1, cross_subject_reduction, \
+    prune_support_vectors, reduce_support_vectors, reduction_report
+
+
+class TestReduction(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super(TestReduction, cls).setUpClass()
+        random = np.random.RandomState(5)
+        cls.X = random.randn(300, 4)
+        cls.y = (cls.X[:, 0] + cls.X[:, 1] + 0.7 * random.randn(300) > 0).astype(int)
+        cls.normalizer = preprocessing.StandardScaler()
+        cls.Z = cls.normalizer.fit_transform(cls.X)
+        cls.svc = svm.SVC(probability=True, gamma=0.25, C=1.0, random_state=0).fit(cls.Z, cls.y)
+        cls.model = CompactSVCModel.from_estimator(cls.svc, cls.normalizer, 0.5)
+
+    def test_prune_support_vectors(self):
+        full = prune_support_vectors(self.model, self.model.n_support)
+        np.testing.assert_array_equal(full.dual_coef, self.model.dual_coef)
+
+        n_keep = self.model.n_support // 4
+        decision = self.model.decision_function(self.X)
+        pruned = prune_support_vectors(self.model, n_keep, refit=False)
+        refit = prune_support_vectors(self.model, n_keep)
+        self.assertEqual(refit.n_support, n_keep)
+        largest = np.sort(np.abs(self.model.dual_coef))[-n_keep:]
+        np.testing.assert_array_equal(np.sort(np.abs(pruned.dual_coef)), largest)
+        # Refitting the kept coefficients approximates the full decision function better than dropping vectors
+        self.assertLess(np.abs(refit.decision_function(self.X) - decision).mean(),
+                        np.abs(pruned.decision_function(self.X) - decision).mean())
+
+    def test_classified_f1(self):
+        self.assertAlmostEqual(classified_f1(np.array([1, 0, -1, 1]), np.array([1, 0, 0, 0])), 2.0 / 3.0)
+        self.assertEqual(classified_f1(np.array([-1, -1]), np.array([1, 0])), 0.0)
+
+    def test_reduce_support_vectors(self):
+        reduced, report = reduce_support_vectors(self.model, self.X, self.y, tolerance=0.02)
+        self.assertEqual(report['n_support'], self.model.n_support)
+        self.assertEqual(report['n_support_reduced'], reduced.n_support)
+        self.assertLess(reduced.n_support, self.model.n_support)
+        self.assertGreaterEqual(report['f1_reduced'], report['f1'] - 0.02)
+        self.assertAlmostEqual(report['f1_reduced'], classified_f1(reduced.predict(self.X), self.y))
+
+        _, exact = reduce_support_vectors(self.model, self.Z, self.y, tolerance=-1.0, standardized=True)
+        self.assertEqual(exact['n_support_reduced'], self.model.n_support)
+
+    def test_cross_subject_reduction(self):
+        folds = [(np.arange(100, 300), np.arange(0, 100)), (np.arange(0, 200), np.arange(200, 300))]
+        backend = ProcessPoolBackend(n_jobs=2)
+        try:
+            full, reduced = cross_subject_reduction(backend, self.svc, self.Z, self.y, folds, 1.0)
+            _, half = cross_subject_reduction(backend, self.svc, self.Z, self.y, folds, 0.5)
+        finally:
+            backend.stop()
+        expected = svm.SVC(gamma=0.25, C=1.0).fit(self.Z[100:], self.y[100:]).decision_function(self.Z[:100])
+        np.testing.assert_allclose(full[:100], expected, atol=1e-8)
+        np.testing.assert_array_equal(full, reduced)
+        self.assertFalse(np.allclose(full, half))
+
+    def test_reduction_report_libsvm_calibration(self):
+        # The default calibration of the training script passes no Platt parameters, the model takes libsvm's
+        model = CompactSVCModel.from_estimator(self.svc, self.normalizer, [0.3, 0.7], None, None)
+        folds = [(np.arange(100, 300), np.arange(0, 100)), (np.arange(0, 200), np.arange(200, 300))]
+        backend = ProcessPoolBackend(n_jobs=2)
+        try:
+            reduced, report = reduction_report(backend, model, self.svc, self.Z, self.y, folds, tolerance=0.02)
+        finally:
+            backend.stop()
+        self.assertEqual(report['n_support_reduced'], reduced.n_support)
+        self.assertLess(reduced.n_support, model.n_support)
+        for key in ['cv_f1', 'cv_f1_reduced']:
+            self.assertGreater(report[key], 0.5)
+            self.assertLessEqual(report[key], 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
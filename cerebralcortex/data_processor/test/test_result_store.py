@@ -0,0 +1,86 @@
+# Copyright (c) 2016, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+from sklearn import svm
+
+from cerebralcortex.data_processor.model.result_store import ResultStore, array_fingerprint, parameters_fingerprint
+
+
+class TestResultStore(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.store = ResultStore(os.path.join(self.path, 'results'))
+        random = np.random.RandomState(0)
+        self.X = random.randn(20, 3)
+        self.y = random.randint(0, 2, 20)
+        self.train = np.arange(0, 15)
+        self.test = np.arange(15, 20)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_array_fingerprint(self):
+        self.assertEqual(array_fingerprint(self.X), array_fingerprint(self.X.copy()))
+        self.assertNotEqual(array_fingerprint(self.X), array_fingerprint(self.X.astype(np.float32)))
+        self.assertNotEqual(array_fingerprint(self.X), array_fingerprint(self.X.reshape(3, 20)))
+
+    def test_parameters_fingerprint(self):
+        self.assertEqual(parameters_fingerprint({'C': 1.0, 'class_weight': {0: 0.5, 1: 0.5}}),
+                         parameters_fingerprint({'class_weight': {1: 0.5, 0: 0.5}, 'C': 1.0}))
+
+    def test_dataset_digest(self):
+        digest = ResultStore.dataset_digest(self.X, self.y, svm.SVC(), None)
+        self.assertEqual(digest, ResultStore.dataset_digest(self.X.copy(), self.y.copy(), svm.SVC(), None))
+        self.assertNotEqual(digest, ResultStore.dataset_digest(self.X, 1 - self.y, svm.SVC(), None))
+        self.assertNotEqual(digest, ResultStore.dataset_digest(self.X, self.y, svm.SVC(cache_size=10), None))
+
+    def test_get_put(self):
+        digest = ResultStore.dataset_digest(self.X, self.y)
+        key = ResultStore.key(digest, {'C': 1.0}, self.train, self.test)
+        self.assertNotIn(key, self.store)
+        self.assertIsNone(self.store.get(key))
+
+        self.store.put(key, [0.75, 5, 0.01, {'C': 1.0}])
+        self.assertIn(key, self.store)
+        self.assertEqual(self.store.get(key), [0.75, 5, 0.01, {'C': 1.0}])
+        self.assertEqual(len(self.store), 1)
+
+        reopened = ResultStore(self.store.path)
+        self.assertEqual(reopened.get(key), [0.75, 5, 0.01, {'C': 1.0}])
+
+    def test_key_depends_on_folds_and_parameters(self):
+        digest = ResultStore.dataset_digest(self.X, self.y)
+        key = ResultStore.key(digest, {'C': 1.0}, self.train, self.test)
+        self.assertNotEqual(key, ResultStore.key(digest, {'C': 2.0}, self.train, self.test))
+        self.assertNotEqual(key, ResultStore.key(digest, {'C': 1.0}, self.test, self.train))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+# Copyright (c) 2016, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+
+from cerebralcortex.data_processor.model.scheduler import estimate_fit_cost, pack_tasks
+
+
+class TestScheduler(unittest.TestCase):
+    def test_estimate_fit_cost(self):
+        base = estimate_fit_cost({'C': 1.0, 'gamma': 0.5}, 100, 10)
+        self.assertGreater(estimate_fit_cost({'C': 64.0, 'gamma': 0.5}, 100, 10), base)
+        self.assertGreater(estimate_fit_cost({'C': 1.0, 'gamma': 8.0}, 100, 10), base)
+        self.assertAlmostEqual(estimate_fit_cost({'C': 1.0, 'gamma': 0.5}, 200, 10), 4 * base)
+        self.assertAlmostEqual(estimate_fit_cost({'C': 1.0, 'gamma': 0.5}, 100, 10, precomputed=True), base / 10)
+        self.assertEqual(estimate_fit_cost({'gamma': 'auto'}, 100, 4), estimate_fit_cost({'gamma': 0.25}, 100, 4))
+
+    def test_pack_tasks_keeps_every_task(self):
+        tasks = list(range(50))
+        costs = [1.0 + (t % 7) for t in tasks]
+        partitions = pack_tasks(tasks, costs, 8)
+        self.assertEqual(len(partitions), 8)
+        self.assertListEqual(sorted(t for partition in partitions for t in partition), tasks)
+
+    def test_pack_tasks_balances_and_orders(self):
+        tasks = list(range(40))
+        costs = [float(t) for t in tasks]
+        partitions = pack_tasks(tasks, costs, 4)
+        loads = [sum(costs[t] for t in partition) for partition in partitions]
+        self.assertListEqual(loads, sorted(loads, reverse=True))
+        self.assertLess(max(loads) - min(loads), max(costs))
+        for partition in partitions:
+            self.assertListEqual(partition, sorted(partition, reverse=True))
+
+    def test_pack_tasks_groups(self):
+        tasks = [(gamma, c) for gamma in range(4) for c in range(6)]
+        partitions = pack_tasks(tasks, [1.0] * len(tasks), 4, lambda task: task[0])
+        for partition in partitions:
+            self.assertEqual(len(set(task[0] for task in partition)), 1)
+
+    def test_pack_tasks_small(self):
+        self.assertListEqual(pack_tasks([], [], 4), [])
+        self.assertListEqual(pack_tasks(['a'], [1.0], 4), [['a']])
+        self.assertRaises(ValueError, pack_tasks, ['a', 'b'], [1.0], 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
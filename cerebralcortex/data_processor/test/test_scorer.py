@@ -0,0 +1,149 @@
+# Copyright (c) 2016, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+
+import numpy as np
+from sklearn import metrics, svm
+
+from cerebralcortex.data_processor.model.scorer import two_bias_scorer_CV, f1_bias_scorer_CV, f1_bias_scorer
+
+
+def reference_two_bias_scorer_CV(probs, y, ret_bias=False):
+    db = np.transpose(np.vstack([probs, y]))
+    db = db[np.argsort(db[:, 0]), :]
+
+    pos = np.sum(y == 1)
+    n = len(y)
+    neg = n - pos
+    tp, tn = pos, 0
+    lost = 0
+
+    optbias = []
+    minloss = 1
+
+    for i in range(n):
+        if db[i, 1] == 1:  # positive
+            tp -= 1.0
+        else:
+            tn += 1.0
+
+        if tp / pos >= 0.95 and tn / neg >= 0.95:
+            optbias = [db[i, 0], db[i, 0]]
+            continue
+
+        running_pos = pos
+        running_neg = neg
+        running_tp = tp
+        running_tn = tn
+
+        for j in range(i + 1, n):
+            if db[j, 1] == 1:  # positive
+                running_tp -= 1.0
+                running_pos -= 1
+            else:
+                running_neg -= 1
+
+            lost = (j - i) * 1.0 / n
+            if running_pos == 0 or running_neg == 0:
+                break
+
+            if running_tp / running_pos >= 0.95 and running_tn / running_neg >= 0.95 and lost < minloss:
+                minloss = lost
+                optbias = [db[i, 0], db[j, 0]]
+
+    if ret_bias:
+        return -minloss, optbias
+    else:
+        return -minloss
+
+
+def reference_f1_bias_scorer_CV(probs, y, ret_bias=False):
+    precision, recall, thresholds = metrics.precision_recall_curve(y, probs)
+
+    f1 = 0.0
+    bias = 0.0
+    for i in range(0, len(thresholds)):
+        if not (precision[i] == 0 and recall[i] == 0):
+            f = 2 * (precision[i] * recall[i]) / (precision[i] + recall[i])
+            if f > f1:
+                f1 = f
+                bias = thresholds[i]
+
+    if ret_bias:
+        return f1, bias
+    else:
+        return f1
+
+
+class TestScorer(unittest.TestCase):
+    @staticmethod
+    def samples():
+        random = np.random.RandomState(7)
+        for trial in range(300):
+            n = random.randint(2, 120)
+            y = (random.rand(n) < random.uniform(0.05, 0.95)).astype(int)
+            separation = random.uniform(0.0, 6.0)
+            probs = 1.0 / (1.0 + np.exp(-(random.randn(n) + separation * (y - 0.5))))
+            if trial % 3 == 0:
+                probs = np.round(probs, 1)  # Many ties
+            yield probs, y
+
+    def test_two_bias_scorer_CV_equivalence(self):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for probs, y in self.samples():
+                expected = reference_two_bias_scorer_CV(probs, y, True)
+                self.assertEqual(two_bias_scorer_CV(probs, y, True), expected)
+                self.assertEqual(two_bias_scorer_CV(probs, y), expected[0])
+
+    def test_two_bias_scorer_CV_separable(self):
+        probs = np.array([0.1, 0.2, 0.3, 0.7, 0.8, 0.9])
+        y = np.array([0, 0, 0, 1, 1, 1])
+        self.assertEqual(two_bias_scorer_CV(probs, y, True), reference_two_bias_scorer_CV(probs, y, True))
+        self.assertListEqual(two_bias_scorer_CV(probs, y, True)[1], [0.3, 0.3])
+
+    def test_two_bias_scorer_CV_single_class(self):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for y in [np.zeros(10, dtype=int), np.ones(10, dtype=int), np.array([1])]:
+                probs = np.linspace(0.0, 1.0, len(y))
+                self.assertEqual(two_bias_scorer_CV(probs, y, True), reference_two_bias_scorer_CV(probs, y, True))
+
+    def test_f1_bias_scorer_CV_equivalence(self):
+        for probs, y in self.samples():
+            if len(np.unique(y)) < 2:
+                continue
+            self.assertEqual(f1_bias_scorer_CV(probs, y, True), reference_f1_bias_scorer_CV(probs, y, True))
+            self.assertEqual(f1_bias_scorer_CV(probs, y), reference_f1_bias_scorer_CV(probs, y))
+
+    def test_f1_bias_scorer(self):
+        random = np.random.RandomState(3)
+        X = random.randn(80, 4)
+        y = (X[:, 0] > 0).astype(int)
+        estimator = svm.SVC(probability=True, random_state=0).fit(X, y)
+        self.assertEqual(f1_bias_scorer(estimator, X, y, True),
+                         reference_f1_bias_scorer_CV(estimator.predict_proba(X)[:, 1], y, True))
+
+
+if __name__ == '__main__':
+    unittest.main()
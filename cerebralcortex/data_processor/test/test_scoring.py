@@ -0,0 +1,98 @@
+# Copyright (c) 2016, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+from datetime import datetime, timedelta
+
+import numpy as np
+from sklearn import preprocessing, svm
+
+from cerebralcortex.data_processor.model.backend import ProcessPoolBackend
+from cerebralcortex.data_processor.model.compact_model import CompactSVCModel
+from cerebralcortex.data_processor.model.scoring import STRESS_PROBABILITY, batch_score, feature_matrix, \
+    score_feature_streams
+from cerebralcortex.kernel.datatypes.datapoint import DataPoint
+from cerebralcortex.kernel.datatypes.datastream import DataStream
+
+
+class TestScoring(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super(TestScoring, cls).setUpClass()
+        random = np.random.RandomState(3)
+        cls.X = random.randn(120, 3) * [1.0, 5.0, 0.5] + [0.0, 20.0, 1.0]
+        y = (cls.X[:, 0] + 0.5 * random.randn(120) > 0).astype(int)
+        normalizer = preprocessing.StandardScaler()
+        svc = svm.SVC(probability=True, gamma=0.5, random_state=0).fit(normalizer.fit_transform(cls.X), y)
+        cls.model = CompactSVCModel.from_estimator(svc, normalizer, [0.3, 0.7])
+        start = datetime(2017, 1, 1)
+        cls.windows = [(start + timedelta(minutes=i), start + timedelta(minutes=i + 1)) for i in range(len(cls.X))]
+
+    def _streams(self, rows):
+        return [DataStream(owner='p1', data=[DataPoint(start_time=self.windows[i][0], end_time=self.windows[i][1],
+                                                       sample=self.X[i, f]) for i in rows])
+                for f in range(self.X.shape[1])]
+
+    def test_feature_matrix(self):
+        streams = self._streams(range(10))
+        # A window missing from one feature stream is dropped
+        del streams[1].data[4]
+        streams[2].data.reverse()
+        windows, X = feature_matrix(streams)
+        rows = [0, 1, 2, 3, 5, 6, 7, 8, 9]
+        self.assertEqual(windows, [self.windows[i] for i in rows])
+        np.testing.assert_array_equal(X, self.X[rows])
+
+    def test_score_feature_streams(self):
+        stream, labels = score_feature_streams(self.model, self._streams(range(len(self.X))), block_size=7)
+        probabilities = self.model.predict_proba(self.X)
+        self.assertEqual(stream.name, STRESS_PROBABILITY)
+        self.assertEqual(stream.user, 'p1')
+        np.testing.assert_allclose([dp.sample for dp in stream.data], probabilities)
+        self.assertEqual([dp.end_time for dp in stream.data], [w[1] for w in self.windows])
+        np.testing.assert_array_equal(labels, self.model.classify(probabilities))
+
+        with self.assertRaises(ValueError):
+            score_feature_streams(self.model, self._streams(range(5))[:2])
+
+    def test_batch_score(self):
+        participants = [(1, self.windows[:50], self.X[:50]), (2, self.windows[50:], self.X[50:]), (3, [], self.X[:0])]
+        backend = ProcessPoolBackend(n_jobs=2)
+        try:
+            scores, stats = batch_score(backend, self.model, participants, block_size=16)
+        finally:
+            backend.stop()
+        self.assertEqual(stats['windows'], len(self.X))
+        self.assertGreater(stats['windows_per_second'], 0)
+        probabilities = np.concatenate([[dp.sample for dp in scores[p][0].data] for p in [1, 2]])
+        np.testing.assert_allclose(probabilities, self.model.predict_proba(self.X))
+        self.assertEqual(scores[2][0].user, 2)
+        self.assertEqual(len(scores[3][0].data), 0)
+
+        with self.assertRaises(ValueError):
+            batch_score(None, self.model, [(1, self.windows[:3], self.X[:2])])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+# Copyright (c) 2016, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytz
+
+from cerebralcortex.data_processor.pipeline import ParticipantPlan, materialize_record
+from cerebralcortex.data_processor.preprocessor.reader import ArrayStream
+from cerebralcortex.data_processor.sharding import shard_record, slice_datastream, stitch, time_shards
+from cerebralcortex.kernel.datatypes.datapoint import DataPoint
+from cerebralcortex.kernel.datatypes.datastream import DataStream
+
+
+def window_means(datastream, window=60):
+    """
+    Mean of every epoch aligned window of the stream, a stand in for the feature stages
+    """
+    windows = {}
+    for dp in datastream.data:
+        start = datetime.fromtimestamp(dp.start_time.timestamp() // window * window, dp.start_time.tzinfo)
+        windows.setdefault(start, []).append(dp.sample)
+    return DataStream(owner=datastream.user,
+                      data=[DataPoint(start_time=start, end_time=start + timedelta(seconds=window),
+                                      sample=np.mean(values)) for start, values in sorted(windows.items())])
+
+
+def moving_average(datastream, width=5):
+    samples = np.convolve([dp.sample for dp in datastream.data], np.ones(width) / width, mode='same')
+    return DataStream(owner=datastream.user, data=[DataPoint(start_time=dp.start_time, end_time=dp.end_time, sample=s)
+                                                   for dp, s in zip(datastream.data, samples)])
+
+
+class TestSharding(unittest.TestCase):
+    def setUp(self):
+        self.start = datetime(2017, 3, 1, 9, 47, 13, tzinfo=pytz.utc)
+        random = np.random.RandomState(0)
+        self.ecg = DataStream(owner='SI01', data=[DataPoint(start_time=self.start + timedelta(seconds=i), sample=s)
+                                                  for i, s in enumerate(random.randn(3 * 3600))])
+        self.rip = DataStream(owner='SI01', data=[DataPoint(start_time=self.start + timedelta(seconds=2 * i), sample=s)
+                                                  for i, s in enumerate(random.randn(3600))])
+        self.record = {'participant': 'SI01', 'ecg': self.ecg, 'rip': self.rip}
+
+    def test_time_shards(self):
+        shards = time_shards(self.start, self.start + timedelta(hours=2), timedelta(hours=1))
+        self.assertEqual(shards[0], (datetime(2017, 3, 1, 9, tzinfo=pytz.utc),
+                                     datetime(2017, 3, 1, 10, tzinfo=pytz.utc)))
+        self.assertEqual(len(shards), 3)
+        for (_, end), (start, _) in zip(shards[:-1], shards[1:]):
+            self.assertEqual(end, start)
+
+    def test_slice_datastream(self):
+        sliced = slice_datastream(self.ecg, self.start + timedelta(seconds=10), self.start + timedelta(seconds=20))
+        self.assertEqual([dp.sample for dp in sliced.data], [dp.sample for dp in self.ecg.data[10:20]])
+        self.assertEqual(sliced.user, 'SI01')
+        self.assertEqual(len(self.ecg.data), 3 * 3600)
+
+    def test_shard_record(self):
+        shards = shard_record(self.record, ['ecg', 'rip'], timedelta(hours=1), 30.0)
+        self.assertEqual(len(shards), 4)
+        for shard in shards:
+            self.assertEqual(shard['participant'], 'SI01')
+            for dp in shard['ecg'].data:
+                self.assertGreaterEqual(dp.start_time, shard['shard_start'] - timedelta(seconds=30))
+                self.assertLess(dp.start_time, shard['shard_end'] + timedelta(seconds=30))
+        self.assertEqual(shard_record({'participant': 'SI02', 'ecg': DataStream(data=[])}, ['ecg'],
+                                      timedelta(hours=1), 30.0), [])
+
+    def test_shard_array_record(self):
+        arrays = {'participant': 'SI01'}
+        for name in ['ecg', 'rip']:
+            arrays[name] = ArrayStream(np.array([dp.start_time.timestamp() * 1000.0 for dp in self.record[name].data]),
+                                       np.array([dp.sample for dp in self.record[name].data]), owner='SI01')
+        expected = shard_record(self.record, ['ecg', 'rip'], timedelta(hours=1), 30.0)
+        shards = shard_record(arrays, ['ecg', 'rip'], timedelta(hours=1), 30.0)
+        self.assertEqual([shard['shard_start'] for shard in shards], [shard['shard_start'] for shard in expected])
+        for shard, expected_shard in zip(shards, expected):
+            self.assertIsInstance(shard['ecg'], ArrayStream)
+            shard = materialize_record(shard)
+            for name in ['ecg', 'rip']:
+                self.assertEqual(shard[name].user, 'SI01')
+                self.assertEqual([dp.start_time for dp in shard[name].data],
+                                 [dp.start_time for dp in expected_shard[name].data])
+                self.assertEqual([dp.sample for dp in shard[name].data],
+                                 [dp.sample for dp in expected_shard[name].data])
+
+    def test_stitch_matches_whole_recording(self):
+        plan = ParticipantPlan()
+        plan.stage('smooth', ['ecg'], moving_average, halo=3.0)
+        plan.stage('features', ['smooth'], window_means, halo=60.0)
+        plan.stage('rip_features', ['rip'], window_means, halo=60.0)
+        run = plan.compile(['features', 'rip_features'])
+
+        whole = run(self.record)
+        shards = shard_record(self.record, ['ecg', 'rip'], timedelta(minutes=20),
+                              plan.halo(['features', 'rip_features']))
+        stitched = stitch([(shard['shard_start'], shard['shard_end'], run(shard)) for shard in reversed(shards)])
+
+        self.assertEqual(len(stitched), 2)
+        for expected, result in zip(whole, stitched):
+            self.assertEqual([dp.start_time for dp in result.data], [dp.start_time for dp in expected.data])
+            np.testing.assert_allclose([dp.sample for dp in result.data], [dp.sample for dp in expected.data])
+
+        # Without the halo the smoothing filter sees the shard edges and the windows around them change
+        shards = shard_record(self.record, ['ecg', 'rip'], timedelta(minutes=20), 0.0)
+        unhaloed = stitch([(shard['shard_start'], shard['shard_end'], run(shard)) for shard in shards])
+        self.assertFalse(np.allclose([dp.sample for dp in unhaloed[0].data], [dp.sample for dp in whole[0].data]))
+
+    def test_stitch_missing_output(self):
+        self.assertIsNone(stitch([(self.start, self.start, None)]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+# Copyright (c) 2016, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+from collections import Counter
+
+import numpy as np
+
+from cerebralcortex.data_processor.model.stress_labels import StressMarkIndex, label_windows
+
+
+def check_stress_mark(stress_mark, pid, start_time):
+    # Reference: the linear scan the training scripts used
+    end_time = start_time + 60000
+    result = []
+    for line in stress_mark:
+        [id_index, gt, st, et] = line
+
+        if id_index == pid and (gt not in ['c7']):
+            if (start_time > st) and (end_time < et):
+                result.append(gt)
+
+    data = Counter(result)
+    return data.most_common(1)
+
+
+class TestStressLabels(unittest.TestCase):
+    def setUp(self):
+        random = np.random.RandomState(0)
+        self.marks = []
+        for pid in [1, 2, 3]:
+            self.marks.append([pid, 'c4', 0, 1200000])
+            for _ in range(40):
+                start = int(random.randint(0, 100)) * 60000
+                length = int(random.choice([30000, 60000, 60001, 120000, 600000, 1800000]))
+                self.marks.append([pid, str(random.choice(['c1', 'c2', 'c3', 'c7'])), start, start + length])
+        self.participant_ids = np.repeat([1, 2, 3], 400)
+        self.timestamps = np.tile(np.arange(400) * 15000, 3)
+
+    def test_equals_counter(self):
+        index = StressMarkIndex.from_marks(self.marks)
+        labels = label_windows(index, self.participant_ids, self.timestamps)
+        for pid, ts, label in zip(self.participant_ids.tolist(), self.timestamps.tolist(), labels.tolist()):
+            expected = check_stress_mark(self.marks, pid, ts)
+            self.assertEqual(label, expected[0][0] if len(expected) > 0 else '')
+
+    def test_ties(self):
+        marks = [[1, 'c4', 0, 10], [1, 'c2', 0, 300000], [1, 'c1', 0, 300000], [1, 'c1', 100000, 400000],
+                 [1, 'c2', 100000, 400000]]
+        index = StressMarkIndex.from_marks(marks)
+        self.assertEqual(index.label(1, [50000, 150000, 250000]).tolist(), ['c2', 'c2', 'c1'])
+
+    def test_start_filter(self):
+        index = StressMarkIndex.from_marks([[1, 'c4', 500000, 600000], [1, 'c1', 0, 1000000]])
+        self.assertEqual(label_windows(index, [1, 1], [100000, 550000]).tolist(), ['', 'c1'])
+
+    def test_missing_start_label(self):
+        index = StressMarkIndex.from_marks([[1, 'c1', 0, 1000000]])
+        with self.assertRaises(KeyError):
+            label_windows(index, [1], [100000])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+# Copyright (c) 2016, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+
+from cerebralcortex.data_processor.model.synthetic import make_cstress_dataset
+
+
+class TestSynthetic(unittest.TestCase):
+    def test_shape_and_balance(self):
+        X, y, subjects = make_cstress_dataset(n_subjects=4, n_windows=50, n_features=7, positive_fraction=0.3,
+                                              random_state=0)
+        self.assertEqual(X.shape, (200, 7))
+        self.assertListEqual(np.unique(subjects).tolist(), [1, 2, 3, 4])
+        for subject in range(1, 5):
+            self.assertEqual(y[subjects == subject].sum(), 15)
+
+    def test_deterministic(self):
+        a = make_cstress_dataset(n_subjects=2, n_windows=10, n_features=3, random_state=1)
+        b = make_cstress_dataset(n_subjects=2, n_windows=10, n_features=3, random_state=1)
+        for x, z in zip(a, b):
+            np.testing.assert_array_equal(x, z)
+
+    def test_separation(self):
+        X, y, _ = make_cstress_dataset(n_subjects=4, n_windows=100, n_features=5, separation=4.0, random_state=0)
+        self.assertGreater(LogisticRegression().fit(X, y).score(X, y), 0.9)
+        X, y, _ = make_cstress_dataset(n_subjects=4, n_windows=100, n_features=5, separation=0.0, random_state=0)
+        self.assertLess(LogisticRegression().fit(X, y).score(X, y), 0.75)
+
+    def test_positive_fraction(self):
+        self.assertRaises(ValueError, make_cstress_dataset, positive_fraction=1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
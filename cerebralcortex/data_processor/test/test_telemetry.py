@@ -0,0 +1,88 @@
+# Copyright (c) 2016, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+from cerebralcortex.data_processor.model.telemetry import SearchTelemetry, cost_by_parameters, \
+    estimated_fit_time, format_progress, task_record
+
+
+class ListAccumulator:
+    def __init__(self):
+        self.value = []
+
+    def add(self, records):
+        self.value.extend(records)
+
+
+class TestTelemetry(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.records = [task_record(i, {'C': c, 'gamma': g}, fit_time, 0.01, 0.5, 100, 20, n_support)
+                        for i, (c, g, fit_time, n_support) in enumerate([(1.0, 0.5, 1.0, 10), (1.0, 0.5, 3.0, 30),
+                                                                          (4.0, 2.0, 10.0, 90)])]
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_format_progress(self):
+        self.assertEqual(format_progress(25, 100, 10.0), '25/100 fits (25.0%), 2.50 fits/s, ETA 0:00:30')
+        self.assertEqual(format_progress(0, 100, 0.0), '0/100 fits (0.0%), 0.00 fits/s, ETA ?')
+
+    def test_cost_by_parameters(self):
+        regions = cost_by_parameters(self.records)
+        self.assertEqual(regions[0], ((4.0, 2.0), 10.0, 1, 90.0))
+        self.assertEqual(regions[1], ((1.0, 0.5), 4.0, 2, 20.0))
+
+    def test_estimated_fit_time(self):
+        self.assertAlmostEqual(estimated_fit_time(self.records, {'C': 1.0, 'gamma': 0.5}, 200), 8.0)
+        self.assertAlmostEqual(estimated_fit_time(self.records, {'C': 4.0, 'gamma': 2.0}, 100, exponent=1.0), 10.0)
+        self.assertIsNone(estimated_fit_time(self.records, {'C': 2.0, 'gamma': 0.5}, 200))
+
+    def test_track(self):
+        log_path = os.path.join(self.path, 'telemetry.jsonl')
+        telemetry = SearchTelemetry(log_path, interval=0.01)
+        accumulator = ListAccumulator()
+        output = io.StringIO()
+        with redirect_stdout(output):
+            with telemetry.track(accumulator, 3):
+                accumulator.add(self.records)
+            telemetry.report()
+
+        self.assertEqual(len(telemetry.records), 3)
+        with open(log_path) as f:
+            self.assertListEqual([json.loads(line)['fit_time'] for line in f], [1.0, 3.0, 10.0])
+        self.assertIn('3/3 fits (100.0%)', output.getvalue())
+        self.assertEqual(output.getvalue().count('3/3 fits'), 1)
+        self.assertIn('3 fits, 14.0 s of fitting', output.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
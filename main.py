@@ -23,21 +23,30 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 import argparse
-import gzip
 import os
 import time
 import uuid
+from datetime import timedelta
 from pprint import pprint
 
+from pyspark import StorageLevel
+
 from cerebralcortex.CerebralCortex import CerebralCortex
-from cerebralcortex.data_processor.cStress import cStress
-from cerebralcortex.data_processor.preprocessor import parser
-from cerebralcortex.kernel.datatypes.datapoint import DataPoint
-from cerebralcortex.kernel.datatypes.datastream import DataStream
+from cerebralcortex.data_processor.cStress import cStress, cStress_streams
+from cerebralcortex.data_processor.pipeline import participant_records
+from cerebralcortex.data_processor.preprocessor.reader import ArrayStream, read_arrays
 from cerebralcortex.legacy import find
 
 argparser = argparse.ArgumentParser(description="Cerebral Cortex Test Application")
 argparser.add_argument('--base_directory')
+argparser.add_argument('--storage_level', default='MEMORY_AND_DISK',
+                       help='Storage level the loaded participant records are persisted at, e.g. MEMORY_ONLY')
+argparser.add_argument('--max_samples', type=int,
+                       help='Read at most this many samples of every sensor file, whole files by default')
+argparser.add_argument('--shard_minutes', type=float,
+                       help='Process every recording in time shards of this many minutes instead of whole')
+argparser.add_argument('--partitions', type=int,
+                       help='Number of partitions the time shards run in, the Spark default parallelism by default')
 args = argparser.parse_args()
 
 # To run this program, please specific a program argument for base_directory that is the path to the test data files.
@@ -49,62 +58,24 @@ configuration_file = os.path.join(os.path.dirname(__file__), 'cerebralcortex.yml
 CC = CerebralCortex(configuration_file, master="local[*]", name="Memphis cStress Development App")
 
 
-def readfile(filename):
-    data = []
-    with gzip.open(filename, 'rt') as f:
-        count = 0
-        for l in f:
-            dp = parser.data_processor(l)
-            if isinstance(dp, DataPoint):
-                data.append(dp)
-                count += 1
-            if count > 5000:
-                break
-    return data
-
-
-def loader(identifier: int):
-    participant = "SI%02d" % identifier
-
-    participant_uuid = uuid.uuid4()
-
-    try:
-        ecg = DataStream(None, participant_uuid)
-        ecg.data = readfile(find(basedir, {"participant": participant, "datasource": "ecg"}))
-
-        rip = DataStream(None, participant_uuid)
-        rip.data = readfile(find(basedir, {"participant": participant, "datasource": "rip"}))
-
-        accelx = DataStream(None, participant_uuid)
-        accelx.data = readfile(find(basedir, {"participant": participant, "datasource": "accelx"}))
-
-        accely = DataStream(None, participant_uuid)
-        accely.data = readfile(find(basedir, {"participant": participant, "datasource": "accely"}))
-
-        accelz = DataStream(None, participant_uuid)
-        accelz.data = readfile(find(basedir, {"participant": participant, "datasource": "accelz"}))
-
-        return {"participant": participant, "ecg": ecg, "rip": rip, "accelx": accelx, "accely": accely,
-                "accelz": accelz}
-    except Exception as e:
-        print("File missing for %s" % participant)
-
-        return {"ERROR": 'missing data file'}
-
-
+def read_stream(participant: str, datasource: str) -> ArrayStream:
+    # Every stream of a participant gets the same owner, whichever task loads it
+    participant_uuid = uuid.uuid5(uuid.NAMESPACE_URL, participant)
+    timestamps, samples = read_arrays(find(basedir, {"participant": participant, "datasource": datasource}),
+                                      max_samples=args.max_samples)
+    return ArrayStream(timestamps, samples, owner=participant_uuid)
 
 
 start_time = time.time()
-ids = CC.sparkSession.sparkContext.parallelize([i for i in range(1, 25)])
+participants = ["SI%02d" % i for i in range(1, 25)]
 
-data = ids.map(lambda i: loader(i)).filter(lambda x: 'participant' in x)
+data = participant_records(CC.sparkSession.sparkContext, participants, cStress_streams, read_stream)
 
-cstress_feature_vector = cStress(data)
+shard_length = timedelta(minutes=args.shard_minutes) if args.shard_minutes else None
+cstress_feature_vector = cStress(data, storage_level=getattr(StorageLevel, args.storage_level),
+                                 shard_length=shard_length, n_partitions=args.partitions)
 
 pprint(cstress_feature_vector.collect())
 
-
-# results = ids.map(loader)
-# pprint(results.collect())
 end_time = time.time()
 print(end_time - start_time)